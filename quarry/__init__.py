@@ -12,4 +12,5 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .engine import execute_query
+from .engine import execute_query, QueryEngine
+from .sinks import ParquetSink, ArrowIPCSink
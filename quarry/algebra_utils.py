@@ -12,31 +12,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+import threading
 from typing import List, Set, Tuple, Any, Dict
 
+from rdflib.plugins.sparql import prepareQuery
 from rdflib.plugins.sparql.parserutils import CompValue, Expr
 from rdflib.plugins.sparql.sparql import Query
 
 from .classes import Operator, Expression, Term, Triple
 
-literal_counter = 0
-uri_counter = 0
+# next() on itertools.count is atomic, so names stay unique when queries are parsed from several threads
+literal_counter = itertools.count()
+uri_counter = itertools.count()
 
 
 def new_literal():
-    global literal_counter
-    literal = 'literal_' + str(literal_counter)
-    literal_counter += 1
+    literal = 'literal_' + str(next(literal_counter))
     return literal
 
 
 def new_uri():
-    global uri_counter
-    uri = 'uri_' + str(uri_counter)
-    uri_counter += 1
+    uri = 'uri_' + str(next(uri_counter))
     return uri
 
 
+# The pyparsing grammar of rdflib discovers the arity of its parse actions on first use, which is not thread-safe
+sparql_parse_lock = threading.Lock()
+
+
+def parse_sparql(sparql: str) -> Query:
+    with sparql_parse_lock:
+        return prepareQuery(sparql)
+
+
 def from_rdflib_sparqlquery(query: Query) -> Operator:
     root_operator = from_query(query)
     return root_operator
@@ -0,0 +1,188 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from SPARQLWrapper import SPARQLWrapper, JSON
+from rdflib.namespace import RDF
+from rdflib.paths import MulPath
+from rdflib.term import Variable, URIRef
+
+from .classes import Triple, Term
+
+logger = logging.getLogger(__name__)
+
+PREDICATE_STATISTICS_QUERY = """
+SELECT ?p (COUNT(*) AS ?triples) (COUNT(DISTINCT ?s) AS ?subjects) (COUNT(DISTINCT ?o) AS ?objects) WHERE {
+?s ?p ?o .
+}
+GROUP BY ?p
+"""
+
+CLASS_STATISTICS_QUERY = """
+SELECT ?c (COUNT(*) AS ?instances) WHERE {
+?s <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> ?c .
+}
+GROUP BY ?c
+"""
+
+# Used for patterns when no statistics are available, so that patterns with more bound terms come first
+DEFAULT_PATTERN_CARDINALITY = 1000.0
+
+
+@dataclass
+class PredicateStatistics:
+    triples: int
+    subjects: int
+    objects: int
+
+
+@dataclass
+class CardinalityStatistics:
+    """Number of triples per predicate and of instances per class in the knowledge base, used to order the triple
+    patterns of the model query. Predicates and classes missing from the statistics, for instance when they were
+    loaded from an older file, are estimated as an average predicate or class rather than as empty."""
+    predicates: Dict[str, PredicateStatistics] = field(default_factory=dict)
+    classes: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def triples(self) -> int:
+        return sum(p.triples for p in self.predicates.values())
+
+    def average_predicate(self) -> PredicateStatistics:
+        n = max(len(self.predicates), 1)
+        return PredicateStatistics(triples=self.triples // n,
+                                   subjects=sum(p.subjects for p in self.predicates.values()) // n,
+                                   objects=sum(p.objects for p in self.predicates.values()) // n)
+
+    def nodes(self) -> int:
+        """Lower bound on the number of nodes, those of the predicate with the most subjects and objects."""
+        return max([p.subjects + p.objects for p in self.predicates.values()], default=0)
+
+    @staticmethod
+    def from_endpoint(sparql_endpoint: SPARQLWrapper) -> 'CardinalityStatistics':
+        predicates = {}
+        for binding in select_bindings(sparql_endpoint, PREDICATE_STATISTICS_QUERY):
+            predicates[binding['p']] = PredicateStatistics(triples=int(binding['triples']),
+                                                           subjects=int(binding['subjects']),
+                                                           objects=int(binding['objects']))
+        classes = {binding['c']: int(binding['instances'])
+                   for binding in select_bindings(sparql_endpoint, CLASS_STATISTICS_QUERY)}
+        return CardinalityStatistics(predicates=predicates, classes=classes)
+
+    @staticmethod
+    def from_file(path: str) -> 'CardinalityStatistics':
+        with open(path, 'r') as f:
+            d = json.load(f)
+        predicates = {p: PredicateStatistics(**s) for p, s in d['predicates'].items()}
+        return CardinalityStatistics(predicates=predicates, classes=d['classes'])
+
+    def to_file(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(asdict(self), f, indent=1, sort_keys=True)
+
+    @staticmethod
+    def load(sparql_endpoint: SPARQLWrapper, path: Optional[str] = None) -> 'CardinalityStatistics':
+        """Reads the statistics from the file if it exists, or computes them from the endpoint and writes the file."""
+        if path is not None and os.path.exists(path):
+            return CardinalityStatistics.from_file(path)
+        logger.info('Computing cardinality statistics from the SPARQL endpoint')
+        statistics = CardinalityStatistics.from_endpoint(sparql_endpoint)
+        if path is not None:
+            statistics.to_file(path)
+        return statistics
+
+    def estimate(self, triple: Triple, bound: Set[str]) -> float:
+        """Estimated number of solutions of the triple pattern, given the variables bound by earlier patterns."""
+        verb = triple.verb.rdflib_term
+        subject_bound = is_bound(triple.subject, bound)
+        object_bound = is_bound(triple.object, bound)
+        if type(verb) == URIRef and verb == RDF.type and type(triple.object.rdflib_term) == URIRef:
+            average_instances = sum(self.classes.values()) / max(len(self.classes), 1)
+            instances = float(self.classes.get(str(triple.object.rdflib_term), average_instances))
+            return min(instances, 1.0) if subject_bound else instances
+
+        if type(verb) == URIRef:
+            statistics = self.predicates.get(str(verb), self.average_predicate())
+        elif type(verb) == MulPath:
+            statistics = self.predicates.get(str(verb.path), self.average_predicate())
+        else:
+            # Any predicate, so a bound subject or object is scaled by the degree of the node over all predicates,
+            # with the predicate having the most subjects or objects standing in for the number of nodes
+            statistics = PredicateStatistics(triples=self.triples,
+                                             subjects=max([p.subjects for p in self.predicates.values()], default=1),
+                                             objects=max([p.objects for p in self.predicates.values()], default=1))
+
+        estimate = float(statistics.triples)
+        if subject_bound:
+            estimate = estimate / max(statistics.subjects, 1)
+        if object_bound:
+            estimate = estimate / max(statistics.objects, 1)
+        if type(verb) == MulPath:
+            # Paths match at least the triples of the predicate
+            estimate = estimate * 2
+            if verb.zero and not subject_bound and not object_bound:
+                # p* and p? also match every node at zero length
+                estimate = estimate + self.nodes()
+        return estimate
+
+
+def order_triples(triples: Iterable[Triple], statistics: Optional[CardinalityStatistics],
+                  key: Callable[[Triple], str]) -> List[Triple]:
+    """Orders triple patterns greedily by estimated cardinality, each given the variables bound by the patterns
+    before it. Ties are broken by the text of the pattern, so the order is deterministic. Only the patterns of one
+    basic graph pattern are ordered, OPTIONAL groups keep their place in the query since moving them may change
+    the result."""
+    remaining = sorted(triples, key=key)
+    ordered = []
+    bound = set()
+    while len(remaining) > 0:
+        best = min(remaining, key=lambda t: pattern_cardinality(t, bound, statistics))
+        remaining.remove(best)
+        ordered.append(best)
+        bound.update(variable_names(best))
+    return ordered
+
+
+def pattern_cardinality(triple: Triple, bound: Set[str], statistics: Optional[CardinalityStatistics]) -> float:
+    if statistics is not None:
+        return statistics.estimate(triple, bound)
+    estimate = DEFAULT_PATTERN_CARDINALITY
+    for term in [triple.subject, triple.verb, triple.object]:
+        if is_bound(term, bound):
+            estimate = estimate / 10
+    return estimate
+
+
+def is_bound(term: Term, bound: Set[str]) -> bool:
+    if type(term.rdflib_term) == Variable:
+        return str(term.rdflib_term) in bound
+    return True
+
+
+def variable_names(triple: Triple) -> Set[str]:
+    return {str(term.rdflib_term) for term in [triple.subject, triple.verb, triple.object]
+            if type(term.rdflib_term) == Variable}
+
+
+def select_bindings(sparql_endpoint: SPARQLWrapper, sparql: str) -> List[Dict[str, str]]:
+    sparql_endpoint.setQuery(sparql)
+    sparql_endpoint.setReturnFormat(JSON)
+    res_dict = sparql_endpoint.query().convert()
+    return [{k: v['value'] for k, v in binding.items()} for binding in res_dict['results']['bindings']]
@@ -16,7 +16,7 @@ import copy
 import uuid
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Set, Union
+from typing import Dict, List, Set, Union
 
 from rdflib.paths import MulPath
 from rdflib.term import Variable, URIRef, Literal
@@ -76,6 +76,8 @@ class Operator:
     order_by: Set[Term] = field(init=False)
     children: Set['Operator']
     expressions: Set[Expression] = field(default_factory=set)
+    # Inline data restricting variables, by variable name
+    values: Dict[str, List[int]] = field(default_factory=dict)
     guid: str = field(default_factory=lambda: str(uuid.uuid4()))
 
     def __hash__(self):
@@ -0,0 +1,124 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import dataclasses
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .engine import QueryEngine, execute_time_series_queries, integrate_time_series_results
+from .rewrite import generate_time_series_queries
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, TimeSeriesResult, filter_arrow_table, \
+    term_name, timestamp_expression, to_arrow_table
+
+
+class ContinuousQuery:
+    """Polls a query for new results.
+
+    The SPARQL query is executed once, and its result is kept. Each poll only asks the time series database for the
+    samples of each signal after its watermark, the timestamp of the latest sample fetched so far, and returns the
+    result rows produced by these samples. The first poll returns the result of the full query.
+
+    Every time series of the query must have a timestamp variable. Samples arriving with timestamps before the
+    watermark of their signal are not seen, and rows joining time series on the timestamp are only returned when
+    their samples arrive in the same poll. Polls must not be run concurrently.
+    """
+
+    def __init__(self, query_engine: QueryEngine, sparql: str):
+        self.query_engine = query_engine
+        self.context = query_engine.execute_static_query(sparql)
+        self.time_series_database = WatermarkTimeSeriesDatabase(query_engine.time_series_database)
+
+    @property
+    def watermarks(self) -> Dict[str, Dict[int, pd.Timestamp]]:
+        return self.time_series_database.watermarks
+
+    def poll(self) -> pd.DataFrame:
+        time_series_queries = {}
+        generate_time_series_queries(self.context.op, self.context.static_df, time_series_queries, {}, {})
+        for tsq in time_series_queries.values():
+            if tsq.timestamp_variable is None:
+                raise ValueError('Continuous queries require a timestamp for ?' + term_name(tsq.variable_term))
+
+        tsqs = execute_time_series_queries(time_series_queries, self.time_series_database,
+                                           self.query_engine.executor)
+        result_df = integrate_time_series_results(self.context.op, self.context.static_df, tsqs)
+        self.time_series_database.commit()
+        return result_df
+
+
+class WatermarkTimeSeriesDatabase(TimeSeriesDatabase):
+    """Restricts time series queries to the samples after the watermark of each signal.
+    Watermarks are advanced to the latest samples fetched when the poll is committed."""
+
+    def __init__(self, time_series_database: TimeSeriesDatabase):
+        super().__init__()
+        self.time_series_database = time_series_database
+        self.lock = threading.Lock()
+        self.watermarks: Dict[str, Dict[int, pd.Timestamp]] = {}
+        self.pending_watermarks: Dict[str, Dict[int, pd.Timestamp]] = {}
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        variable_name = term_name(tsq.variable_term)
+        with self.lock:
+            watermarks = dict(self.watermarks.get(variable_name, {}))
+
+        # One query for each group of signals with the same watermark
+        groups: Dict[Optional[pd.Timestamp], List[int]] = {}
+        for signal_id in tsq.signal_ids.dropna().unique().tolist():
+            groups.setdefault(watermarks.get(int(signal_id)), []).append(int(signal_id))
+        if len(groups) == 0:
+            groups[None] = []
+        tables = [self.execute_watermark_query(tsq, pd.Series(group, dtype='int64'), watermark)
+                  for watermark, group in groups.items()]
+
+        schema = tables[0].schema
+        table = pa.concat_tables([t if t.schema == schema else t.cast(schema) for t in tables])
+        latest = latest_timestamps(table, tsq)
+        with self.lock:
+            self.pending_watermarks.setdefault(variable_name, {}).update(latest)
+        return table
+
+    def execute_watermark_query(self, tsq: TimeSeriesQuery, signal_ids: pd.Series,
+                                watermark: Optional[pd.Timestamp]) -> pa.Table:
+        watermark_expressions = []
+        if watermark is not None:
+            watermark_expressions.append(timestamp_expression(tsq, '>', watermark))
+        watermark_tsq = dataclasses.replace(tsq, signal_ids=signal_ids,
+                                            literal_expressions=tsq.literal_expressions + watermark_expressions)
+        result = to_arrow_table(self.time_series_database.execute_query(watermark_tsq))
+
+        # The other literal expressions are applied later, so that watermarks also pass samples that are filtered out
+        return filter_arrow_table(result, dataclasses.replace(watermark_tsq, literal_expressions=watermark_expressions))
+
+    def commit(self):
+        with self.lock:
+            for variable_name, latest in self.pending_watermarks.items():
+                watermarks = self.watermarks.setdefault(variable_name, {})
+                for signal_id, ts in latest.items():
+                    if signal_id not in watermarks or ts > watermarks[signal_id]:
+                        watermarks[signal_id] = ts
+            self.pending_watermarks = {}
+
+
+def latest_timestamps(table: pa.Table, tsq: TimeSeriesQuery) -> Dict[int, pd.Timestamp]:
+    signal_id_col = term_name(tsq.variable_term) + '_signal_id'
+    timestamp_col = term_name(tsq.timestamp_variable)
+    latest = table.select([signal_id_col, timestamp_col]).group_by(signal_id_col).aggregate([(timestamp_col, 'max')])
+    return {int(signal_id): pd.Timestamp(ts) for signal_id, ts in
+            zip(latest[signal_id_col].to_pylist(), latest[timestamp_col + '_max'].to_pylist())
+            if signal_id is not None and ts is not None}
@@ -12,29 +12,168 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict, Set, List
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, Executor
+from dataclasses import dataclass
+from typing import Dict, Set, List, Union, Optional
 
 import pandas as pd
+import pyarrow as pa
 from SPARQLWrapper import SPARQLWrapper, JSON
-from rdflib.plugins.sparql import prepareQuery
 from rdflib.term import Variable
 
-from .algebra_utils import from_rdflib_sparqlquery
+from .algebra_utils import from_rdflib_sparqlquery, parse_sparql
+from .cardinality import CardinalityStatistics
 from .classes import Operator, Term, TermConstraint
-from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, is_arrow_result, to_arrow_table, \
+    filter_arrow_table, to_dataframe, snapshot_rows
 from .integrated_result import generate_select_result
 from .query_generator import op_to_query
-from .rewrite import rewrite_deepcopy_for_sparql_engine, generate_time_series_queries
+from .rewrite import rewrite_deepcopy_for_sparql_engine, generate_time_series_queries, rewrite_materialized_closures
+from .semi_join import plan_semi_joins, add_values
+from .single_flight import SingleFlight, SingleFlightTimeSeriesDatabase, normalize_sparql
+from .sinks import ResultSink
 from .type_inference import infer_types
 
+DEFAULT_SINK_CHUNK_SIZE = 1000
 
-def execute_query(sparql: str, sparql_endpoint: SPARQLWrapper, time_series_database:TimeSeriesDatabase) -> pd.DataFrame:
-    query = prepareQuery(sparql)
+
+@dataclass
+class ExecutionContext:
+    """State of a single query execution.
+    The operator tree belongs to the execution, since it is annotated using the result of the SPARQL query."""
+    sparql: str
+    op: Operator
+    model_sparql: str
+    static_df: pd.DataFrame
+
+
+class QueryEngine:
+    """Executes queries over a SPARQL endpoint and a time series database.
+
+    The engine holds the configuration and resources shared by queries, and may be used from several threads at
+    once. The state of each execution is kept in an ExecutionContext, and each thread queries the SPARQL endpoint
+    through its own copy of the SPARQLWrapper. With max_workers > 1, the time series queries of an execution are
+    run concurrently in a thread pool owned by the engine. The time series database must allow concurrent calls
+    to execute_query when the engine is used from several threads or with max_workers > 1.
+
+    With single_flight, identical queries executed concurrently, and identical time series queries in flight at the
+    same time, are executed once and their result is shared between the callers. Shared results must not be
+    modified by the callers. Queries written to a sink are not deduplicated.
+
+    With semi_join, selective filters on the data values of UA variables with a timestamp in the query restrict the
+    signal ids of the SPARQL query, when the time series database implements estimate_signal_count and
+    matching_signal_ids. The estimates are queries of their own, so this is off by default.
+
+    With statistics, the triple patterns of the SPARQL query sent to the endpoint are ordered by estimated
+    cardinality, see CardinalityStatistics.load to compute them once and keep them in a file.
+
+    With closures, property paths p+ and p* over predicates p with a transitive closure materialized by translate
+    are replaced by lookups of the closure predicate, see load_materialized_closures to read them from the endpoint.
+    """
+
+    def __init__(self, sparql_endpoint: SPARQLWrapper, time_series_database: TimeSeriesDatabase,
+                 max_workers: int = 1, chunk_size: int = DEFAULT_SINK_CHUNK_SIZE, single_flight: bool = True,
+                 semi_join: bool = False, statistics: Optional[CardinalityStatistics] = None,
+                 closures: Optional[Dict[str, str]] = None):
+        self.sparql_endpoint = sparql_endpoint
+        if single_flight:
+            self.query_flights = SingleFlight()
+            self.time_series_database = SingleFlightTimeSeriesDatabase(time_series_database)
+        else:
+            self.query_flights = None
+            self.time_series_database = time_series_database
+        self.chunk_size = chunk_size
+        self.semi_join = semi_join
+        self.statistics = statistics
+        self.closures = closures
+        self.local = threading.local()
+        if max_workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quarry')
+        else:
+            self.executor = None
+
+    def execute_query(self, sparql: str, as_arrow: bool = False, sink: Optional[ResultSink] = None,
+                      chunk_size: Optional[int] = None) -> Union[pd.DataFrame, pa.Table, None]:
+        if sink is not None:
+            context = self.execute_static_query(sparql)
+            self.write_result_chunks(context, sink, chunk_size)
+            return None
+
+        if self.query_flights is None:
+            return self.execute_result(sparql, as_arrow)
+        # execute_query has no bound parameters, the options affecting the result are part of the key
+        key = (normalize_sparql(sparql), as_arrow)
+        return self.query_flights.do(key, lambda: self.execute_result(sparql, as_arrow))
+
+    def execute_result(self, sparql: str, as_arrow: bool) -> Union[pd.DataFrame, pa.Table]:
+        context = self.execute_static_query(sparql)
+        result_df = self.generate_integrated_result(context, context.static_df)
+
+        if as_arrow:
+            # The result is joined in pandas, so this is a conversion for Arrow consumers, not a faster path
+            return pa.Table.from_pandas(result_df, preserve_index=False)
+        return result_df
+
+    def execute_static_query(self, sparql: str) -> ExecutionContext:
+        semi_join_database = self.time_series_database if self.semi_join else None
+        return execute_static_query(sparql, self.thread_sparql_endpoint(), semi_join_database, self.statistics,
+                                    self.closures)
+
+    def generate_integrated_result(self, context: ExecutionContext, static_df: pd.DataFrame) -> pd.DataFrame:
+        return generate_integrated_result(context.op, static_df, self.time_series_database, self.executor)
+
+    def write_result_chunks(self, context: ExecutionContext, sink: ResultSink, chunk_size: Optional[int] = None):
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        write_result_chunks(context.op, context.static_df, self.time_series_database, sink, chunk_size,
+                            self.executor)
+
+    def thread_sparql_endpoint(self) -> SPARQLWrapper:
+        # SPARQLWrapper keeps the query as state, so threads must not share it
+        sparql_endpoint = getattr(self.local, 'sparql_endpoint', None)
+        if sparql_endpoint is None:
+            sparql_endpoint = copy.copy(self.sparql_endpoint)
+            self.local.sparql_endpoint = sparql_endpoint
+        return sparql_endpoint
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self) -> 'QueryEngine':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def execute_query(sparql: str, sparql_endpoint: SPARQLWrapper, time_series_database: TimeSeriesDatabase,
+                  as_arrow: bool = False, sink: Optional[ResultSink] = None,
+                  chunk_size: int = DEFAULT_SINK_CHUNK_SIZE) -> Union[pd.DataFrame, pa.Table, None]:
+    engine = QueryEngine(sparql_endpoint=sparql_endpoint, time_series_database=time_series_database,
+                         chunk_size=chunk_size, single_flight=False)
+    return engine.execute_query(sparql, as_arrow=as_arrow, sink=sink)
+
+
+def execute_static_query(sparql: str, sparql_endpoint: SPARQLWrapper,
+                         time_series_database: Optional[TimeSeriesDatabase] = None,
+                         statistics: Optional[CardinalityStatistics] = None,
+                         closures: Optional[Dict[str, str]] = None) -> ExecutionContext:
+    """Executes the SPARQL query. With a time series database, signals are restricted up front by selective filters
+    on time series data when the database supports it, see plan_semi_joins. With statistics, triple patterns are
+    ordered by estimated cardinality. With closures, property paths are replaced by materialized closures."""
+    query = parse_sparql(sparql)
     op = from_rdflib_sparqlquery(query)
     infer_types(op)
     infer_types(op)
     op_for_sparql, _ = rewrite_deepcopy_for_sparql_engine(op)
-    model_sparql = op_to_query(op_for_sparql)
+    if time_series_database is not None:
+        add_values(op_for_sparql, plan_semi_joins(op, time_series_database))
+    if closures:
+        rewrite_materialized_closures(op_for_sparql, closures)
+    model_sparql = op_to_query(op_for_sparql, statistics)
     sparql_endpoint.setQuery(model_sparql)
     sparql_endpoint.setReturnFormat(JSON)
     static_dict = sparql_endpoint.query().convert()
@@ -44,37 +183,88 @@ def execute_query(sparql: str, sparql_endpoint: SPARQLWrapper, time_series_datab
               c.endswith('_is_ext_var') and static_df[c].any()}
 
     update_operator_with_result(op, is_ext)
+    return ExecutionContext(sparql=sparql, op=op, model_sparql=model_sparql, static_df=static_df)
+
+
+def generate_integrated_result(op: Operator, static_df: pd.DataFrame, time_series_database: TimeSeriesDatabase,
+                               executor: Optional[Executor] = None) -> pd.DataFrame:
     time_series_queries = {}
     generate_time_series_queries(op, static_df, time_series_queries, {}, {})
-    tsqs = execute_time_series_queries(time_series_queries, time_series_database)
+    tsqs = execute_time_series_queries(time_series_queries, time_series_database, executor)
+    return integrate_time_series_results(op, static_df, tsqs)
 
+
+def integrate_time_series_results(op: Operator, static_df: pd.DataFrame,
+                                  tsqs: List[TimeSeriesQuery]) -> pd.DataFrame:
     dropmore = [c for c in static_df.columns.values if c.endswith('_is_ext_var')]
     dropvars = [str(tsq.data_variable.rdflib_term) for tsq in tsqs if tsq.data_variable is not None]
     filtered_dropcols = [c for c in dropmore + dropvars if c in static_df.columns.values]
     static_df = static_df.drop(columns=filtered_dropcols)
 
     result_df, _ = generate_select_result(op, static_df, tsqs)
-
     return result_df
 
 
+def write_result_chunks(op: Operator, static_df: pd.DataFrame, time_series_database: TimeSeriesDatabase,
+                        sink: ResultSink, chunk_size: int, executor: Optional[Executor] = None):
+    """Produces the result for chunks of rows of the SPARQL result, and writes each result chunk to the sink.
+    Every operator of the integrated result works row by row on the SPARQL result, so the concatenated chunks
+    equal the full result. The previous chunk is written in a separate thread while the next chunk is fetched.
+    When producing or writing a chunk fails, the sink is aborted instead of closed, see ResultSink.abort."""
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be positive')
+
+    pending_write: Optional[Future] = None
+    try:
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for start in range(0, max(len(static_df), 1), chunk_size):
+                chunk_df = static_df.iloc[start:start + chunk_size]
+                result_chunk_df = generate_integrated_result(op, chunk_df, time_series_database, executor)
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = writer.submit(sink.write, result_chunk_df)
+            if pending_write is not None:
+                pending_write.result()
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close()
+
+
 def execute_time_series_queries(time_series_queries: Dict[Term, TimeSeriesQuery],
-                                time_series_database: TimeSeriesDatabase) -> List[TimeSeriesQuery]:
+                                time_series_database: TimeSeriesDatabase,
+                                executor: Optional[Executor] = None) -> List[TimeSeriesQuery]:
+    if executor is not None:
+        futures = [executor.submit(execute_time_series_query, time_series_queries[trm], time_series_database)
+                   for trm in time_series_queries]
+        return [f.result() for f in futures]
+
     tsqs = []
 
     for trm in time_series_queries:
         tsq = time_series_queries[trm]
-        tsq_df = time_series_database.execute_query(tsq)
-        tsq.df = tsq_df
-        tsqs.append(tsq)
+        tsqs.append(execute_time_series_query(tsq, time_series_database))
 
     return tsqs
 
 
+def execute_time_series_query(tsq: TimeSeriesQuery, time_series_database: TimeSeriesDatabase) -> TimeSeriesQuery:
+    tsq_result = time_series_database.execute_query(tsq)
+    if tsq.snapshot:
+        # Filters apply to the snapshot, so the rows are selected before any filtering
+        tsq.df = snapshot_rows(to_dataframe(tsq_result, tsq), tsq)
+        return tsq
+    if is_arrow_result(tsq_result):
+        tsq_result = filter_arrow_table(to_arrow_table(tsq_result), tsq)
+    tsq.df = to_dataframe(tsq_result, tsq)
+    return tsq
+
+
 def convert_result_to_dataframe(res_dict: Dict):
     res_df = pd.DataFrame.from_records(res_dict['results']['bindings'])
     for c in res_df.columns.values:
-        res_df[c] = res_df[c].map(lambda x: x['value'] if x is not None else None)
+        # Variables unbound in some solutions are missing from their bindings
+        res_df[c] = res_df[c].map(lambda x: x['value'] if isinstance(x, dict) else None)
     for c in res_dict['head']['vars']:
         if c not in res_df.columns.values:
             res_df[c] = pd.NA
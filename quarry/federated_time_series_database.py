@@ -0,0 +1,178 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import dataclasses
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+from SPARQLWrapper import SPARQLWrapper, JSON
+
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, TimeSeriesResult, to_arrow_table
+
+logger = logging.getLogger(__name__)
+
+
+class SignalRoute(ABC):
+    """Rule assigning signal ids to a time series database."""
+
+    @abstractmethod
+    def route(self, signal_ids: pd.Series) -> pd.Series:
+        """Name of the time series database of each signal id, or NA for signal ids the rule does not cover."""
+        pass
+
+
+@dataclass
+class RangeRoute(SignalRoute):
+    """Routes the signal ids in [start, end) to the named database."""
+    backend: str
+    start: int
+    end: int
+
+    def route(self, signal_ids: pd.Series) -> pd.Series:
+        in_range = (signal_ids >= self.start) & (signal_ids < self.end)
+        return pd.Series(self.backend, index=signal_ids.index, dtype='object').where(in_range)
+
+
+@dataclass
+class LookupRoute(SignalRoute):
+    """Routes signal ids by a lookup table from signal id to database name."""
+    backends: Dict[int, str]
+
+    def route(self, signal_ids: pd.Series) -> pd.Series:
+        return signal_ids.map(self.backends)
+
+    @staticmethod
+    def from_sparql(sparql_endpoint: SPARQLWrapper, sparql: str, signal_id_variable: str = 'signal_id',
+                    backend_variable: str = 'backend') -> 'LookupRoute':
+        """Builds the lookup table from an attribute in the knowledge base, using a query binding the signal id and
+        the name of the database."""
+        sparql_endpoint.setQuery(sparql)
+        sparql_endpoint.setReturnFormat(JSON)
+        res_dict = sparql_endpoint.query().convert()
+        backends = {}
+        for binding in res_dict['results']['bindings']:
+            if signal_id_variable in binding and backend_variable in binding:
+                backends[int(binding[signal_id_variable]['value'])] = binding[backend_variable]['value']
+        return LookupRoute(backends=backends)
+
+
+@dataclass
+class BackendStatistics:
+    queries: int = 0
+    signals: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+
+
+class FederatedTimeSeriesDatabase(TimeSeriesDatabase):
+    """Routes the signals of each time series query to several time series databases.
+
+    Signal ids are assigned by the first route covering them, or to default_backend. Each query is split into one
+    query per database, and these are executed in parallel and their results concatenated. Time spent per database
+    is kept in statistics and logged.
+    """
+
+    def __init__(self, backends: Dict[str, TimeSeriesDatabase], routes: List[SignalRoute],
+                 default_backend: Optional[str] = None, max_workers: Optional[int] = None):
+        super().__init__()
+        if default_backend is not None and default_backend not in backends:
+            raise ValueError('Unknown default backend: ' + default_backend)
+        self.backends = backends
+        self.routes = routes
+        self.default_backend = default_backend
+        self.executor = ThreadPoolExecutor(max_workers=max_workers if max_workers is not None else len(backends),
+                                           thread_name_prefix='quarry-federated')
+        self.lock = threading.Lock()
+        self.statistics: Dict[str, BackendStatistics] = {name: BackendStatistics() for name in backends}
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        signal_ids = pd.Series(tsq.signal_ids.dropna().unique()).astype('int64')
+        assigned = self.assign_backends(signal_ids)
+
+        if len(signal_ids) == 0:
+            backend = self.default_backend if self.default_backend is not None else next(iter(self.backends))
+            return self.execute_backend_query(backend, tsq)
+
+        backend_queries = {backend: dataclasses.replace(tsq, signal_ids=ids.reset_index(drop=True))
+                           for backend, ids in signal_ids.groupby(assigned, sort=True)}
+        if len(backend_queries) == 1:
+            backend, backend_tsq = next(iter(backend_queries.items()))
+            return self.execute_backend_query(backend, backend_tsq)
+
+        futures = [self.executor.submit(self.execute_backend_query, backend, backend_tsq)
+                   for backend, backend_tsq in backend_queries.items()]
+        tables = [to_arrow_table(f.result()) for f in futures]
+        schema = tables[0].schema
+        return pa.concat_tables([t if t.schema == schema else t.cast(schema) for t in tables])
+
+    def assign_backends(self, signal_ids: pd.Series) -> pd.Series:
+        assigned = pd.Series(None, index=signal_ids.index, dtype='object')
+        for route in self.routes:
+            unassigned = assigned.isna()
+            if not unassigned.any():
+                break
+            assigned[unassigned] = route.route(signal_ids[unassigned])
+        if self.default_backend is not None:
+            assigned = assigned.fillna(self.default_backend)
+        elif assigned.isna().any():
+            raise ValueError('No time series database for signal ids: ' +
+                             ', '.join(map(str, signal_ids[assigned.isna()].tolist())))
+
+        unknown = set(assigned.unique()) - set(self.backends.keys())
+        if len(unknown) > 0:
+            raise ValueError('Unknown time series databases: ' + ', '.join(sorted(unknown)))
+        return assigned
+
+    def execute_backend_query(self, backend: str, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        start = time.perf_counter()
+        result = to_arrow_table(self.backends[backend].execute_query(tsq))
+        seconds = time.perf_counter() - start
+        logger.debug('Time series database %s returned %d rows for %d signals in %.3f s', backend, result.num_rows,
+                     len(tsq.signal_ids), seconds)
+        with self.lock:
+            statistics = self.statistics[backend]
+            statistics.queries += 1
+            statistics.signals += len(tsq.signal_ids)
+            statistics.rows += result.num_rows
+            statistics.seconds += seconds
+        return result
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery) -> Optional[int]:
+        estimates = [backend.estimate_signal_count(tsq) for backend in self.backends.values()]
+        if any(e is None for e in estimates):
+            return None
+        return sum(estimates)
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery) -> Optional[pd.Series]:
+        matching = [backend.matching_signal_ids(tsq) for backend in self.backends.values()]
+        if any(m is None for m in matching):
+            return None
+        return pd.concat(matching, ignore_index=True).drop_duplicates()
+
+    def signal_count(self) -> Optional[int]:
+        counts = [backend.signal_count() for backend in self.backends.values()]
+        if any(c is None for c in counts):
+            return None
+        return sum(counts)
+
+    def close(self):
+        self.executor.shutdown()
@@ -20,101 +20,113 @@ from rdflib.term import Variable, Literal
 from .classes import Operator, Triple, TermConstraint
 from .time_series_database import TimeSeriesQuery
 
-join_ind = 0
+
+class JoinColumns:
+    """Names the temporary join columns of a single result, so that results generated concurrently share no state
+    and the names do not depend on what was executed before."""
+
+    def __init__(self):
+        self.next_index = 0
+
+    def new_join_column(self) -> str:
+        join_col = 'my_special_join_col' + str(self.next_index)
+        self.next_index += 1
+        return join_col
 
 
 def generate_select_result(op: Operator, static_df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> pd.DataFrame:
     if op.type != 'SelectQuery':
         raise NotImplementedError('Only select queries are supported')
 
+    join_columns = JoinColumns()
     df = static_df.copy()
     for c in op.children:
-        df, tsqs = generate_result_delegate(c, df, tsqs)
+        df, tsqs = generate_result_delegate(c, df, tsqs, join_columns)
 
     return df, tsqs
 
-def generate_distinct(op: Operator, static_df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> pd.DataFrame:
+def generate_distinct(op: Operator, static_df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                      join_columns: JoinColumns) -> pd.DataFrame:
     #TODO drop duplicates
     df = static_df.copy()
     for c in op.children:
-        df, tsqs = generate_result_delegate(c, df, tsqs)
+        df, tsqs = generate_result_delegate(c, df, tsqs, join_columns)
 
     return df, tsqs
 
-def generate_project(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> pd.DataFrame:
+def generate_project(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                     join_columns: JoinColumns) -> pd.DataFrame:
     for c in op.children:
-        df, tsqs = generate_result_delegate(c, df, tsqs)
+        df, tsqs = generate_result_delegate(c, df, tsqs, join_columns)
 
     cols = [str(pv.rdflib_term) for pv in op.project_vars if str(pv.rdflib_term) in df.columns.values]
     return df[cols].copy(), tsqs
 
-def generate_result_delegate(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> Tuple[
-    pd.DataFrame, List[TimeSeriesQuery]]:
+def generate_result_delegate(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                             join_columns: JoinColumns) -> Tuple[pd.DataFrame, List[TimeSeriesQuery]]:
     if op.type == 'LeftJoin':
-        return generate_left_join(op, df, tsqs)
+        return generate_left_join(op, df, tsqs, join_columns)
     elif op.type == 'BGP':
-        return generate_bgp(op, df, tsqs)
+        return generate_bgp(op, df, tsqs, join_columns)
     elif op.type == 'Filter':
-        return generate_filter(op, df, tsqs)
+        return generate_filter(op, df, tsqs, join_columns)
     elif op.type == 'Join':
-        return generate_join(op, df, tsqs)
+        return generate_join(op, df, tsqs, join_columns)
     elif op.type == 'Project':
-        return generate_project(op, df, tsqs)
+        return generate_project(op, df, tsqs, join_columns)
     elif op.type == 'ToMultiSet':
-        return generate_bgp(op, df, tsqs) #TODO: Probably also stupid
+        return generate_bgp(op, df, tsqs, join_columns) #TODO: Probably also stupid
     elif op.type == 'Distinct':
-        return generate_distinct(op, df, tsqs) #TODO: Fix properly
+        return generate_distinct(op, df, tsqs, join_columns) #TODO: Fix properly
     else:
         raise NotImplementedError(op.type)
 
 
-def generate_left_join(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> Tuple[
-    pd.DataFrame, List[TimeSeriesQuery]]:
+def generate_left_join(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                       join_columns: JoinColumns) -> Tuple[pd.DataFrame, List[TimeSeriesQuery]]:
     p1_child = [c for c in op.children if c.name == 'p1'][0]
     p2_child = [c for c in op.children if c.name == 'p2'][0]
 
-    global join_ind
-    join_col = 'my_special_join_col' + str(join_ind)
+    join_col = join_columns.new_join_column()
     df[join_col] = range(len(df))
-    join_ind += 1
 
-    df_lhs, tsqs_lhs = generate_result_delegate(op=p1_child, df=df, tsqs=tsqs)
-    df_rhs, tsqs_rhs = generate_result_delegate(op=p2_child, df=df, tsqs=tsqs_lhs)  # TODO: Check if correct..
+    df_lhs, tsqs_lhs = generate_result_delegate(op=p1_child, df=df, tsqs=tsqs, join_columns=join_columns)
+    # TODO: Check if correct..
+    df_rhs, tsqs_rhs = generate_result_delegate(op=p2_child, df=df, tsqs=tsqs_lhs, join_columns=join_columns)
     rhs_newcols = [c for c in df_rhs.columns.values if c not in df_lhs.columns.values]
     df = df_lhs.set_index(join_col).join(df_rhs.set_index(join_col)[rhs_newcols], how='left')
     return df, tsqs_rhs
 
-def generate_join(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> Tuple[
-    pd.DataFrame, List[TimeSeriesQuery]]:
+def generate_join(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                  join_columns: JoinColumns) -> Tuple[pd.DataFrame, List[TimeSeriesQuery]]:
     p1_child = [c for c in op.children if c.name == 'p1'][0]
     p2_child = [c for c in op.children if c.name == 'p2'][0]
 
-    global join_ind
-    join_col = 'my_special_join_col' + str(join_ind)
+    join_col = join_columns.new_join_column()
     df[join_col] = range(len(df))
-    join_ind += 1
 
-    df_lhs, tsqs_lhs = generate_result_delegate(op=p1_child, df=df, tsqs=tsqs)
-    df_rhs, tsqs_rhs = generate_result_delegate(op=p2_child, df=df, tsqs=tsqs_lhs)  # TODO: Check if correct..
+    df_lhs, tsqs_lhs = generate_result_delegate(op=p1_child, df=df, tsqs=tsqs, join_columns=join_columns)
+    # TODO: Check if correct..
+    df_rhs, tsqs_rhs = generate_result_delegate(op=p2_child, df=df, tsqs=tsqs_lhs, join_columns=join_columns)
     rhs_newcols = [c for c in df_rhs.columns.values if c not in df_lhs.columns.values]
     df = df_lhs.set_index(join_col).join(df_rhs.set_index(join_col)[rhs_newcols], how='inner')
     return df, tsqs_rhs
 
 
-def generate_bgp(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> Tuple[
-    pd.DataFrame, List[TimeSeriesQuery]]:
+def generate_bgp(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                 join_columns: JoinColumns) -> Tuple[pd.DataFrame, List[TimeSeriesQuery]]:
     df, tsqs = process_triples(op.triples, df=df, tsqs=tsqs)
     for c in op.children:
-        generate_result_delegate(c, df, tsqs)
+        generate_result_delegate(c, df, tsqs, join_columns)
     df = filter_df(op, df)
     return df, tsqs
 
 
-def generate_filter(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery]) -> Tuple[
-    pd.DataFrame, List[TimeSeriesQuery]]:
+def generate_filter(op: Operator, df: pd.DataFrame, tsqs: List[TimeSeriesQuery],
+                    join_columns: JoinColumns) -> Tuple[pd.DataFrame, List[TimeSeriesQuery]]:
     df, tsqs = process_triples(op.triples, df=df, tsqs=tsqs)
     for c in op.children:
-        df, tsqs = generate_result_delegate(c, df, tsqs)
+        df, tsqs = generate_result_delegate(c, df, tsqs, join_columns)
     df = filter_df(op, df)
     return df, tsqs
 
@@ -0,0 +1,125 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import operator
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, literal_comparison, term_name, time_bounds
+
+DATASET_COMPARISONS = {'>=': operator.ge, '>': operator.gt, '<=': operator.le, '<': operator.lt, '=': operator.eq}
+DEFAULT_VALUE_COLUMNS = {'str': 'str_value', 'real': 'real_value', 'int': 'int_value', 'bool': 'bool_value'}
+
+
+class ParquetTimeSeriesDatabase(TimeSeriesDatabase):
+    """Time series stored as Parquet files in a directory partitioned by signal id and day, hive style, e.g.
+    path/signal_id=6/day=2021-03-25/part-0.parquet.
+
+    Signal ids and time bounds prune the partitions, and time bounds and comparisons of values to literals are
+    also applied to the row group statistics. Only the columns of the query are read, from memory mapped files.
+    Results are sorted by signal id and timestamp.
+    """
+
+    def __init__(self, path: str, signal_id_column: str = 'signal_id', timestamp_column: str = 'ts',
+                 day_column: Optional[str] = 'day', value_columns: Optional[Dict[str, str]] = None,
+                 partitioning: Optional[ds.Partitioning] = None):
+        super().__init__()
+        self.signal_id_column = signal_id_column
+        self.timestamp_column = timestamp_column
+        self.day_column = day_column
+        self.value_columns = value_columns if value_columns is not None else DEFAULT_VALUE_COLUMNS
+        if partitioning is None:
+            fields = [(signal_id_column, pa.int64())]
+            if day_column is not None:
+                fields.append((day_column, pa.date32()))
+            partitioning = ds.partitioning(pa.schema(fields), flavor='hive')
+        self.dataset = ds.dataset(path, format='parquet', partitioning=partitioning,
+                                  filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> pa.Table:
+        columns = {self.signal_id_column: term_name(tsq.variable_term) + '_signal_id'}
+        if tsq.timestamp_variable is not None:
+            columns[self.timestamp_column] = term_name(tsq.timestamp_variable)
+        if tsq.datatype is not None:
+            value_column = self.value_columns[tsq.datatype]
+            columns[value_column] = term_name(tsq.data_variable) if tsq.data_variable is not None \
+                else tsq.datatype + '_value'
+
+        table = self.dataset.to_table(columns=list(columns.keys()), filter=self.scan_filter(tsq))
+        sort_keys = [(self.signal_id_column, 'ascending')]
+        if self.timestamp_column in columns:
+            sort_keys.append((self.timestamp_column, 'ascending'))
+        table = table.sort_by(sort_keys)
+        if tsq.snapshot and self.timestamp_column in columns:
+            table = last_rows(table, self.signal_id_column)
+
+        table = table.set_column(0, self.signal_id_column, table[self.signal_id_column].cast(pa.int32()))
+        return table.rename_columns([columns[c] for c in table.column_names])
+
+    def scan_filter(self, tsq: TimeSeriesQuery) -> ds.Expression:
+        signal_ids = sorted({int(s) for s in tsq.signal_ids.dropna()}) if tsq.signal_ids is not None else []
+        expression = ds.field(self.signal_id_column).isin(signal_ids)
+
+        if tsq.snapshot:
+            start, end = None, tsq.as_of
+        else:
+            start, end = time_bounds(tsq)
+        timestamp_type = self.dataset.schema.field(self.timestamp_column).type
+        if start is not None:
+            expression = expression & (ds.field(self.timestamp_column) >= timestamp_scalar(start, timestamp_type))
+            if self.day_column is not None:
+                expression = expression & (ds.field(self.day_column) >= start.date())
+        if end is not None:
+            expression = expression & (ds.field(self.timestamp_column) <= timestamp_scalar(end, timestamp_type))
+            if self.day_column is not None:
+                expression = expression & (ds.field(self.day_column) <= end.date())
+
+        # Filters apply to the rows selected by snapshot queries, so they can not be applied when reading
+        if tsq.data_variable is not None and not tsq.snapshot:
+            value_column = self.value_columns[tsq.datatype]
+            value_type = self.dataset.schema.field(value_column).type
+            for e in tsq.literal_expressions:
+                comparison = literal_comparison(e)
+                if comparison is None or comparison[0] != term_name(tsq.data_variable) or \
+                        comparison[1] not in DATASET_COMPARISONS:
+                    continue
+                _, op, value = comparison
+                try:
+                    scalar = pa.scalar(value).cast(value_type)
+                except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError):
+                    continue
+                expression = expression & DATASET_COMPARISONS[op](ds.field(value_column), scalar)
+        return expression
+
+
+def timestamp_scalar(ts: pd.Timestamp, timestamp_type: pa.DataType) -> pa.Scalar:
+    # Timestamps without time zone are stored in UTC
+    if timestamp_type.tz is None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return pa.scalar(ts.to_pydatetime()).cast(timestamp_type)
+
+
+def last_rows(table: pa.Table, signal_id_column: str) -> pa.Table:
+    """Last row of each signal of a table sorted by signal id."""
+    signal_ids = table[signal_id_column].to_numpy()
+    if len(signal_ids) == 0:
+        return table
+    last = np.flatnonzero(np.append(signal_ids[1:] != signal_ids[:-1], True))
+    return table.take(pa.array(last))
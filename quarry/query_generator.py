@@ -12,105 +12,114 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import List, Optional
+
 from rdflib.paths import MulPath
 from rdflib.term import Variable, URIRef, Literal
 
+from .cardinality import CardinalityStatistics, order_triples
 from .classes import Operator, Triple, Term
 
 
-def op_to_query(op: Operator):
+def op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     if op.type == 'SelectQuery':
-        query = select_op_to_query(op)
+        query = select_op_to_query(op, statistics)
     elif op.type == 'Project':
-        query = project_op_to_query(op)
+        query = project_op_to_query(op, statistics)
     elif op.type == 'LeftJoin':
-        query = left_join_op_to_query(op)
+        query = left_join_op_to_query(op, statistics)
     elif op.type == 'Join':
-        query = join_op_to_query(op)
+        query = join_op_to_query(op, statistics)
     elif op.type == 'Filter':
-        query = filter_op_to_query(op)
+        query = filter_op_to_query(op, statistics)
     elif op.type == 'BGP':
-        query = bgp_op_to_query(op)
+        query = bgp_op_to_query(op, statistics)
     elif op.type == 'ToMultiSet':
-        query = to_multiset_to_query(op)
+        query = to_multiset_to_query(op, statistics)
     elif op.type == 'Distinct':
-        query = distinct_to_query(op)
+        query = distinct_to_query(op, statistics)
     else:
         raise NotImplementedError(op.type)
     return query
 
 
-def project_op_to_query(op: Operator):
+def project_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ' '.join(map(lambda x: '?' + str(x.rdflib_term), op.project_vars)) + ' WHERE {\n'
     for c in op.children:
-        query += op_to_query(c)
+        query += op_to_query(c, statistics)
+    for variable_name in sorted(op.values):
+        query += values_string(variable_name, op.values[variable_name])
     query += '}'
     return query
 
 
-def select_op_to_query(op: Operator):
+def select_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = 'SELECT '
     for c in op.children:
-        query += op_to_query(c)
+        query += op_to_query(c, statistics)
     return query
 
 
-def left_join_op_to_query(op: Operator):
+def left_join_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ''
     p1_child = [c for c in op.children if c.name == 'p1'][0]
-    query += op_to_query(p1_child)
+    query += op_to_query(p1_child, statistics)
     p2_child = [c for c in op.children if c.name == 'p2'][0]
     query += 'OPTIONAL {\n'
-    query += op_to_query(p2_child)
+    query += op_to_query(p2_child, statistics)
     query += '}\n'
     return query
 
-def join_op_to_query(op: Operator):
+def join_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ''
     p1_child = [c for c in op.children if c.name == 'p1'][0]
-    query += op_to_query(p1_child)
+    query += op_to_query(p1_child, statistics)
     p2_child = [c for c in op.children if c.name == 'p2'][0]
     query += '{\n'
-    query += op_to_query(p2_child)
+    query += op_to_query(p2_child, statistics)
     query += '}\n'
     return query
 
 
-def bgp_op_to_query(op: Operator):
+def bgp_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ''
-    for t in op.triples:
+    for t in order_triples(op.triples, statistics, triple_string):
         query += triple_string(t)
     if len(op.children) > 0:
         raise NotImplementedError
     return query
 
 
-def filter_op_to_query(op: Operator):
+def filter_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ''
     for c in op.children:
-        query += op_to_query(c)
+        query += op_to_query(c, statistics)
     return query
 
 
-def mulpath_op_to_query(op: Operator):
+def mulpath_op_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ''
     for c in op.children:
-        query += op_to_query(c)
+        query += op_to_query(c, statistics)
     return query
 
-def distinct_to_query(op: Operator):
+def distinct_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = 'SELECT DISTINCT '
     for c in op.children:
-        query += op_to_query(c)
+        query += op_to_query(c, statistics)
     return query
 
 
-def to_multiset_to_query(op:Operator):
+def to_multiset_to_query(op: Operator, statistics: Optional[CardinalityStatistics] = None):
     query = ''
     for c in op.children:
-        query += op_to_query(c)
+        query += op_to_query(c, statistics)
     return query
 
+def values_string(variable_name: str, values: List[int]):
+    return 'VALUES ?' + variable_name + ' { ' + ' '.join(map(str, values)) + ' }\n'
+
+
 def triple_string(triple: Triple):
     return term_string(triple.subject) + ' ' + term_string(triple.verb) + ' ' + term_string(triple.object) + ' .\n'
 
@@ -13,17 +13,23 @@
 # limitations under the License.
 
 import copy
-from typing import List
+from typing import List, Dict
 
 import pandas as pd
+from SPARQLWrapper import SPARQLWrapper
+from rdflib.paths import MulPath, ZeroOrOne, OneOrMore, ZeroOrMore
 from rdflib.term import URIRef, Variable, Literal
 
+from .cardinality import select_bindings
 from .classes import Operator, TermConstraint, Triple, Term
-from .time_series_database import TimeSeriesQuery
+from .time_series_database import TimeSeriesQuery, to_utc_timestamp
 from .type_inference import REAL_VALUE_VERB, BOOL_VALUE_VERB, INT_VALUE_VERB, STRING_VALUE_VERB, TIMESTAMP_VERB
 
 IS_EXTERNAL_VALUE_PROPERTY_URI = 'http://prediktor.com/UA-helpers/#isExternalValue'
 SIGNAL_ID_PROPERTY = 'http://prediktor.com/UA-helpers/#signalId'
+LATEST_TIMESTAMP_URI = 'http://prediktor.com/UA-helpers/#latest'
+SNAPSHOT_TIMESTAMP_SUFFIX = '_snapshot_timestamp'
+TRANSITIVE_CLOSURE_OF_PROPERTY_URI = 'http://prediktor.com/UA-helpers/#transitiveClosureOf'
 
 
 def rewrite_deepcopy_for_sparql_engine(op: Operator):
@@ -37,6 +43,7 @@ def rewrite_deepcopy_for_sparql_engine(op: Operator):
 
     optional_triples = set()
     mandatory_triples = set()
+    is_external_triples = {}
 
     for trip in list(op.triples):
         if TermConstraint.IS_EXTERNAL_UA_VARIABLE_VALUE in trip.subject.constraints and \
@@ -61,9 +68,11 @@ def rewrite_deepcopy_for_sparql_engine(op: Operator):
 
             is_external_variable_property = Term(rdflib_term=URIRef(IS_EXTERNAL_VALUE_PROPERTY_URI))
             is_external_variable = Term(rdflib_term=Variable(str(trip.subject.rdflib_term) + '_is_ext_var'))
-            mandatory_triples.add(Triple(subject=copy.deepcopy(trip.subject),
-                                         verb=is_external_variable_property,
-                                         object=is_external_variable))
+            is_external_triple = Triple(subject=copy.deepcopy(trip.subject),
+                                        verb=is_external_variable_property,
+                                        object=is_external_variable)
+            mandatory_triples.add(is_external_triple)
+            is_external_triples[is_external_triple.subject] = is_external_triple
             signal_id_property = Term(rdflib_term=URIRef(SIGNAL_ID_PROPERTY))
             signal_id_variable = Term(rdflib_term=Variable(str(trip.subject.rdflib_term) + '_signal_id'))
             optional_triples.add(Triple(
@@ -81,27 +90,76 @@ def rewrite_deepcopy_for_sparql_engine(op: Operator):
         filtered_project_vars = [p for p in op.project_vars if
                                  len(p.constraints.intersection({TermConstraint.IS_TIMESTAMP,
                                                                  TermConstraint.IS_EXTERNAL_DATA_VALUE})) == 0]
-        new_op.project_vars = [copy.deepcopy(p) for p in filtered_project_vars] + list(new_project_vars)
+        new_op.project_vars = [copy.deepcopy(p) for p in filtered_project_vars] + \
+                              sorted(new_project_vars, key=lambda t: str(t.rdflib_term))
 
     if len(optional_triples) > 0:
         join_expression_name = new_op.name
         new_op.name = 'p1'
         optional_expression = generate_optional_expression(src_op=new_op, root_name=join_expression_name,
-                                                           triplist=list(optional_triples))
+                                                           triplist=list(optional_triples),
+                                                           is_external_triples=is_external_triples)
 
         return optional_expression, new_project_vars
     else:
         return new_op, new_project_vars
 
 
-def generate_optional_expression(src_op: Operator, root_name: str, triplist: List[Triple]):
-    rhs = Operator(type='BGP', name='p2', triples={triplist[0]}, children=set())
-    if len(triplist) == 1:
-        root_op = Operator(type='LeftJoin', name=root_name, triples=set(), children={src_op, rhs})
-        return root_op
+def generate_optional_expression(src_op: Operator, root_name: str, triplist: List[Triple],
+                                 is_external_triples: Dict[Term, Triple]):
+    """Adds one OPTIONAL group per UA variable value to src_op, in order of the variable names. The group repeats
+    the mandatory isExternalValue triple of the value, so that it matches every solution of src_op and the signal id
+    and data value triples inside it stay optional independently of each other."""
+    subject_triples = {}
+    for t in triplist:
+        subject_triples.setdefault(t.subject, []).append(t)
+
+    groups = []
+    for subject in sorted(subject_triples, key=lambda s: str(s.rdflib_term)):
+        is_external_bgp = Operator(type='BGP', name='p1', triples={copy.deepcopy(is_external_triples[subject])},
+                                   children=set())
+        optional_bgps = [Operator(type='BGP', name='p2', triples={t}, children=set())
+                         for t in sorted(subject_triples[subject], key=lambda t: str(t.verb.rdflib_term))]
+        groups.append(generate_left_join_chain(is_external_bgp, 'p2', optional_bgps))
+    return generate_left_join_chain(src_op, root_name, groups)
+
+
+def generate_left_join_chain(src_op: Operator, root_name: str, optional_ops: List[Operator]):
+    # The OPTIONAL blocks are emitted one after the other in the order of optional_ops
+    op = src_op
+    for i, optional_op in enumerate(optional_ops):
+        name = root_name if i == len(optional_ops) - 1 else 'p1'
+        op = Operator(type='LeftJoin', name=name, triples=set(), children={op, optional_op})
+    return op
+
+
+def load_materialized_closures(sparql_endpoint: SPARQLWrapper) -> Dict[str, str]:
+    """The predicates of the transitive closures materialized by translate, by the predicate they are closures of."""
+    bindings = select_bindings(sparql_endpoint, 'SELECT ?closure ?predicate WHERE { ?closure <' +
+                               TRANSITIVE_CLOSURE_OF_PROPERTY_URI + '> ?predicate }')
+    return {b['predicate']: b['closure'] for b in bindings}
+
+
+def rewrite_materialized_closures(op: Operator, closures: Dict[str, str]):
+    """Replaces the property paths p+ with the materialized closure of p, and p* with an optional closure of p,
+    where closures has a closure of p."""
+    op.triples = {rewrite_materialized_closure(t, closures) for t in op.triples}
+    for c in op.children:
+        rewrite_materialized_closures(c, closures)
+
+
+def rewrite_materialized_closure(triple: Triple, closures: Dict[str, str]) -> Triple:
+    path = triple.verb.rdflib_term
+    if type(path) != MulPath or type(path.path) != URIRef or str(path.path) not in closures:
+        return triple
+    closure = URIRef(closures[str(path.path)])
+    if path.mod == OneOrMore:
+        verb = Term(rdflib_term=closure, constraints=triple.verb.constraints)
+    elif path.mod == ZeroOrMore:
+        verb = Term(rdflib_term=MulPath(closure, ZeroOrOne), constraints=triple.verb.constraints)
     else:
-        lhs = generate_optional_expression(src_op=src_op, root_name='p1', triplist=triplist[1:])
-        return Operator(type='LeftJoin', name=root_name, triples=set(), children={lhs, rhs})
+        return triple
+    return Triple(subject=triple.subject, verb=verb, object=triple.object)
 
 
 def generate_time_series_queries(op: Operator, df: pd.DataFrame, time_series_queries, timestamp_to_query,
@@ -112,7 +170,8 @@ def generate_time_series_queries(op: Operator, df: pd.DataFrame, time_series_que
     for t in op.triples:
         if (TermConstraint.IS_EXTERNAL_UA_VARIABLE_VALUE in t.subject.constraints):
             if t.subject not in time_series_queries:
-                ser = df[str(t.subject.rdflib_term) + '_signal_id']
+                # Without a SPARQL result, the queries are not restricted to signal ids
+                ser = df[str(t.subject.rdflib_term) + '_signal_id'] if df is not None else None
                 time_series_queries[t.subject] = TimeSeriesQuery(t.subject, ser)
 
             q = time_series_queries[t.subject]
@@ -125,7 +184,7 @@ def generate_time_series_queries(op: Operator, df: pd.DataFrame, time_series_que
                     timestamp_to_query[t.object].append(q)
                     q.timestamp_variable = t.object
                 else:
-                    raise NotImplementedError('Timestamp not variable.. ')
+                    set_snapshot(q, t.object)
             elif vrb == REAL_VALUE_VERB:
                 q.datatype = 'real'
                 if type(t.object.rdflib_term) == Variable:
@@ -168,3 +227,20 @@ def generate_time_series_queries(op: Operator, df: pd.DataFrame, time_series_que
             elif e.other in data_to_query:
                 if type(e.expr.rdflib_term) == Literal:
                     data_to_query[e.other].literal_expressions.append(e)
+
+
+def set_snapshot(q: TimeSeriesQuery, timestamp: Term):
+    """A timestamp given as uahelpers:latest or as a dateTime literal selects the latest sample of each signal, at or
+    before the given time. The timestamp of the sample is returned in a variable that is not projected."""
+    if type(timestamp.rdflib_term) == URIRef and timestamp.rdflib_term.toPython() == LATEST_TIMESTAMP_URI:
+        q.as_of = None
+    elif type(timestamp.rdflib_term) == Literal:
+        try:
+            q.as_of = to_utc_timestamp(timestamp.rdflib_term.toPython())
+        except (TypeError, ValueError):
+            raise NotImplementedError('Timestamp literal is not a dateTime: ' + timestamp.rdflib_term.n3())
+    else:
+        raise NotImplementedError('Timestamp not variable, dateTime or uahelpers:latest: ' + str(timestamp.rdflib_term))
+    q.snapshot = True
+    if q.timestamp_variable is None:
+        q.timestamp_variable = Term(rdflib_term=Variable(str(q.variable_term.rdflib_term) + SNAPSHOT_TIMESTAMP_SUFFIX))
@@ -0,0 +1,81 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+from typing import Dict, List
+
+from .classes import Operator
+from .rewrite import generate_time_series_queries
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, literal_comparison, term_name
+
+logger = logging.getLogger(__name__)
+
+MAX_SEMI_JOIN_SIGNALS = 1000
+MAX_SEMI_JOIN_SELECTIVITY = 0.1
+
+
+def plan_semi_joins(op: Operator, time_series_database: TimeSeriesDatabase,
+                    max_signals: int = MAX_SEMI_JOIN_SIGNALS,
+                    max_selectivity: float = MAX_SEMI_JOIN_SELECTIVITY) -> Dict[str, List[int]]:
+    """Finds the signal ids satisfying selective filters on time series data before the SPARQL query is executed.
+
+    Only UA variable values known to be external before the SPARQL query is executed are considered, that is values
+    with an opcua:timestamp triple in the query. For each of these with a filter on its data value, the time series
+    database estimates how many signals match. When at most max_signals match, and at most max_selectivity of the
+    signal_count of the database, the matching signal ids are fetched and returned by the name of the signal id
+    variable, to restrict the SPARQL query with VALUES. Otherwise the SPARQL query is executed first, and the time
+    series filtered afterwards.
+    """
+    probes = {}
+    generate_time_series_queries(op, None, probes, {}, {})
+
+    values = {}
+    for probe in probes.values():
+        if not has_data_expression(probe):
+            continue
+        estimate = time_series_database.estimate_signal_count(probe)
+        if estimate is None or estimate > max_signals:
+            continue
+        total = time_series_database.signal_count()
+        if total is not None and total > 0 and estimate / total > max_selectivity:
+            continue
+
+        signal_ids = time_series_database.matching_signal_ids(probe)
+        if signal_ids is None or len(signal_ids) > max_signals:
+            continue
+        signal_id_variable = term_name(probe.variable_term) + '_signal_id'
+        values[signal_id_variable] = sorted({int(s) for s in signal_ids.dropna()})
+        logger.debug('Restricting ?%s to %d signal ids', signal_id_variable, len(values[signal_id_variable]))
+    return values
+
+
+def has_data_expression(tsq: TimeSeriesQuery) -> bool:
+    if tsq.data_variable is None or tsq.snapshot:
+        return False
+    data_name = term_name(tsq.data_variable)
+    for e in tsq.literal_expressions:
+        comparison = literal_comparison(e)
+        if comparison is not None and comparison[0] == data_name:
+            return True
+    return False
+
+
+def add_values(op: Operator, values: Dict[str, List[int]]):
+    """Adds the values to the outermost group of the rewritten query."""
+    if op.type == 'Project':
+        op.values.update(values)
+        return
+    for c in op.children:
+        add_values(c, values)
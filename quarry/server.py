@@ -0,0 +1,205 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+import json
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from .engine import QueryEngine
+from .sinks import ResultSink, ArrowIPCSink, CSVSink, JSONLinesSink
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+CSV_MEDIA_TYPE = 'text/csv'
+JSON_LINES_MEDIA_TYPE = 'application/x-ndjson'
+
+FORMAT_MEDIA_TYPES = {'arrow': ARROW_STREAM_MEDIA_TYPE, 'csv': CSV_MEDIA_TYPE, 'json': JSON_LINES_MEDIA_TYPE}
+
+
+class QueryServer:
+    """Long-running HTTP query service, sharing one QueryEngine with its connections and pools between all clients.
+
+    Queries are accepted as GET /sparql?query=..., as POST /sparql with a application/sparql-query body, or as
+    POST /sparql with a form encoded query parameter. Results are streamed chunk by chunk as Arrow IPC record
+    batches, or as CSV or newline delimited JSON when requested with format=csv|json or the Accept header.
+    Results are sent with chunked transfer encoding, and when a query fails after the status has been sent the
+    connection is closed without the last chunk, so that clients see an incomplete response.
+    """
+
+    def __init__(self, query_engine: QueryEngine, host: str = '127.0.0.1', port: int = 8000):
+        self.query_engine = query_engine
+        self.httpd = ThreadingHTTPServer((host, port), QueryRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.query_server = self
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return 'http://' + host + ':' + str(port) + '/sparql'
+
+    def serve_forever(self):
+        logger.info('Serving queries at ' + self.url)
+        self.httpd.serve_forever()
+
+    def start(self) -> 'QueryServer':
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'QuarryQueryServer'
+    # Chunked transfer encoding requires HTTP/1.1
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        self.handle_query(url.path, params, query=first_param(params, 'query'))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip()
+        if content_type == 'application/x-www-form-urlencoded':
+            params.update(parse_qs(body))
+            query = first_param(params, 'query')
+        else:
+            query = body
+        self.handle_query(url.path, params, query=query)
+
+    def handle_query(self, path: str, params, query: Optional[str]):
+        if path != '/sparql':
+            self.send_error_json(404, 'Not found: ' + path)
+            return
+        if query is None or query.strip() == '':
+            self.send_error_json(400, 'Missing query')
+            return
+        media_type = self.negotiate_media_type(first_param(params, 'format'))
+        if media_type is None:
+            self.send_error_json(406, 'Supported formats are ' + ', '.join(FORMAT_MEDIA_TYPES))
+            return
+
+        query_engine = self.server.query_server.query_engine
+        try:
+            context = query_engine.execute_static_query(query)
+        except Exception as e:
+            logger.exception('Query failed')
+            self.send_error_json(400, str(e))
+            return
+
+        # The status is sent before the result is produced, errors after this point abort the response
+        self.send_response(200)
+        self.send_header('Content-Type', media_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        body = ChunkedWriter(self.wfile)
+        try:
+            query_engine.write_result_chunks(context, create_sink(media_type, body))
+        except Exception:
+            logger.exception('Query failed while streaming the result')
+            self.close_connection = True
+            return
+        body.finish()
+
+    def negotiate_media_type(self, format_param: Optional[str]) -> Optional[str]:
+        if format_param is not None:
+            return FORMAT_MEDIA_TYPES.get(format_param)
+        accept = self.headers.get('Accept', '*/*')
+        for media_range in accept.split(','):
+            media_type = media_range.split(';')[0].strip()
+            if media_type in FORMAT_MEDIA_TYPES.values():
+                return media_type
+            if media_type in {'*/*', 'application/*'}:
+                return ARROW_STREAM_MEDIA_TYPE
+            if media_type == 'application/json':
+                return JSON_LINES_MEDIA_TYPE
+        return None
+
+    def send_error_json(self, code: int, message: str):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info('%s - %s', self.address_string(), format % args)
+
+
+class ChunkedWriter(io.RawIOBase):
+    """Writes a response body with chunked transfer encoding. The body is only complete after finish, which sends
+    the last, empty chunk."""
+
+    def __init__(self, wfile):
+        super().__init__()
+        self.wfile = wfile
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        size = memoryview(data).nbytes
+        # An empty chunk would end the body
+        if size > 0:
+            self.wfile.write(b'%x\r\n' % size)
+            self.wfile.write(data)
+            self.wfile.write(b'\r\n')
+        return size
+
+    def flush(self):
+        self.wfile.flush()
+
+    def finish(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+
+def create_sink(media_type: str, destination) -> ResultSink:
+    if media_type == ARROW_STREAM_MEDIA_TYPE:
+        return ArrowIPCSink(destination)
+    elif media_type == CSV_MEDIA_TYPE:
+        return CSVSink(destination)
+    elif media_type == JSON_LINES_MEDIA_TYPE:
+        return JSONLinesSink(destination)
+    else:
+        raise NotImplementedError(media_type)
+
+
+def first_param(params, name: str) -> Optional[str]:
+    values = params.get(name)
+    if values is None or len(values) == 0:
+        return None
+    return values[0]
+
+
+def serve(query_engine: QueryEngine, host: str = '127.0.0.1', port: int = 8000):
+    QueryServer(query_engine=query_engine, host=host, port=port).serve_forever()
@@ -0,0 +1,103 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, TimeSeriesResult, time_series_query_key
+
+SPARQL_TOKEN_PATTERN = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|<[^<>\s"{}|^`\\]*>)|(?:\s|#[^\n]*)+')
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with the same key.
+    The first caller runs the function, callers arriving while it is in flight wait for it and share its result, or
+    its exception. Results are shared as is, so callers must treat them as immutable."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Hashable, Future] = {}
+        self.calls = 0
+        self.shared_calls = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            self.calls += 1
+            future = self.in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self.in_flight[key] = future
+            else:
+                self.shared_calls += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+
+class SingleFlightTimeSeriesDatabase(TimeSeriesDatabase):
+    """Coalesces identical time series queries that are in flight at the same time into one call to the wrapped
+    time series database. Arrow record batch streams are read into tables so that they can be shared."""
+
+    def __init__(self, time_series_database: TimeSeriesDatabase):
+        super().__init__()
+        self.time_series_database = time_series_database
+        self.single_flight = SingleFlight()
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        return self.single_flight.do(time_series_query_key(tsq), lambda: self.execute_shareable_query(tsq))
+
+    def execute_shareable_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        result = self.time_series_database.execute_query(tsq)
+        if isinstance(result, pa.RecordBatchReader):
+            result = result.read_all()
+        return result
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery) -> Optional[int]:
+        return self.time_series_database.estimate_signal_count(tsq)
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery) -> Optional[pd.Series]:
+        return self.time_series_database.matching_signal_ids(tsq)
+
+    def signal_count(self) -> Optional[int]:
+        return self.time_series_database.signal_count()
+
+
+def normalize_sparql(sparql: str) -> str:
+    """Collapses whitespace and removes comments outside of string literals and IRIs."""
+
+    def replace(m):
+        if m.group(1) is not None:
+            return m.group(1)
+        return ' '
+
+    return SPARQL_TOKEN_PATTERN.sub(replace, sparql).strip()
@@ -0,0 +1,207 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from abc import ABC, abstractmethod
+from typing import List, Optional, Union, BinaryIO
+
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+
+class ResultSink(ABC):
+    """Receives the result of a query chunk by chunk, see execute_query.
+    The schema of the first non-empty chunk is used for the whole result. Columns without values in it, such as
+    unbound OPTIONAL variables, have no type yet, so chunks are held back until each column has had a value and
+    takes the type of its first chunk with values. Columns without any values are written with the null type."""
+
+    def __init__(self):
+        self.schema: Optional[pa.Schema] = None
+        self.rows_written = 0
+        self.empty_df: Optional[pd.DataFrame] = None
+        self.pending_tables: List[pa.Table] = []
+
+    def write(self, df: pd.DataFrame):
+        if len(df) == 0:
+            self.empty_df = df
+            return
+        if self.schema is None:
+            self.pending_tables.append(pa.Table.from_pandas(df, preserve_index=False))
+            schema = resolve_null_types(self.pending_tables)
+            if not any(pa.types.is_null(f.type) for f in schema):
+                self.open_pending(schema)
+            return
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.write_table(table)
+        self.rows_written += table.num_rows
+
+    def open_pending(self, schema: pa.Schema):
+        self.schema = schema
+        self.open(self.schema)
+        for table in self.pending_tables:
+            self.write_table(table.cast(self.schema))
+            self.rows_written += table.num_rows
+        self.pending_tables = []
+
+    def close(self):
+        if self.schema is None and len(self.pending_tables) > 0:
+            self.open_pending(resolve_null_types(self.pending_tables))
+        if self.schema is None:
+            # Nothing was written, but the output should still be readable and have the columns of the result
+            empty_df = self.empty_df if self.empty_df is not None else pd.DataFrame()
+            self.schema = pa.Table.from_pandas(empty_df, preserve_index=False).schema
+            self.open(self.schema)
+        self.close_writer()
+
+    def abort(self):
+        """Stops writing after an error. The output is left incomplete, or removed when the sink wrote it to a file
+        of its own, so that it can not be mistaken for the whole result."""
+        self.pending_tables = []
+        if self.schema is not None:
+            self.abort_writer()
+
+    def abort_writer(self):
+        pass
+
+    @abstractmethod
+    def open(self, schema: pa.Schema):
+        pass
+
+    @abstractmethod
+    def write_table(self, table: pa.Table):
+        pass
+
+    @abstractmethod
+    def close_writer(self):
+        pass
+
+
+class ParquetSink(ResultSink):
+    """Writes the result to a Parquet file, with at most row_group_size rows per row group."""
+
+    def __init__(self, path: str, row_group_size: Optional[int] = None, compression: str = 'snappy'):
+        super().__init__()
+        self.path = path
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.writer: Optional[pq.ParquetWriter] = None
+
+    def open(self, schema: pa.Schema):
+        self.writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+
+    def write_table(self, table: pa.Table):
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close_writer(self):
+        self.writer.close()
+
+    def abort_writer(self):
+        # The writer can only release the file by writing the footer
+        self.writer.close()
+        os.remove(self.path)
+
+
+class ArrowIPCSink(ResultSink):
+    """Writes the result as an Arrow IPC stream to a path or a binary file-like object, such as a pipe to
+    another process. File-like objects are not closed by the sink."""
+
+    def __init__(self, destination: Union[str, BinaryIO]):
+        super().__init__()
+        self.destination = destination
+        self.file: Optional[BinaryIO] = None
+        self.writer: Optional[ipc.RecordBatchStreamWriter] = None
+
+    def open(self, schema: pa.Schema):
+        if isinstance(self.destination, str):
+            self.file = open(self.destination, 'wb')
+            self.writer = ipc.new_stream(self.file, schema)
+        else:
+            self.writer = ipc.new_stream(self.destination, schema)
+
+    def write_table(self, table: pa.Table):
+        self.writer.write_table(table)
+
+    def close_writer(self):
+        self.writer.close()
+        if self.file is not None:
+            self.file.close()
+
+    def abort_writer(self):
+        # Closing the writer would end the stream with the end-of-stream marker
+        if self.file is not None:
+            self.file.close()
+            os.remove(self.destination)
+
+
+class CSVSink(ResultSink):
+    """Writes the result as CSV with a header to a binary file-like object."""
+
+    def __init__(self, destination: BinaryIO):
+        super().__init__()
+        self.destination = destination
+        self.writer: Optional[pacsv.CSVWriter] = None
+
+    def open(self, schema: pa.Schema):
+        self.writer = pacsv.CSVWriter(self.destination, schema)
+
+    def write_table(self, table: pa.Table):
+        self.writer.write_table(table)
+
+    def close_writer(self):
+        self.writer.close()
+
+
+class JSONLinesSink(ResultSink):
+    """Writes the result as newline delimited JSON objects, one per row, to a binary file-like object.
+    Timestamps are written in ISO 8601 format."""
+
+    def __init__(self, destination: BinaryIO):
+        super().__init__()
+        self.destination = destination
+
+    def open(self, schema: pa.Schema):
+        pass
+
+    def write_table(self, table: pa.Table):
+        lines = [json.dumps(r, default=json_default) + '\n' for r in table.to_pylist()]
+        self.destination.write(''.join(lines).encode('utf-8'))
+
+    def close_writer(self):
+        self.destination.flush()
+
+
+def resolve_null_types(tables: List[pa.Table]) -> pa.Schema:
+    """Schema of the first table, with the null typed fields given the type of the first table with values."""
+    schema = tables[0].schema
+    for i, f in enumerate(schema):
+        if not pa.types.is_null(f.type):
+            continue
+        for table in tables[1:]:
+            field_type = table.schema.field(f.name).type
+            if not pa.types.is_null(field_type):
+                schema = schema.set(i, f.with_type(field_type))
+                break
+    return schema
+
+
+def json_default(o):
+    if hasattr(o, 'isoformat'):
+        return o.isoformat()
+    return str(o)
@@ -0,0 +1,284 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .semi_join import MAX_SEMI_JOIN_SIGNALS
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, ARROW_COMPARISONS, literal_comparison, \
+    term_name, time_bounds
+
+logger = logging.getLogger(__name__)
+
+ARROW_VALUE_TYPES = {'str': pa.string(), 'real': pa.float64(), 'int': pa.int64(), 'bool': pa.bool_()}
+PLACEHOLDERS = {'format': '%s', 'qmark': '?'}
+SIGNAL_ID_BINDINGS = {'array', 'in'}
+SIGNAL_ID_TABLE = 'quarry_signal_ids'
+
+
+@dataclass
+class SQLTableMapping:
+    """Table with one row per sample, and the columns holding the signal id, the timestamp and the value of each
+    datatype. Names are used in the SQL as they are."""
+    table: str = 'TSDATA'
+    signal_id_column: str = 'signal_id'
+    timestamp_column: str = 'ts'
+    value_columns: Dict[str, str] = field(default_factory=lambda: {'str': 'str_value', 'real': 'real_value',
+                                                                   'int': 'int_value', 'bool': 'bool_value'})
+
+
+class SQLTimeSeriesDatabase(TimeSeriesDatabase):
+    """Time series database for SQL databases with a DB-API 2.0 driver, such as psycopg2 or sqlite3.
+
+    Each thread uses its own connection from connect. Signal ids are bound as one array parameter
+    (signal_id_binding='array', '= ANY(%s)' in PostgreSQL) or as a list of parameters ('in'), and sets larger than
+    temp_table_threshold are inserted into a temporary table that is joined instead. Time bounds, and comparisons of
+    values to literals, are pushed down as bound parameters. Timestamps are stored in UTC, as in the sample
+    implementation. Rows are fetched fetch_size at a time, with server side cursors (psycopg2 named cursors) when
+    server_side_cursors is set, and returned as a stream of Arrow record batches.
+    When the engine plans semi joins, the signals matching filters are fetched once, at most estimate_limit + 1 of
+    them, and the number of signals in the table is counted once and kept.
+    """
+
+    def __init__(self, connect: Callable[[], Any], mapping: Optional[SQLTableMapping] = None,
+                 paramstyle: str = 'format', signal_id_binding: str = 'array',
+                 temp_table_threshold: Optional[int] = 10000, fetch_size: int = 10000,
+                 server_side_cursors: bool = False, estimate_limit: int = MAX_SEMI_JOIN_SIGNALS):
+        super().__init__()
+        if paramstyle not in PLACEHOLDERS:
+            raise ValueError('Unsupported paramstyle: ' + paramstyle)
+        if signal_id_binding not in SIGNAL_ID_BINDINGS:
+            raise ValueError('Unsupported signal_id_binding: ' + signal_id_binding)
+        if signal_id_binding == 'array' and paramstyle != 'format':
+            raise ValueError('Array binding of signal ids requires a driver with the format paramstyle')
+        self.connect = connect
+        self.mapping = mapping if mapping is not None else SQLTableMapping()
+        self.placeholder = PLACEHOLDERS[paramstyle]
+        self.signal_id_binding = signal_id_binding
+        self.temp_table_threshold = temp_table_threshold
+        self.fetch_size = fetch_size
+        self.server_side_cursors = server_side_cursors
+        self.estimate_limit = estimate_limit
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.total_signal_count: Optional[int] = None
+
+    def connection(self) -> Any:
+        # DB-API connections may not be shared between threads
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.connect()
+            self.local.connection = connection
+        return connection
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> pa.RecordBatchReader:
+        schema = result_schema(tsq)
+        signal_ids = sorted({int(s) for s in tsq.signal_ids.dropna()}) if tsq.signal_ids is not None else []
+        if len(signal_ids) == 0:
+            return pa.RecordBatchReader.from_batches(schema, [])
+
+        use_signal_id_table = self.temp_table_threshold is not None and len(signal_ids) > self.temp_table_threshold
+        query, params = self.build_query(tsq, signal_ids, use_signal_id_table)
+        logger.debug('Executing time series query: %s', query)
+        batches = self.fetch_batches(query, params, schema, signal_ids if use_signal_id_table else None)
+        return pa.RecordBatchReader.from_batches(schema, batches)
+
+    def build_query(self, tsq: TimeSeriesQuery, signal_ids: List[int],
+                    use_signal_id_table: bool) -> Tuple[str, List[Any]]:
+        m = self.mapping
+        cols = ['t.' + m.signal_id_column]
+        if tsq.timestamp_variable is not None:
+            cols.append('t.' + m.timestamp_column)
+        if tsq.datatype is not None:
+            cols.append('t.' + m.value_columns[tsq.datatype])
+
+        from_clause, conditions, params = self.signal_id_conditions(signal_ids, use_signal_id_table)
+        if tsq.snapshot:
+            if tsq.as_of is not None:
+                conditions.append(f't.{m.timestamp_column} <= {self.placeholder}')
+                params.append(to_naive_utc(tsq.as_of))
+        else:
+            conditions, params = self.add_literal_conditions(tsq, conditions, params)
+
+        where_clause = ' WHERE ' + ' AND '.join(conditions) if len(conditions) > 0 else ''
+        if tsq.snapshot:
+            # The latest row of each signal, filters are applied to the selected rows by the engine
+            query = f'SELECT {", ".join("q." + c[2:] for c in cols)} FROM (' \
+                    f'SELECT {", ".join(cols)}, ROW_NUMBER() OVER (PARTITION BY t.{m.signal_id_column} ' \
+                    f'ORDER BY t.{m.timestamp_column} DESC) AS quarry_row_number ' \
+                    f'FROM {from_clause}{where_clause}) q WHERE q.quarry_row_number = 1'
+        else:
+            query = f'SELECT {", ".join(cols)} FROM {from_clause}{where_clause}'
+        return query, params
+
+    def signal_id_conditions(self, signal_ids: Optional[List[int]],
+                             use_signal_id_table: bool) -> Tuple[str, List[str], List[Any]]:
+        m = self.mapping
+        from_clause = m.table + ' t'
+        conditions = []
+        params = []
+        if signal_ids is None:
+            pass
+        elif use_signal_id_table:
+            from_clause += f' JOIN {SIGNAL_ID_TABLE} s ON t.{m.signal_id_column} = s.signal_id'
+        elif self.signal_id_binding == 'array':
+            conditions.append(f't.{m.signal_id_column} = ANY({self.placeholder})')
+            params.append(signal_ids)
+        else:
+            conditions.append(f't.{m.signal_id_column} IN ({", ".join([self.placeholder] * len(signal_ids))})')
+            params.extend(signal_ids)
+        return from_clause, conditions, params
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery) -> Optional[int]:
+        query, params = self.build_signal_id_query(tsq, f'DISTINCT t.{self.mapping.signal_id_column}')
+        signal_ids = [row[0] for row in self.fetch_all(f'{query} LIMIT {self.estimate_limit + 1}', params)]
+        # The complete set of matching signals is kept for the call to matching_signal_ids that follows
+        self.local.matching = (query, params, signal_ids) if len(signal_ids) <= self.estimate_limit else None
+        return len(signal_ids)
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery) -> Optional[pd.Series]:
+        query, params = self.build_signal_id_query(tsq, f'DISTINCT t.{self.mapping.signal_id_column}')
+        matching = getattr(self.local, 'matching', None)
+        self.local.matching = None
+        if matching is not None and matching[0] == query and matching[1] == params:
+            signal_ids = matching[2]
+        else:
+            signal_ids = [row[0] for row in self.fetch_all(query, params)]
+        return pd.Series(signal_ids, dtype='int64')
+
+    def signal_count(self) -> Optional[int]:
+        with self.lock:
+            if self.total_signal_count is None:
+                m = self.mapping
+                query = f'SELECT COUNT(DISTINCT t.{m.signal_id_column}) FROM {m.table} t'
+                self.total_signal_count = int(self.fetch_all(query, [])[0][0])
+            return self.total_signal_count
+
+    def build_signal_id_query(self, tsq: TimeSeriesQuery, select: str) -> Tuple[str, List[Any]]:
+        signal_ids = sorted({int(s) for s in tsq.signal_ids.dropna()}) if tsq.signal_ids is not None else None
+        from_clause, conditions, params = self.signal_id_conditions(signal_ids, False)
+        conditions, params = self.add_literal_conditions(tsq, conditions, params)
+        where_clause = ' WHERE ' + ' AND '.join(conditions) if len(conditions) > 0 else ''
+        return f'SELECT {select} FROM {from_clause}{where_clause}', params
+
+    def fetch_all(self, query: str, params: Sequence[Any]) -> List[Tuple]:
+        connection = self.connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.rollback()
+
+    def add_literal_conditions(self, tsq: TimeSeriesQuery, conditions: List[str],
+                               params: List[Any]) -> Tuple[List[str], List[Any]]:
+        m = self.mapping
+        start, end = time_bounds(tsq)
+        if start is not None:
+            conditions.append(f't.{m.timestamp_column} >= {self.placeholder}')
+            params.append(to_naive_utc(start))
+        if end is not None:
+            conditions.append(f't.{m.timestamp_column} <= {self.placeholder}')
+            params.append(to_naive_utc(end))
+
+        if tsq.data_variable is not None:
+            data_name = term_name(tsq.data_variable)
+            for e in tsq.literal_expressions:
+                comparison = literal_comparison(e)
+                if comparison is None or comparison[0] != data_name or comparison[1] not in ARROW_COMPARISONS:
+                    continue
+                _, op, value = comparison
+                if isinstance(value, Decimal):
+                    value = float(value)
+                if type(value) not in {int, float, str, bool}:
+                    continue
+                conditions.append(f't.{m.value_columns[tsq.datatype]} {op} {self.placeholder}')
+                params.append(value)
+        return conditions, params
+
+    def fetch_batches(self, query: str, params: Sequence[Any], schema: pa.Schema,
+                      table_signal_ids: Optional[List[int]]) -> Iterator[pa.RecordBatch]:
+        connection = self.connection()
+        try:
+            if table_signal_ids is not None:
+                self.create_signal_id_table(connection, table_signal_ids)
+            if self.server_side_cursors:
+                cursor = connection.cursor(name='quarry_' + uuid.uuid4().hex)
+                cursor.itersize = self.fetch_size
+            else:
+                cursor = connection.cursor()
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(self.fetch_size)
+                    if len(rows) == 0:
+                        break
+                    yield to_record_batch(rows, schema)
+            finally:
+                cursor.close()
+        finally:
+            # Ends the read transaction, and removes the signal ids inserted in it
+            connection.rollback()
+
+    def create_signal_id_table(self, connection: Any, signal_ids: List[int]):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {SIGNAL_ID_TABLE} (signal_id INTEGER PRIMARY KEY)')
+            cursor.execute(f'DELETE FROM {SIGNAL_ID_TABLE}')
+            cursor.executemany(f'INSERT INTO {SIGNAL_ID_TABLE} (signal_id) VALUES ({self.placeholder})',
+                               [(s,) for s in signal_ids])
+        finally:
+            cursor.close()
+
+
+def result_schema(tsq: TimeSeriesQuery) -> pa.Schema:
+    fields = [pa.field(term_name(tsq.variable_term) + '_signal_id', pa.int32())]
+    if tsq.timestamp_variable is not None:
+        fields.append(pa.field(term_name(tsq.timestamp_variable), pa.timestamp('us', tz='UTC')))
+    if tsq.datatype is not None:
+        # Columns without a variable are named as in the sample implementation
+        name = term_name(tsq.data_variable) if tsq.data_variable is not None else tsq.datatype + '_value'
+        fields.append(pa.field(name, ARROW_VALUE_TYPES[tsq.datatype]))
+    return pa.schema(fields)
+
+
+def to_record_batch(rows: List[Tuple], schema: pa.Schema) -> pa.RecordBatch:
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays([to_arrow_array(columns[i], f.type) for i, f in enumerate(schema)],
+                                      schema=schema)
+
+
+def to_arrow_array(values: Sequence[Any], arrow_type: pa.DataType) -> pa.Array:
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Drivers such as sqlite3 return timestamps as text and booleans as integers
+        array = pa.array(values)
+        if pa.types.is_timestamp(arrow_type) and pa.types.is_string(array.type):
+            return pc.assume_timezone(array.cast(pa.timestamp(arrow_type.unit)), arrow_type.tz)
+        return array.cast(arrow_type)
+
+
+def to_naive_utc(ts: pd.Timestamp) -> Any:
+    return ts.tz_convert('UTC').tz_localize(None).to_pydatetime()
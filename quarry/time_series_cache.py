@@ -0,0 +1,226 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, TimeSeriesResult, filter_arrow_table, \
+    term_name, time_bounds, time_range_query, to_arrow_table
+
+SIGNAL_ID_COLUMN = 'signal_id'
+TIMESTAMP_COLUMN = 'ts'
+VALUE_COLUMN = 'value'
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    misses: int = 0
+    uncached_queries: int = 0
+    bytes_fetched: int = 0
+    bytes_saved: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of the signal chunks requested that were found in the cache."""
+        requested = self.hits + self.misses
+        if requested == 0:
+            return 0.0
+        return self.hits / requested
+
+
+class CachingTimeSeriesDatabase(TimeSeriesDatabase):
+    """Caches the results of a time series database in chunks per signal and time bucket.
+
+    Queries with a lower bound on the timestamp are split into buckets of bucket_size, and only the chunks missing from
+    the cache are fetched from the wrapped database, one query per range of consecutive missing buckets. Buckets ending
+    later than finality_lag before now may still receive data, this open tail is fetched again on every query and is
+    not cached. Chunks are evicted least recently used first when they take up more than max_bytes.
+    Snapshot queries and queries without a lower bound on the timestamp are passed on to the wrapped database.
+    """
+
+    def __init__(self, time_series_database: TimeSeriesDatabase, bucket_size: pd.Timedelta = pd.Timedelta(hours=1),
+                 max_bytes: int = 256 * 1024 * 1024, finality_lag: pd.Timedelta = pd.Timedelta(0),
+                 clock: Optional[Callable[[], pd.Timestamp]] = None):
+        super().__init__()
+        self.time_series_database = time_series_database
+        self.bucket_size = pd.Timedelta(bucket_size)
+        self.max_bytes = max_bytes
+        self.finality_lag = pd.Timedelta(finality_lag)
+        self.clock = clock if clock is not None else utc_now
+        self.lock = threading.Lock()
+        self.chunks: 'OrderedDict[Hashable, pa.Table]' = OrderedDict()
+        self.cached_bytes = 0
+        self.statistics = CacheStatistics()
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.statistics.hit_ratio
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.statistics.bytes_saved
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery) -> Optional[int]:
+        return self.time_series_database.estimate_signal_count(tsq)
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery) -> Optional[pd.Series]:
+        return self.time_series_database.matching_signal_ids(tsq)
+
+    def signal_count(self) -> Optional[int]:
+        return self.time_series_database.signal_count()
+
+    def clear(self):
+        with self.lock:
+            self.chunks.clear()
+            self.cached_bytes = 0
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        start, end = time_bounds(tsq)
+        now = self.clock()
+        if end is None or end > now:
+            end = now
+        if tsq.snapshot or start is None or tsq.signal_ids is None or end < start:
+            with self.lock:
+                self.statistics.uncached_queries += 1
+            return self.time_series_database.execute_query(tsq)
+
+        signal_ids = sorted(set(tsq.signal_ids.dropna().astype('int64').tolist()))
+        bucket_starts = list(pd.date_range(start.floor(self.bucket_size), end.floor(self.bucket_size),
+                                           freq=self.bucket_size))
+        if len(signal_ids) == 0 or len(bucket_starts) == 0:
+            with self.lock:
+                self.statistics.uncached_queries += 1
+            return self.time_series_database.execute_query(tsq)
+
+        shape = (tsq.datatype, tsq.data_variable is not None)
+        final_end = now - self.finality_lag
+        tables = {}
+        missing_ranges: Dict[Tuple[pd.Timestamp, pd.Timestamp], List[int]] = {}
+        with self.lock:
+            for signal_id in signal_ids:
+                missing = []
+                for bucket_start in bucket_starts:
+                    chunk = self.chunks.get((shape, signal_id, bucket_start))
+                    if chunk is None:
+                        self.statistics.misses += 1
+                        missing.append(bucket_start)
+                    else:
+                        self.statistics.hits += 1
+                        self.statistics.bytes_saved += chunk.nbytes
+                        self.chunks.move_to_end((shape, signal_id, bucket_start))
+                        tables[(signal_id, bucket_start)] = chunk
+                for missing_range in consecutive_ranges(missing, self.bucket_size):
+                    missing_ranges.setdefault(missing_range, []).append(signal_id)
+
+        for (range_start, range_end), range_signal_ids in missing_ranges.items():
+            fetched = self.fetch_chunks(tsq, range_signal_ids, range_start, range_end)
+            with self.lock:
+                for (signal_id, bucket_start), chunk in fetched.items():
+                    if bucket_start + self.bucket_size <= final_end:
+                        self.store((shape, signal_id, bucket_start), chunk)
+            tables.update(fetched)
+
+        ordered = [tables[k] for k in sorted(tables.keys())]
+        schema = ordered[0].schema
+        table = pa.concat_tables([t if t.schema == schema else t.cast(schema) for t in ordered])
+        return filter_arrow_table(from_canonical(table, tsq), tsq)
+
+    def fetch_chunks(self, tsq: TimeSeriesQuery, signal_ids: List[int], start: pd.Timestamp,
+                     end: pd.Timestamp) -> Dict[Tuple[int, pd.Timestamp], pa.Table]:
+        """Fetches the signals in [start, end) and splits the result into one chunk per signal and bucket,
+        including empty chunks for buckets without data."""
+        range_tsq = time_range_query(tsq, pd.Series(signal_ids, dtype='int64'), start, end)
+        table = to_canonical(to_arrow_table(self.time_series_database.execute_query(range_tsq)), tsq)
+        with self.lock:
+            self.statistics.bytes_fetched += table.nbytes
+
+        table = table.filter(pc.is_valid(table[TIMESTAMP_COLUMN]))
+        timestamp_type = table.schema.field(TIMESTAMP_COLUMN).type
+        timestamps = table[TIMESTAMP_COLUMN].cast(pa.timestamp('ns', tz=timestamp_type.tz)).cast(pa.int64())
+        timestamps = timestamps.to_numpy()
+        table_signal_ids = table[SIGNAL_ID_COLUMN].cast(pa.int64()).fill_null(-1).to_numpy()
+
+        # The wrapped database may return more than was asked for, rows outside of the range are not cached
+        selected = (timestamps >= start.value) & (timestamps < end.value) & np.isin(table_signal_ids, signal_ids)
+        indices = np.nonzero(selected)[0]
+        buckets = (timestamps[indices] - start.value) // self.bucket_size.value
+        order = np.lexsort((timestamps[indices], buckets, table_signal_ids[indices]))
+        indices, buckets, ids = indices[order], buckets[order], table_signal_ids[indices][order]
+
+        n_buckets = int((end - start) / self.bucket_size)
+        bucket_starts = [start + i * self.bucket_size for i in range(n_buckets)]
+        empty = table.slice(0, 0)
+        chunks = {(signal_id, bucket_start): empty for signal_id in signal_ids for bucket_start in bucket_starts}
+        if len(indices) > 0:
+            boundaries = np.flatnonzero((np.diff(ids) != 0) | (np.diff(buckets) != 0)) + 1
+            for group in np.split(np.arange(len(indices)), boundaries):
+                first = group[0]
+                key = (int(ids[first]), bucket_starts[int(buckets[first])])
+                chunks[key] = table.take(pa.array(indices[group]))
+        return chunks
+
+    def store(self, key: Hashable, chunk: pa.Table):
+        if chunk.nbytes > self.max_bytes:
+            return
+        previous = self.chunks.pop(key, None)
+        if previous is not None:
+            self.cached_bytes -= previous.nbytes
+        self.chunks[key] = chunk
+        self.cached_bytes += chunk.nbytes
+        while self.cached_bytes > self.max_bytes:
+            _, evicted = self.chunks.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
+
+
+def utc_now() -> pd.Timestamp:
+    return pd.Timestamp.now(tz='UTC')
+
+
+def consecutive_ranges(bucket_starts: List[pd.Timestamp],
+                       bucket_size: pd.Timedelta) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    ranges = []
+    for bucket_start in bucket_starts:
+        if len(ranges) > 0 and ranges[-1][1] == bucket_start:
+            ranges[-1] = (ranges[-1][0], bucket_start + bucket_size)
+        else:
+            ranges.append((bucket_start, bucket_start + bucket_size))
+    return ranges
+
+
+def column_names(tsq: TimeSeriesQuery) -> Dict[str, str]:
+    names = {SIGNAL_ID_COLUMN: term_name(tsq.variable_term) + '_signal_id',
+             TIMESTAMP_COLUMN: term_name(tsq.timestamp_variable)}
+    if tsq.data_variable is not None:
+        names[VALUE_COLUMN] = term_name(tsq.data_variable)
+    return names
+
+
+def to_canonical(table: pa.Table, tsq: TimeSeriesQuery) -> pa.Table:
+    """Names the columns independently of the variables of the query, so that chunks are shared between queries."""
+    names = column_names(tsq)
+    return pa.Table.from_arrays([table[n] for n in names.values()], names=list(names.keys()))
+
+
+def from_canonical(table: pa.Table, tsq: TimeSeriesQuery) -> pa.Table:
+    names = column_names(tsq)
+    return table.rename_columns([names[c] for c in table.column_names])
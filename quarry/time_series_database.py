@@ -12,12 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import dataclasses
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, Union, Tuple, Any
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from rdflib.term import Variable, Literal
 from .classes import Term, Expression
 from abc import ABC, abstractmethod
 
+TimeSeriesResult = Union[pd.DataFrame, pa.Table, pa.RecordBatchReader]
+
+ARROW_COMPARISONS = {'>=': pc.greater_equal, '>': pc.greater, '<=': pc.less_equal, '<': pc.less, '=': pc.equal}
+FLIPPED_OPS = {'>=': '<=', '>': '<', '<=': '>=', '<': '>', '=': '='}
+
+
 @dataclass
 class TimeSeriesQuery:
     variable_term: Term
@@ -27,6 +37,10 @@ class TimeSeriesQuery:
     data_variable: Optional[Term] = field(default=None)
     literal_expressions: List[Expression] = field(default_factory=list)
     datatype: Optional[str] = field(default=None)
+    # Snapshot queries ask for the latest sample of each signal, at or before as_of when given.
+    # Literal expressions apply to the snapshot, not to the samples the snapshot is selected from.
+    snapshot: bool = field(default=False)
+    as_of: Optional[pd.Timestamp] = field(default=None)
 
 
 class TimeSeriesDatabase(ABC):
@@ -35,5 +49,171 @@ class TimeSeriesDatabase(ABC):
         pass
 
     @abstractmethod
-    def execute_query(self, tsq: TimeSeriesQuery) -> pd.DataFrame:
-        pass
\ No newline at end of file
+    def execute_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        """Executes a time series query.
+
+        Implementations may return a pandas DataFrame, a pyarrow Table or a pyarrow RecordBatchReader.
+        Columns are named after the variables of the query, see the sample implementations in the tests.
+        Arrow results are kept in Arrow until they are joined with the result of the SPARQL query.
+        """
+        pass
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery) -> Optional[int]:
+        """Estimated number of signals with samples satisfying the literal expressions of the time series query.
+        Signal ids of None stand for all signals. Returns None when no estimate is available."""
+        return None
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery) -> Optional[pd.Series]:
+        """Signal ids with samples satisfying the literal expressions of the time series query, or None if the
+        database can not find these. Signal ids of None stand for all signals.
+        Implementing this and estimate_signal_count lets selective filters restrict the SPARQL query."""
+        return None
+
+    def signal_count(self) -> Optional[int]:
+        """Number of signals in the database, or None if not known. Used for the selectivity of filters when semi
+        joins are planned, so it should be cheap, for instance kept after it is first computed."""
+        return None
+
+
+def time_series_query_key(tsq: TimeSeriesQuery) -> Tuple:
+    """Hashable key identifying the result of a time series query.
+    Variable names are part of the key since they name the columns of the result."""
+    signal_ids = tuple(sorted(tsq.signal_ids.dropna().unique().tolist())) if tsq.signal_ids is not None else None
+    expressions = tuple(sorted((e.expr.rdflib_term.n3(), e.op, e.other.rdflib_term.n3())
+                               for e in tsq.literal_expressions))
+    return (term_name(tsq.variable_term), signal_ids, term_name(tsq.timestamp_variable),
+            term_name(tsq.data_variable), tsq.datatype, expressions, tsq.snapshot, tsq.as_of)
+
+
+def term_name(term: Optional[Term]) -> Optional[str]:
+    if term is None:
+        return None
+    return str(term.rdflib_term)
+
+
+def is_arrow_result(result: TimeSeriesResult) -> bool:
+    return isinstance(result, (pa.Table, pa.RecordBatchReader))
+
+
+def to_arrow_table(result: TimeSeriesResult) -> pa.Table:
+    if isinstance(result, pa.Table):
+        return result
+    elif isinstance(result, pa.RecordBatchReader):
+        return result.read_all()
+    elif isinstance(result, pd.DataFrame):
+        return pa.Table.from_pandas(result, preserve_index=False)
+    else:
+        raise NotImplementedError(type(result))
+
+
+def to_dataframe(result: TimeSeriesResult, tsq: TimeSeriesQuery) -> pd.DataFrame:
+    """Converts the result to a DataFrame. A table may be shared with other callers, for instance by
+    SingleFlightTimeSeriesDatabase, so only tables read here from a record batch stream are released while
+    converting."""
+    if isinstance(result, pd.DataFrame):
+        return result
+
+    table = to_arrow_table(result)
+    df = table.to_pandas(split_blocks=True, self_destruct=isinstance(result, pa.RecordBatchReader))
+    signal_id_col = str(tsq.variable_term.rdflib_term) + '_signal_id'
+    if signal_id_col in df.columns.values:
+        df[signal_id_col] = df[signal_id_col].astype(pd.Int32Dtype())
+    return df
+
+
+def snapshot_rows(df: pd.DataFrame, tsq: TimeSeriesQuery) -> pd.DataFrame:
+    """Selects the latest row of each signal, at or before as_of when given.
+    Backends answering snapshot queries directly already return these rows."""
+    timestamp_col = term_name(tsq.timestamp_variable)
+    if timestamp_col not in df.columns.values:
+        return df
+
+    if tsq.as_of is not None:
+        as_of = tsq.as_of
+        if df[timestamp_col].dt.tz is None:
+            as_of = as_of.tz_convert('UTC').tz_localize(None)
+        df = df[df[timestamp_col] <= as_of]
+    signal_id_col = term_name(tsq.variable_term) + '_signal_id'
+    return df.sort_values(timestamp_col, kind='stable').groupby(signal_id_col, sort=False).tail(1)
+
+
+def filter_arrow_table(table: pa.Table, tsq: TimeSeriesQuery) -> pa.Table:
+    """Applies the signal ids and literal expressions of the time series query to an Arrow table.
+    Expressions that cannot be evaluated in Arrow are left to the filter of the integrated result."""
+    signal_id_col = str(tsq.variable_term.rdflib_term) + '_signal_id'
+    if signal_id_col in table.column_names and tsq.signal_ids is not None:
+        signal_ids = pa.array(tsq.signal_ids.dropna().unique().astype('int64'), type=pa.int64())
+        table = table.filter(pc.is_in(table[signal_id_col].cast(pa.int64()), value_set=signal_ids))
+
+    for e in tsq.literal_expressions:
+        comparison = literal_comparison(e)
+        if comparison is None:
+            continue
+        colname, op, value = comparison
+
+        if colname not in table.column_names or op not in ARROW_COMPARISONS:
+            continue
+        try:
+            # Literals such as xsd:decimal do not convert directly to the column type, so we cast them
+            scalar = pa.scalar(value).cast(table[colname].type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError):
+            continue
+        table = table.filter(ARROW_COMPARISONS[op](table[colname], scalar))
+
+    return table
+
+
+def literal_comparison(e: Expression) -> Optional[Tuple[str, str, Any]]:
+    """Variable name, operator and value of an expression comparing a variable to a literal, with the variable on the
+    left hand side, or None for other expressions."""
+    if type(e.expr.rdflib_term) == Variable and type(e.other.rdflib_term) == Literal:
+        return str(e.expr.rdflib_term), e.op, e.other.rdflib_term.toPython()
+    elif type(e.other.rdflib_term) == Variable and type(e.expr.rdflib_term) == Literal:
+        return str(e.other.rdflib_term), FLIPPED_OPS.get(e.op), e.expr.rdflib_term.toPython()
+    return None
+
+
+def to_utc_timestamp(value: Any) -> pd.Timestamp:
+    """Naive timestamps are interpreted as UTC, as in the sample implementations."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def time_bounds(tsq: TimeSeriesQuery) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """Lower and upper bound of the timestamps selected by the literal expressions of the time series query.
+    Bounds are inclusive, strict comparisons are left to the filters applied to the result."""
+    start, end = None, None
+    if tsq.timestamp_variable is None:
+        return start, end
+
+    timestamp_name = term_name(tsq.timestamp_variable)
+    for e in tsq.literal_expressions:
+        comparison = literal_comparison(e)
+        if comparison is None or comparison[0] != timestamp_name:
+            continue
+        _, op, value = comparison
+        try:
+            ts = to_utc_timestamp(value)
+        except (TypeError, ValueError):
+            continue
+        if op in {'>=', '>', '='}:
+            start = ts if start is None else max(start, ts)
+        if op in {'<=', '<', '='}:
+            end = ts if end is None else min(end, ts)
+    return start, end
+
+
+def time_range_query(tsq: TimeSeriesQuery, signal_ids: pd.Series, start: pd.Timestamp,
+                     end: pd.Timestamp) -> TimeSeriesQuery:
+    """Copy of the time series query for the given signals and the timestamps in [start, end).
+    Other literal expressions are left out, so that the result may be reused by queries with other filters."""
+    expressions = [timestamp_expression(tsq, '>=', start), timestamp_expression(tsq, '<', end)]
+    return dataclasses.replace(tsq, signal_ids=signal_ids, literal_expressions=expressions)
+
+
+def timestamp_expression(tsq: TimeSeriesQuery, op: str, ts: pd.Timestamp) -> Expression:
+    """Expression comparing the timestamp variable of the time series query to a timestamp."""
+    return Expression(type='RelationalExpression', expr=tsq.timestamp_variable, op=op,
+                      other=Term(Literal(ts.to_pydatetime())))
@@ -0,0 +1,114 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .classes import Expression
+from .time_series_database import TimeSeriesDatabase, TimeSeriesQuery, TimeSeriesResult, filter_arrow_table, \
+    time_bounds, timestamp_expression, to_arrow_table
+
+
+@dataclass
+class Partition:
+    """Part of a time series query, with the expressions bounding the part of the time range it covers."""
+    tsq: TimeSeriesQuery
+    bound_expressions: List[Expression]
+
+
+class PartitionedTimeSeriesDatabase(TimeSeriesDatabase):
+    """Splits time series queries into partitions that are fetched concurrently from the wrapped database.
+
+    Queries with both a lower and an upper bound on the timestamp are split into time ranges of partition_size,
+    and the signal ids are split into batches of signal_batch_size. Partition size and parallelism are set per
+    wrapped database, to match how it is partitioned and how many concurrent queries it serves well.
+    The results are concatenated in the order of the partitions, by signal batch and then by time, without sorting.
+    """
+
+    def __init__(self, time_series_database: TimeSeriesDatabase, partition_size: Optional[pd.Timedelta] = None,
+                 signal_batch_size: Optional[int] = None, max_workers: int = 4):
+        super().__init__()
+        self.time_series_database = time_series_database
+        self.partition_size = pd.Timedelta(partition_size) if partition_size is not None else None
+        self.signal_batch_size = signal_batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quarry-partition')
+
+    def execute_query(self, tsq: TimeSeriesQuery) -> TimeSeriesResult:
+        partitions = plan_partitions(tsq, self.partition_size, self.signal_batch_size)
+        if len(partitions) == 1:
+            return self.time_series_database.execute_query(tsq)
+
+        futures = [self.executor.submit(self.execute_partition, p) for p in partitions]
+        tables = [f.result() for f in futures]
+        schema = tables[0].schema
+        return pa.concat_tables([t if t.schema == schema else t.cast(schema) for t in tables])
+
+    def execute_partition(self, partition: Partition) -> pa.Table:
+        table = to_arrow_table(self.time_series_database.execute_query(partition.tsq))
+        # Rows outside of the partition are removed, so that no rows are returned twice. Other filters are left to
+        # the engine, since they apply after the rows of snapshot queries are selected.
+        return filter_arrow_table(table, dataclasses.replace(partition.tsq,
+                                                             literal_expressions=partition.bound_expressions))
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery) -> Optional[int]:
+        return self.time_series_database.estimate_signal_count(tsq)
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery) -> Optional[pd.Series]:
+        return self.time_series_database.matching_signal_ids(tsq)
+
+    def signal_count(self) -> Optional[int]:
+        return self.time_series_database.signal_count()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def plan_partitions(tsq: TimeSeriesQuery, partition_size: Optional[pd.Timedelta] = None,
+                    signal_batch_size: Optional[int] = None) -> List[Partition]:
+    """Splits the time series query by signal batches and by time ranges. Every partition keeps the literal
+    expressions of the query, so the first and last time range are bounded as in the query.
+    Snapshot queries are only split by signals."""
+    if signal_batch_size is not None and tsq.signal_ids is not None:
+        signal_ids = tsq.signal_ids.dropna().drop_duplicates().reset_index(drop=True)
+        signal_batches = [signal_ids.iloc[i:i + signal_batch_size].reset_index(drop=True)
+                          for i in range(0, max(len(signal_ids), 1), signal_batch_size)]
+    else:
+        signal_batches = [tsq.signal_ids]
+
+    boundaries = []
+    start, end = time_bounds(tsq)
+    if partition_size is not None and not tsq.snapshot and start is not None and end is not None:
+        boundary = start + partition_size
+        while boundary < end:
+            boundaries.append(boundary)
+            boundary = boundary + partition_size
+
+    partitions = []
+    for signal_batch in signal_batches:
+        for i in range(len(boundaries) + 1):
+            bound_expressions = []
+            if i > 0:
+                bound_expressions.append(timestamp_expression(tsq, '>=', boundaries[i - 1]))
+            if i < len(boundaries):
+                bound_expressions.append(timestamp_expression(tsq, '<', boundaries[i]))
+            partition_tsq = dataclasses.replace(tsq, signal_ids=signal_batch,
+                                                literal_expressions=tsq.literal_expressions + bound_expressions)
+            partitions.append(Partition(tsq=partition_tsq, bound_expressions=bound_expressions))
+    return partitions
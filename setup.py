@@ -38,6 +38,7 @@ setup(
     install_requires=[
         "lxml>=4.6.2", "lxml<5.0",
         "pandas>=1.2.2", "pandas<2.0",
+        "pyarrow>=7.0.0", "pyarrow<16.0",
         "scipy>=1.6.1", "scipy<2.0",
         "SPARQLWrapper>=1.8.5", "SPARQLWrapper<2.0",
         "rdflib>=5.0.0", "rdflib<6.0",
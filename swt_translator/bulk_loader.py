@@ -0,0 +1,166 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Optional, Dict
+
+import pandas as pd
+import requests
+
+from .triples_writer import TriplesSink, term_strings
+
+logger = logging.getLogger(__name__)
+
+GRAPH_STORE_PROTOCOL = 'gsp'
+SPARQL_UPDATE = 'update'
+NTRIPLES_MEDIA_TYPE = 'application/n-triples'
+SPARQL_UPDATE_MEDIA_TYPE = 'application/sparql-update'
+
+DEFAULT_LOAD_BATCH_SIZE = 100000
+DEFAULT_LOAD_RETRIES = 3
+DEFAULT_RETRY_DELAY = 1.0
+RETRIED_STATUS_CODES = {429, 502, 503, 504}
+
+
+class BulkLoader(TriplesSink):
+    """
+    Loads the triples into a SPARQL store as they are added, without writing them to a file first.
+    The triples are sent as N-Triples in batches of batch_size triples, gzip-compressed with compress, by a pool of
+    max_workers threads. With protocol='gsp' the batches are posted to the SPARQL Graph Store Protocol endpoint url,
+    with protocol='update' they are sent as INSERT DATA requests to the SPARQL Update endpoint url.
+    Failed requests are retried up to retries times, waiting retry_delay seconds doubling for each attempt.
+    The triples are loaded into the graph, the default graph if it is None. With namespaces, the triples of each
+    subject are instead loaded into the named graph of the longest of the namespaces its URI starts with, named by
+    the namespace URI itself.
+    """
+
+    def __init__(self, url: str, protocol: str = GRAPH_STORE_PROTOCOL, batch_size: int = DEFAULT_LOAD_BATCH_SIZE,
+                 max_workers: int = 4, compress: bool = True, retries: int = DEFAULT_LOAD_RETRIES,
+                 retry_delay: float = DEFAULT_RETRY_DELAY, graph: Optional[str] = None,
+                 namespaces: Optional[List[str]] = None, timeout: Optional[float] = None):
+        if protocol not in {GRAPH_STORE_PROTOCOL, SPARQL_UPDATE}:
+            raise ValueError('Unsupported protocol ' + protocol)
+        self.url = url
+        self.protocol = protocol
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.compress = compress
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.graph = graph
+        self.namespaces = sorted(namespaces, key=len, reverse=True) if namespaces is not None else None
+        self.timeout = timeout
+        self.triples = 0
+        self.batches = 0
+        self.buffers: Dict[Optional[str], List[str]] = {}
+        self.pending: List[Future] = []
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.local = threading.local()
+
+    def add_svo(self, svo: pd.DataFrame, literal_objects: bool):
+        svo = svo[svo['object'].notna()]
+        if len(svo) == 0:
+            return
+        terms = term_strings(svo, literal_objects)
+        lines = terms['subject'] + ' ' + terms['verb'] + ' ' + terms['object'] + ' .\n'
+        for graph, graph_lines in self.lines_by_graph(terms['subject'], lines):
+            buffer = self.buffers.setdefault(graph, [])
+            buffer.extend(graph_lines.tolist())
+            while len(buffer) >= self.batch_size:
+                self.submit(graph, buffer[:self.batch_size])
+                del buffer[:self.batch_size]
+
+    def lines_by_graph(self, subjects: pd.Series, lines: pd.Series):
+        if self.namespaces is None:
+            yield self.graph, lines
+            return
+        unassigned = pd.Series(True, index=subjects.index)
+        for namespace in self.namespaces:
+            in_namespace = unassigned & subjects.str.startswith('<' + namespace, na=False)
+            if in_namespace.any():
+                yield namespace, lines[in_namespace]
+                unassigned &= ~in_namespace
+        if unassigned.any():
+            yield self.graph, lines[unassigned]
+
+    def submit(self, graph: Optional[str], lines: List[str]):
+        # Bounds the batches waiting to be sent, and thereby the memory use, to twice the number of workers
+        while len(self.pending) >= 2 * self.max_workers:
+            done, not_done = wait(self.pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                f.result()
+            self.pending = list(not_done)
+        self.pending.append(self.executor.submit(self.send_batch, graph, ''.join(lines)))
+        self.triples += len(lines)
+        self.batches += 1
+
+    def flush(self):
+        """Sends the remaining triples and waits until all batches are loaded."""
+        for graph, buffer in self.buffers.items():
+            if len(buffer) > 0:
+                self.submit(graph, buffer)
+        self.buffers = {}
+        pending, self.pending = self.pending, []
+        for f in pending:
+            f.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown()
+
+    def send_batch(self, graph: Optional[str], ntriples: str):
+        if self.protocol == GRAPH_STORE_PROTOCOL:
+            params = {'graph': graph} if graph is not None else {'default': ''}
+            body = ntriples
+            content_type = NTRIPLES_MEDIA_TYPE
+        else:
+            params = {}
+            if graph is not None:
+                ntriples = 'GRAPH <' + graph + '> {\n' + ntriples + '}\n'
+            body = 'INSERT DATA {\n' + ntriples + '}'
+            content_type = SPARQL_UPDATE_MEDIA_TYPE
+        data = body.encode('utf-8')
+        headers = {'Content-Type': content_type}
+        if self.compress:
+            data = gzip.compress(data)
+            headers['Content-Encoding'] = 'gzip'
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session().post(self.url, params=params, data=data, headers=headers,
+                                               timeout=self.timeout)
+                if response.status_code not in RETRIED_STATUS_CODES:
+                    response.raise_for_status()
+                    return
+                error = requests.HTTPError('Status ' + str(response.status_code) + ' from ' + self.url,
+                                           response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.retries:
+                raise error
+            logger.warning('Retrying batch after failed attempt ' + str(attempt + 1) + ': ' + str(error))
+            time.sleep(self.retry_delay * 2 ** attempt)
+
+    def session(self) -> requests.Session:
+        # Sessions keep connections alive, each thread uses its own
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
@@ -0,0 +1,84 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import numpy as np
+import pandas as pd
+from opcua_tools import has_subtype_references
+from scipy.sparse import csr_matrix, identity
+
+
+def subtype_closure(type_nodes: pd.DataFrame, type_references: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reflexive and transitive closure of the HasSubtype references between the type nodes, with the columns
+    supertype and subtype. Every node referring or referred to by type_references is a subtype of itself.
+    The closure is computed once for all types as reachability in a boolean sparse matrix over the node ids.
+    """
+    subtype_references = has_subtype_references(type_references, type_nodes, 'id')
+    nodes = pd.Index(pd.concat([type_references['Src'], type_references['Trg']], ignore_index=True).drop_duplicates())
+    reachable = reachability(src_codes=nodes.get_indexer(subtype_references['Src']),
+                             trg_codes=nodes.get_indexer(subtype_references['Trg']), size=len(nodes)).tocoo()
+    return pd.DataFrame({'supertype': nodes[reachable.row], 'subtype': nodes[reachable.col]})
+
+
+def reachability(src_codes: np.ndarray, trg_codes: np.ndarray, size: int) -> csr_matrix:
+    """
+    Boolean matrix where the element (i, j) is set if node j is reachable from node i through zero or more of the
+    edges from src_codes to trg_codes. Squaring the matrix doubles the path lengths covered, so a hierarchy of depth
+    d takes log2(d) sparse products.
+    """
+    adjacency = csr_matrix((np.ones(len(src_codes), dtype=bool), (src_codes, trg_codes)), shape=(size, size))
+    reachable = (adjacency + identity(size, dtype=bool, format='csr')).astype(bool)
+    while True:
+        squared = (reachable @ reachable).astype(bool)
+        if squared.nnz == reachable.nnz:
+            return squared
+        reachable = squared
+
+
+def transitive_closure(src_codes: np.ndarray, trg_codes: np.ndarray, size: int) -> csr_matrix:
+    """Boolean matrix where the element (i, j) is set if node j is reachable from node i through one or more edges."""
+    adjacency = csr_matrix((np.ones(len(src_codes), dtype=bool), (src_codes, trg_codes)), shape=(size, size))
+    return (adjacency @ reachability(src_codes, trg_codes, size)).astype(bool)
+
+
+def closure_pairs(subjects: pd.Series, objects: pd.Series) -> pd.DataFrame:
+    """The subject and object pairs of the transitive closure of the edges from subjects to objects."""
+    codes, nodes = pd.factorize(pd.concat([subjects.astype(object), objects.astype(object)], ignore_index=True))
+    closure = transitive_closure(src_codes=codes[:len(subjects)], trg_codes=codes[len(subjects):],
+                                 size=len(nodes)).tocoo()
+    return pd.DataFrame({'subject': nodes[closure.row], 'object': nodes[closure.col]})
+
+
+def expand_closure(df: pd.DataFrame, on: str, closure_df: pd.DataFrame, closure_on: str) -> pd.DataFrame:
+    """
+    Replaces each row of df by one row for each row of closure_df where closure_on equals on, with the other columns
+    of closure_df in place of on. Equivalent to an inner join, but computed as one sparse product of a matrix
+    selecting the key of each row of df and a matrix selecting the rows of closure_df with each key.
+    """
+    keys = pd.Index(closure_df[closure_on].drop_duplicates())
+    row_keys = keys.get_indexer(df[on])
+    matched = np.flatnonzero(row_keys >= 0)
+    rows = csr_matrix((np.ones(len(matched), dtype=bool), (matched, row_keys[matched])),
+                      shape=(len(df), len(keys)))
+    closure_rows = csr_matrix((np.ones(len(closure_df), dtype=bool),
+                               (keys.get_indexer(closure_df[closure_on]), np.arange(len(closure_df)))),
+                              shape=(len(keys), len(closure_df)))
+    product = rows @ closure_rows
+    product.sort_indices()
+
+    df_positions = np.repeat(np.arange(len(df)), np.diff(product.indptr))
+    expanded = df.drop(columns=[on]).iloc[df_positions].reset_index(drop=True)
+    closure_columns = closure_df.drop(columns=[closure_on]).iloc[product.indices].reset_index(drop=True)
+    return pd.concat([expanded, closure_columns], axis=1)
@@ -12,53 +12,74 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from operator import attrgetter
 from typing import List, Dict, Any
 
+import numpy as np
 import pandas as pd
 from opcua_tools.ua_data_types import *
-from rdflib import Graph, URIRef, RDF, RDFS, Literal, Namespace
+from rdflib import Graph, RDF, RDFS, Namespace
 
 from .classes import TriplesDfs
+from .closure import closure_pairs
 from .swt_builder import lowerfirst
+from .triples_writer import TriplesSink, GraphTriplesSink
+
+# The UA types with literal values, the verb of their triples and the dtype of their raw values
+VALUE_VERBS = [(UAInteger, 'hasIntegerValue', 'int64'),
+               (UAFloatingPoint, 'hasFloatValue', 'float64'),
+               (UAString, 'hasStringValue', object)]
 
 
 def build_type_graph(triples_dfs: TriplesDfs, namespaces: List[str]) -> Graph:
-    g = Graph()
+    sink = GraphTriplesSink()
+    write_type_triples(triples_dfs=triples_dfs, namespaces=namespaces, sink=sink)
+    return sink.g
+
+
+def write_type_triples(triples_dfs: TriplesDfs, namespaces: List[str], sink: TriplesSink):
     namespace_dict = create_namespace_dict(namespaces)
     type_uri_df = triples_dfs.type_uri_df.set_index('id')
-    add_type_hierarchy(type_df=triples_dfs.type_df, type_uri_df=type_uri_df, namespace_dict=namespace_dict, g=g)
+    add_type_hierarchy(type_df=triples_dfs.type_df, type_uri_df=type_uri_df, namespace_dict=namespace_dict, sink=sink)
     add_reference_type_hierarchy(reference_type_df=triples_dfs.reference_type_df, type_uri_df=type_uri_df,
-                                 namespace_dict=namespace_dict, g=g)
-
-    return g
+                                 namespace_dict=namespace_dict, sink=sink)
 
 
 def build_instance_graph(triples_dfs: TriplesDfs, namespaces: List[str], params_dict: Dict[str, Any]) -> Graph:
-    g = Graph()
+    sink = GraphTriplesSink()
+    write_instance_triples(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict, sink=sink)
+    return sink.g
 
+
+def write_instance_triples(triples_dfs: TriplesDfs, namespaces: List[str], params_dict: Dict[str, Any],
+                           sink: TriplesSink):
+    """Writes the triples of the instances to the sink, one frame of triples at a time."""
     namespace_dict = create_namespace_dict(namespaces=namespaces)
     instance_uri_df = triples_dfs.instance_uri_df.set_index('id')
     type_uri_df = triples_dfs.type_uri_df.set_index('id')
-    add_typing(typing_df=triples_dfs.typing_df, instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, g=g,
+    add_typing(typing_df=triples_dfs.typing_df, instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, sink=sink,
                namespace_dict=namespace_dict)
-    add_attributes(node_attributes_dfs=triples_dfs.node_attributes_dfs, instance_uri_df=instance_uri_df, g=g,
+    add_attributes(node_attributes_dfs=triples_dfs.node_attributes_dfs, instance_uri_df=instance_uri_df, sink=sink,
                    namespace_dict=namespace_dict)
-    add_values(values_df=triples_dfs.values_df, instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, g=g,
+    add_values(values_df=triples_dfs.values_df, instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, sink=sink,
                namespace_dict=namespace_dict)
 
     add_references(references_df=triples_dfs.references_df,
-                   instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, g=g, namespace_dict=namespace_dict)
+                   instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, sink=sink, namespace_dict=namespace_dict)
+
+    if params_dict.get('closure_predicates'):
+        add_reference_closures(references_df=triples_dfs.references_df, instance_uri_df=instance_uri_df,
+                               type_uri_df=type_uri_df, sink=sink, namespace_dict=namespace_dict,
+                               closure_predicates=params_dict['closure_predicates'])
 
     add_is_external_variable(is_external_variable_df=triples_dfs.is_external_variable_df,
-                             instance_uri_df=instance_uri_df, g=g,
+                             instance_uri_df=instance_uri_df, sink=sink,
                              namespace_dict=namespace_dict)
 
     if triples_dfs.signal_id_df is not None:
-        add_signal_ids(signal_id_df=triples_dfs.signal_id_df, instance_uri_df=instance_uri_df, g=g,
+        add_signal_ids(signal_id_df=triples_dfs.signal_id_df, instance_uri_df=instance_uri_df, sink=sink,
                        namespace_dict=namespace_dict)
 
-    return g
-
 
 def create_namespace_dict(namespaces: List[str]) -> Dict[int, Namespace]:
     namespace_dict = {}
@@ -81,162 +102,213 @@ def attach_uri(df: pd.DataFrame, uri_df: pd.DataFrame, index_from_col: str, uri_
     return df
 
 
-def add_svo_to_graph(svo: pd.DataFrame, g: Graph):
-    tuples = svo[['subject', 'verb', 'object']].to_records(index=False).tolist()
-    for t in tuples:
-        g.add(t)
+def create_uri_in_namespace(df: pd.DataFrame, ns_col: str, uri_col: str,
+                            namespace_dict: Dict[int, Namespace]) -> pd.Series:
+    """
+    Creates the URIs of the names in uri_col in the namespaces in ns_col as a categorical Series of strings.
+    Each distinct pair of namespace and name is concatenated once, the rows only hold codes into the URIs.
+    """
+    if len(df) == 0:
+        return pd.Series(pd.Categorical([]), index=df.index, dtype='category')
+    pair_codes, pairs = pd.MultiIndex.from_arrays([df[ns_col], df[uri_col]]).factorize()
+    prefixes = pairs.get_level_values(0).map({ns: str(namespace_dict[ns]) for ns in namespace_dict})
+    uri_codes, uris = pd.factorize(prefixes.str.cat(pairs.get_level_values(1)))
+    return pd.Series(pd.Categorical.from_codes(uri_codes[pair_codes], categories=uris), index=df.index)
 
 
-def create_uriref_in_namespace(df, ns_col, uri_col, namespace_dict):
-    out = pd.Series(index=df.index)
-    for ns in df[ns_col].unique():
-        is_in_ns = df[ns_col] == ns
-        ns_obj = namespace_dict[ns]
-        out.loc[is_in_ns] = df.loc[is_in_ns, uri_col].map(lambda x: ns_obj[x])
-
-    return out
+def append_to_uri(uris: pd.Series, suffix: str) -> pd.Series:
+    return uris.cat.rename_categories(lambda uri: uri + suffix)
 
 
 def add_type_hierarchy(type_df: pd.DataFrame, type_uri_df: pd.DataFrame, namespace_dict: Dict[int, Namespace],
-                       g: Graph):
+                       sink: TriplesSink):
     type_df = attach_uri(df=type_df, uri_df=type_uri_df, index_from_col='subtype', uri_col_rename='subtype_uri')
     type_df = attach_uri(df=type_df, uri_df=type_uri_df, index_from_col='supertype', uri_col_rename='supertype_uri')
-    type_df['subject'] = create_uriref_in_namespace(type_df, 'subtype_ns', 'subtype_uri', namespace_dict)
-    type_df['verb'] = RDFS.subClassOf
-    type_df['object'] = create_uriref_in_namespace(type_df, 'supertype_ns', 'supertype_uri', namespace_dict)
+    type_df['subject'] = create_uri_in_namespace(type_df, 'subtype_ns', 'subtype_uri', namespace_dict)
+    type_df['verb'] = str(RDFS.subClassOf)
+    type_df['object'] = create_uri_in_namespace(type_df, 'supertype_ns', 'supertype_uri', namespace_dict)
 
-    add_svo_to_graph(svo=type_df, g=g)
+    sink.add_svo(type_df, literal_objects=False)
 
 
 def add_reference_type_hierarchy(reference_type_df: pd.DataFrame, type_uri_df: pd.DataFrame,
-                                 namespace_dict: Dict[int, Namespace], g: Graph):
+                                 namespace_dict: Dict[int, Namespace], sink: TriplesSink):
     reference_type_df = attach_uri(df=reference_type_df, uri_df=type_uri_df, index_from_col='subtype',
                                    uri_col_rename='subtype_uri')
     reference_type_df = attach_uri(df=reference_type_df, uri_df=type_uri_df, index_from_col='supertype',
                                    uri_col_rename='supertype_uri')
-    reference_type_df['subject'] = create_uriref_in_namespace(reference_type_df, 'subtype_ns', 'subtype_uri',
+    reference_type_df['subject'] = create_uri_in_namespace(reference_type_df, 'subtype_ns', 'subtype_uri',
                                                               namespace_dict)
-    reference_type_df['verb'] = RDFS.subPropertyOf
-    reference_type_df['object'] = create_uriref_in_namespace(reference_type_df, 'supertype_ns', 'supertype_uri',
+    reference_type_df['verb'] = str(RDFS.subPropertyOf)
+    reference_type_df['object'] = create_uri_in_namespace(reference_type_df, 'supertype_ns', 'supertype_uri',
                                                              namespace_dict)
 
-    add_svo_to_graph(svo=reference_type_df, g=g)
+    sink.add_svo(reference_type_df, literal_objects=False)
 
 
-def add_typing(typing_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame, g: Graph,
+def add_typing(typing_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame, sink: TriplesSink,
                namespace_dict: Dict[int, Namespace]):
     typing_df = attach_uri(df=typing_df, uri_df=instance_uri_df, index_from_col='id', uri_col_rename=None)
     typing_df = attach_uri(df=typing_df, uri_df=type_uri_df, index_from_col='type', uri_col_rename='type_uri')
-    typing_df['subject'] = create_uriref_in_namespace(typing_df, 'ns', 'uri', namespace_dict)
-    typing_df['verb'] = RDF.type
-    typing_df['object'] = create_uriref_in_namespace(typing_df, 'type_ns', 'type_uri', namespace_dict)
+    typing_df['subject'] = create_uri_in_namespace(typing_df, 'ns', 'uri', namespace_dict)
+    typing_df['verb'] = str(RDF.type)
+    typing_df['object'] = create_uri_in_namespace(typing_df, 'type_ns', 'type_uri', namespace_dict)
 
-    add_svo_to_graph(svo=typing_df, g=g)
+    sink.add_svo(typing_df, literal_objects=False)
 
 
-def add_attributes(node_attributes_dfs: Dict[str, pd.DataFrame], instance_uri_df: pd.DataFrame, g: Graph,
+def add_attributes(node_attributes_dfs: Dict[str, pd.DataFrame], instance_uri_df: pd.DataFrame, sink: TriplesSink,
                    namespace_dict: Dict[int, Namespace]):
     for a in node_attributes_dfs:
         df = node_attributes_dfs[a]
         df = attach_uri(df=df, uri_df=instance_uri_df, index_from_col='id', uri_col_rename=None)
-        df['subject'] = create_uriref_in_namespace(df, 'ns', 'uri', namespace_dict)
-        df['verb'] = namespace_dict[0][lowerfirst(a)]
+        df['subject'] = create_uri_in_namespace(df, 'ns', 'uri', namespace_dict)
+        df['verb'] = str(namespace_dict[0][lowerfirst(a)])
         df['object'] = df['attribute']
 
         if a == 'BrowseNameNamespace':
-            namespace_uriref_dict = {i: URIRef(namespace_dict[i]) for i in namespace_dict}
-            df['object'] = df['object'].map(namespace_uriref_dict)
+            namespace_uri_dict = {i: str(namespace_dict[i]) for i in namespace_dict}
+            df['object'] = df['object'].map(namespace_uri_dict)
+            sink.add_svo(df, literal_objects=False)
         else:
-            df['object'] = df['object'].map(Literal)
-
-        add_svo_to_graph(svo=df, g=g)
+            sink.add_svo(df, literal_objects=True)
 
 
-def add_values(values_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame, g: Graph,
+def add_values(values_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame, sink: TriplesSink,
                namespace_dict: Dict[int, Namespace]):
     UA_VALUE = 'value'
     values_df = attach_uri(df=values_df, uri_df=instance_uri_df, index_from_col='id',
                            uri_col_rename=None)
 
     # hasValueReference
-    values_df['subject'] = create_uriref_in_namespace(values_df, 'ns', 'uri', namespace_dict)
-    values_df['verb'] = namespace_dict[0][UA_VALUE]
-    values_df['object'] = values_df['subject'] + '_Value'
-    add_svo_to_graph(svo=values_df, g=g)
+    values_df['subject'] = create_uri_in_namespace(values_df, 'ns', 'uri', namespace_dict)
+    values_df['verb'] = str(namespace_dict[0][UA_VALUE])
+    values_df['object'] = append_to_uri(values_df['subject'], '_Value')
+    sink.add_svo(values_df, literal_objects=False)
 
-    values_df['value_full_uri'] = values_df['object']
+    value_uris = values_df['object'].reset_index(drop=True)
+    values = values_df['Value'].reset_index(drop=True)
 
     # values_df = attach_uri(df=values_df, uri_df=type_uri_df, index_from_col='DataType', uri_col_rename='DataType_uri')
     # #value_typing
     # values_df['subject'] = values_df['value_full_uri']
-    # values_df['verb'] = RDF.type
-    # values_df['object'] = create_uriref_in_namespace(values_df, 'DataType_ns', 'DataType_uri', namespace_dict)
-    # add_svo_to_graph(svo=values_df, g=g)
-
-    # hasIntegerValue
-    is_integer = values_df['Value'].map(lambda x: issubclass(type(x), UAInteger) and x.value is not None)
-    integer_values_df = values_df[is_integer].copy()
-    integer_values_df['subject'] = integer_values_df['value_full_uri']
-    integer_values_df['verb'] = namespace_dict[0]['hasIntegerValue']
-    integer_values_df['object'] = integer_values_df['Value'].map(lambda x: Literal(x.value))
-    add_svo_to_graph(svo=integer_values_df, g=g)
-
-    # hasFloatValue
-    is_float = values_df['Value'].map(lambda x: issubclass(type(x), UAFloatingPoint) and x.value is not None)
-    float_values_df = values_df[is_float].copy()
-    float_values_df['subject'] = float_values_df['value_full_uri']
-    float_values_df['verb'] = namespace_dict[0]['hasFloatValue']
-    float_values_df['object'] = float_values_df['Value'].map(lambda x: Literal(x.value))
-    add_svo_to_graph(svo=float_values_df, g=g)
-
-    # hasStringValue
-    is_string = values_df['Value'].map(lambda x: issubclass(type(x), UAString) and x.value is not None)
-    string_values_df = values_df[is_string].copy()
-    string_values_df['subject'] = string_values_df['value_full_uri']
-    string_values_df['verb'] = namespace_dict[0]['hasStringValue']
-    string_values_df['object'] = string_values_df['Value'].map(lambda x: Literal(x.value))
-    add_svo_to_graph(svo=string_values_df, g=g)
+    # values_df['verb'] = str(RDF.type)
+    # values_df['object'] = create_uri_in_namespace(values_df, 'DataType_ns', 'DataType_uri', namespace_dict)
+    # sink.add_svo(values_df, literal_objects=False)
+
+    # hasIntegerValue, hasFloatValue and hasStringValue
+    value_verbs = classify_values(values)
+    for _, verb, dtype in VALUE_VERBS:
+        is_verb = (value_verbs == verb).to_numpy()
+        raw_values = extract_raw_values(values[is_verb], dtype)
+        sink.add_svo(pd.DataFrame({'subject': value_uris.loc[raw_values.index],
+                                   'verb': str(namespace_dict[0][verb]), 'object': raw_values}),
+                     literal_objects=True)
 
     # EngineeringUnitsValue
-    has_engineering_units = ~values_df['EngineeringUnitsValue'].isna()
-    engineering_units_values_df = values_df[has_engineering_units].copy()
-    engineering_units_values_df['subject'] = engineering_units_values_df['value_full_uri']
-    engineering_units_values_df['verb'] = namespace_dict[0]['hasEngineeringUnit']
-    engineering_units_values_df['object'] = engineering_units_values_df['EngineeringUnitsValue'].map(
-        lambda x: Literal(x.display_name.text))
-    add_svo_to_graph(svo=engineering_units_values_df, g=g)
-
-
-def add_references(references_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame, g: Graph,
-                   namespace_dict: Dict[int, Namespace]):
+    engineering_units = values_df['EngineeringUnitsValue'].reset_index(drop=True)
+    has_engineering_units = engineering_units.notna().to_numpy()
+    sink.add_svo(pd.DataFrame({'subject': value_uris[has_engineering_units],
+                               'verb': str(namespace_dict[0]['hasEngineeringUnit']),
+                               'object': engineering_units[has_engineering_units].map(lambda x: x.display_name.text)}),
+                 literal_objects=True)
+
+
+def classify_values(values: pd.Series) -> pd.Series:
+    """
+    The verb of the literal triple of each value, found once for each type of value. Values without a literal triple,
+    such as arrays (UAListOf), structures and missing values, get None.
+    """
+    types = values.map(type)
+    return types.map({t: value_verb(t) for t in types.unique()})
+
+
+def value_verb(value_type: type) -> Optional[str]:
+    for ua_type, verb, _ in VALUE_VERBS:
+        if issubclass(value_type, ua_type):
+            return verb
+    return None
+
+
+def extract_raw_values(values: pd.Series, dtype) -> pd.Series:
+    """The raw values of the UA values as a typed Series, without the values that are None."""
+    # An object array keeps None apart from NaN
+    raw_values = pd.Series(np.frompyfunc(attrgetter('value'), 1, 1)(values.to_numpy(dtype=object)),
+                           index=values.index, dtype=object)
+    raw_values = raw_values[np.not_equal(raw_values.to_numpy(), None)]
+    try:
+        return raw_values.astype(dtype)
+    except (OverflowError, TypeError, ValueError):
+        # For instance unsigned 64 bit integers not fitting in int64, the values are then formatted one by one
+        return raw_values
+
+
+def add_references(references_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame,
+                   sink: TriplesSink, namespace_dict: Dict[int, Namespace]):
+    references_df = create_references_svo(references_df=references_df, instance_uri_df=instance_uri_df,
+                                          type_uri_df=type_uri_df, namespace_dict=namespace_dict)
+    sink.add_svo(references_df, literal_objects=False)
+
+
+def add_reference_closures(references_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame,
+                           sink: TriplesSink, namespace_dict: Dict[int, Namespace], closure_predicates: List[str]):
+    """
+    Materializes the transitive closures of the references with the closure_predicates, so that property paths
+    p+ can be answered by looking up a single predicate. The closure of p is added with the predicate
+    uahelpers:<name of p>_closure, which is related to p by uahelpers:transitiveClosureOf.
+    """
+    references_df = create_references_svo(references_df=references_df, instance_uri_df=instance_uri_df,
+                                          type_uri_df=type_uri_df, namespace_dict=namespace_dict)
+    closure_uris = [closure_predicate_uri(p, namespace_dict) for p in closure_predicates]
+    if len(set(closure_uris)) < len(closure_uris):
+        raise ValueError('Predicates with the same name can not be materialized together: ' + str(closure_predicates))
+
+    for predicate, closure_uri in zip(closure_predicates, closure_uris):
+        predicate_references = references_df[references_df['verb'].astype(object) == predicate]
+        closure_df = closure_pairs(predicate_references['subject'], predicate_references['object'])
+        closure_df['verb'] = closure_uri
+        sink.add_svo(closure_df, literal_objects=False)
+
+    closure_of_df = pd.DataFrame({'subject': closure_uris, 'object': closure_predicates})
+    closure_of_df['verb'] = str(namespace_dict[-1]['transitiveClosureOf'])
+    sink.add_svo(closure_of_df, literal_objects=False)
+
+
+def closure_predicate_uri(predicate: str, namespace_dict: Dict[int, Namespace]) -> str:
+    name = predicate.rsplit('#', 1)[-1].rsplit('/', 1)[-1]
+    return str(namespace_dict[-1][name + '_closure'])
+
+
+def create_references_svo(references_df: pd.DataFrame, instance_uri_df: pd.DataFrame, type_uri_df: pd.DataFrame,
+                          namespace_dict: Dict[int, Namespace]) -> pd.DataFrame:
     references_df = attach_uri(df=references_df, uri_df=instance_uri_df, index_from_col='src', uri_col_rename='src_uri')
     references_df = attach_uri(df=references_df, uri_df=instance_uri_df, index_from_col='trg', uri_col_rename='trg_uri')
     references_df = attach_uri(df=references_df, uri_df=type_uri_df, index_from_col='reference_type',
                                uri_col_rename='reference_type_uri')
-    references_df['subject'] = create_uriref_in_namespace(references_df, 'src_ns', 'src_uri', namespace_dict)
-    references_df['verb'] = create_uriref_in_namespace(references_df, 'reference_type_ns', 'reference_type_uri',
+    references_df['subject'] = create_uri_in_namespace(references_df, 'src_ns', 'src_uri', namespace_dict)
+    references_df['verb'] = create_uri_in_namespace(references_df, 'reference_type_ns', 'reference_type_uri',
                                                        namespace_dict)
-    references_df['object'] = create_uriref_in_namespace(references_df, 'trg_ns', 'trg_uri', namespace_dict)
-
-    add_svo_to_graph(svo=references_df, g=g)
+    references_df['object'] = create_uri_in_namespace(references_df, 'trg_ns', 'trg_uri', namespace_dict)
+    return references_df
 
 
-def add_is_external_variable(is_external_variable_df: pd.DataFrame, instance_uri_df: pd.DataFrame, g: Graph,
+def add_is_external_variable(is_external_variable_df: pd.DataFrame, instance_uri_df: pd.DataFrame, sink: TriplesSink,
                              namespace_dict: Dict[int, Namespace]):
     is_external_variable_df = attach_uri(df=is_external_variable_df, uri_df=instance_uri_df, index_from_col='id',
                                          uri_col_rename='uri')
-    is_external_variable_df['subject'] = create_uriref_in_namespace(is_external_variable_df, 'ns', 'uri',
-                                                                    namespace_dict) + '_Value'
-    is_external_variable_df['verb'] = namespace_dict[-1]['isExternalValue']
-    is_external_variable_df['object'] = is_external_variable_df['is_external_variable'].map(Literal)
-    add_svo_to_graph(svo=is_external_variable_df, g=g)
+    is_external_variable_df['subject'] = append_to_uri(
+        create_uri_in_namespace(is_external_variable_df, 'ns', 'uri', namespace_dict), '_Value')
+    is_external_variable_df['verb'] = str(namespace_dict[-1]['isExternalValue'])
+    is_external_variable_df['object'] = is_external_variable_df['is_external_variable']
+    sink.add_svo(is_external_variable_df, literal_objects=True)
 
 
-def add_signal_ids(signal_id_df: pd.DataFrame, instance_uri_df: pd.DataFrame, g: Graph,
+def add_signal_ids(signal_id_df: pd.DataFrame, instance_uri_df: pd.DataFrame, sink: TriplesSink,
                    namespace_dict: Dict[int, Namespace]):
     signal_id_df = attach_uri(df=signal_id_df, uri_df=instance_uri_df, index_from_col='id', uri_col_rename='uri')
-    signal_id_df['subject'] = create_uriref_in_namespace(signal_id_df, 'ns', 'uri', namespace_dict) + '_Value'
-    signal_id_df['verb'] = namespace_dict[-1]['signalId']
-    signal_id_df['object'] = signal_id_df['signal_id'].map(Literal)
+    signal_id_df['subject'] = append_to_uri(create_uri_in_namespace(signal_id_df, 'ns', 'uri', namespace_dict),
+                                            '_Value')
+    signal_id_df['verb'] = str(namespace_dict[-1]['signalId'])
+    signal_id_df['object'] = signal_id_df['signal_id']
 
-    add_svo_to_graph(svo=signal_id_df, g=g)
+    sink.add_svo(signal_id_df, literal_objects=True)
@@ -0,0 +1,123 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Callable, Optional
+
+import pandas as pd
+
+from .classes import TriplesDfs
+from .graph_builder import create_namespace_dict, add_typing, add_attributes, add_values, add_references, \
+    add_is_external_variable, add_signal_ids, add_reference_closures
+from .triples_writer import StreamingTriplesWriter
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+DEFAULT_PARTITION_SIZE = 1000000
+
+
+@dataclass
+class ShardTask:
+    """One call of a graph builder function, writing its triples to the shard file."""
+    file: str
+    function: Callable
+    kwargs: Dict[str, Any]
+
+
+@dataclass
+class Shard:
+    file: str
+    triples: int
+
+
+def write_instance_shards(triples_dfs: TriplesDfs, namespaces: List[str], params_dict: Dict[str, Any],
+                          output_dir: str, max_workers: Optional[int] = None,
+                          partition_size: int = DEFAULT_PARTITION_SIZE, compress: bool = True) -> str:
+    """
+    Writes the triples of the instances to N-Triples shards in output_dir using a pool of max_workers processes.
+    The builder functions run in parallel, and frames with more than partition_size rows are split into several
+    shards. Returns the path of the manifest listing the shards, see read_manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = create_shard_tasks(triples_dfs=triples_dfs, params_dict=params_dict, partition_size=partition_size,
+                               extension='.nt.gz' if compress else '.nt')
+    logger.info('Writing ' + str(len(tasks)) + ' shards to ' + output_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(write_shard, task, namespaces, output_dir) for task in tasks]
+        shards = [f.result() for f in futures]
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(manifest_path, 'w') as f:
+        json.dump({'format': 'nt', 'shards': [asdict(s) for s in shards]}, f, indent=1)
+    return manifest_path
+
+
+def read_manifest(manifest_path: str) -> List[str]:
+    """Paths of the shard files listed in the manifest."""
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    output_dir = os.path.dirname(manifest_path)
+    return [os.path.join(output_dir, s['file']) for s in manifest['shards']]
+
+
+def create_shard_tasks(triples_dfs: TriplesDfs, params_dict: Dict[str, Any], partition_size: int,
+                       extension: str) -> List[ShardTask]:
+    instance_uri_df = triples_dfs.instance_uri_df.set_index('id')
+    type_uri_df = triples_dfs.type_uri_df.set_index('id')
+
+    def tasks_for(name: str, function: Callable, frame: pd.DataFrame,
+                  to_kwargs: Callable[[pd.DataFrame], Dict[str, Any]]) -> List[ShardTask]:
+        return [ShardTask(file=name + '-' + str(i) + extension, function=function, kwargs=to_kwargs(partition))
+                for i, partition in enumerate(partition_frame(frame, partition_size))]
+
+    tasks = tasks_for('typing', add_typing, triples_dfs.typing_df,
+                      lambda df: {'typing_df': df, 'instance_uri_df': instance_uri_df, 'type_uri_df': type_uri_df})
+    for a in triples_dfs.node_attributes_dfs:
+        tasks += tasks_for('attribute-' + a, add_attributes, triples_dfs.node_attributes_dfs[a],
+                           lambda df, a=a: {'node_attributes_dfs': {a: df}, 'instance_uri_df': instance_uri_df})
+    tasks += tasks_for('values', add_values, triples_dfs.values_df,
+                       lambda df: {'values_df': df, 'instance_uri_df': instance_uri_df, 'type_uri_df': type_uri_df})
+    tasks += tasks_for('references', add_references, triples_dfs.references_df,
+                       lambda df: {'references_df': df, 'instance_uri_df': instance_uri_df,
+                                   'type_uri_df': type_uri_df})
+    if params_dict.get('closure_predicates'):
+        # The closures need all references at once, so they are not partitioned
+        tasks.append(ShardTask(file='reference_closures' + extension, function=add_reference_closures,
+                               kwargs={'references_df': triples_dfs.references_df, 'instance_uri_df': instance_uri_df,
+                                       'type_uri_df': type_uri_df,
+                                       'closure_predicates': params_dict['closure_predicates']}))
+    tasks += tasks_for('is_external', add_is_external_variable, triples_dfs.is_external_variable_df,
+                       lambda df: {'is_external_variable_df': df, 'instance_uri_df': instance_uri_df})
+    if triples_dfs.signal_id_df is not None:
+        tasks += tasks_for('signal_ids', add_signal_ids, triples_dfs.signal_id_df,
+                           lambda df: {'signal_id_df': df, 'instance_uri_df': instance_uri_df})
+    return tasks
+
+
+def partition_frame(df: pd.DataFrame, partition_size: int) -> List[pd.DataFrame]:
+    # An empty frame still gets a shard, so that every builder function runs once
+    return [df.iloc[start:start + partition_size] for start in range(0, max(len(df), 1), partition_size)]
+
+
+def write_shard(task: ShardTask, namespaces: List[str], output_dir: str) -> Shard:
+    namespace_dict = create_namespace_dict(namespaces=namespaces)
+    with StreamingTriplesWriter(os.path.join(output_dir, task.file), format='nt') as writer:
+        task.function(**task.kwargs, sink=writer, namespace_dict=namespace_dict)
+    return Shard(file=task.file, triples=writer.triples)
@@ -0,0 +1,147 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from dataclasses import fields
+from typing import List, Dict, Any, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .classes import TriplesDfs
+
+logger = logging.getLogger(__name__)
+
+# Part of every key, increment when the cached frames change
+CACHE_VERSION = 1
+PICKLED_COLUMNS_METADATA = b'swt_translator.pickled_columns'
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class TranslationCache:
+    """
+    On-disk cache of parsed NodeSet2 files and of TriplesDfs, stored as Parquet files under cache_dir.
+    Parsed files are keyed by the content of the file and the namespaces, so that only changed files are parsed
+    again. TriplesDfs are keyed by the content of all files, the namespaces, the signal ids and the translation
+    parameters, since the integer identifiers in them are assigned across all files.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def parse_xml_file(self, xml_file: str, namespaces: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # Imported here, as xml_parser uses the cache
+        from .xml_parser import parse_xml_file
+
+        entry_dir = self.entry_dir('files', [file_hash(xml_file), namespaces])
+        if os.path.exists(entry_dir):
+            logger.info('Reading parsed ' + xml_file + ' from cache')
+            return read_frame(os.path.join(entry_dir, 'nodes.parquet')), \
+                read_frame(os.path.join(entry_dir, 'references.parquet'))
+
+        nodes, references = parse_xml_file(xml_file, namespaces)
+        self.write_entry(entry_dir, {'nodes': nodes, 'references': references})
+        return nodes, references
+
+    def triples_dfs_key(self, xml_files: List[str], namespaces: List[str], params_dict: Dict[str, Any],
+                        signal_id_csv: Optional[str]) -> List[Any]:
+        return [[file_hash(f) for f in sorted(xml_files)], namespaces, sorted(params_dict.items()),
+                file_hash(signal_id_csv) if signal_id_csv is not None else None]
+
+    def read_triples_dfs(self, key: List[Any]) -> Optional[TriplesDfs]:
+        entry_dir = self.entry_dir('triples', key)
+        if not os.path.exists(entry_dir):
+            return None
+        logger.info('Reading triples DataFrames from cache')
+        frames = {}
+        for f in fields(TriplesDfs):
+            if f.name == 'node_attributes_dfs':
+                attributes_dir = os.path.join(entry_dir, f.name)
+                frames[f.name] = {name[:-len('.parquet')]: read_frame(os.path.join(attributes_dir, name))
+                                  for name in sorted(os.listdir(attributes_dir))}
+            else:
+                path = os.path.join(entry_dir, f.name + '.parquet')
+                frames[f.name] = read_frame(path) if os.path.exists(path) else None
+        return TriplesDfs(**frames)
+
+    def write_triples_dfs(self, key: List[Any], triples_dfs: TriplesDfs):
+        frames = {}
+        for f in fields(TriplesDfs):
+            value = getattr(triples_dfs, f.name)
+            if f.name == 'node_attributes_dfs':
+                frames.update({os.path.join(f.name, a): df for a, df in value.items()})
+            elif value is not None:
+                frames[f.name] = value
+        self.write_entry(self.entry_dir('triples', key), frames, subdirs=['node_attributes_dfs'])
+
+    def entry_dir(self, kind: str, key: List[Any]) -> str:
+        digest = hashlib.sha256(json.dumps([CACHE_VERSION, key], sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, kind, digest)
+
+    def write_entry(self, entry_dir: str, frames: Dict[str, pd.DataFrame], subdirs: Optional[List[str]] = None):
+        # Written to a temporary directory first, so that concurrent runs never read a partial entry
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir))
+        try:
+            for subdir in subdirs or []:
+                os.makedirs(os.path.join(tmp_dir, subdir))
+            for name, df in frames.items():
+                write_frame(df, os.path.join(tmp_dir, name + '.parquet'))
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            if not os.path.exists(entry_dir):
+                raise
+            # Another run wrote the same entry
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_frame(df: pd.DataFrame, path: str):
+    """Writes the frame to Parquet. Object columns holding other values than strings, such as parsed OPC UA
+    values or missing values, are stored pickled so that they are read back unchanged."""
+    df = df.copy()
+    pickled_columns = []
+    for c in df.columns:
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=False) != 'string':
+            df[c] = df[c].map(pickle.dumps)
+            pickled_columns.append(c)
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[PICKLED_COLUMNS_METADATA] = json.dumps(pickled_columns).encode('utf-8')
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    table = pq.read_table(path)
+    df = table.to_pandas()
+    for c in json.loads(table.schema.metadata[PICKLED_COLUMNS_METADATA].decode('utf-8')):
+        df[c] = df[c].map(pickle.loads)
+    return df
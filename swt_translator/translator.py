@@ -12,34 +12,124 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .graph_builder import build_instance_graph
+from .bulk_loader import BulkLoader
+from .graph_builder import build_instance_graph, write_instance_triples
 from .graph_builder import build_type_graph
+from .sharded_writer import write_instance_shards
 from .swt_builder import build_swt
+from .triples_writer import StreamingTriplesWriter, triples_format
+from .translation_cache import TranslationCache
+from .triples_delta import TriplesFrameSink, compute_delta, read_triples, write_triples, write_delta, \
+    update_requests, send_update_requests
+from .xml_parser import parse_xml_dir_parallel, list_xml_files, merge_namespaces, read_namespace_uris
 from typing import List, Optional
 import pandas as pd
 from opcua_tools import parse_xml_dir, parse_nodeid
+from SPARQLWrapper import SPARQLWrapper
 
 
-def translate(xml_dir: str, namespaces: List[str], output_ttl_file: str, output_owl_file: Optional[str] = None,
+def translate(xml_dir: str, namespaces: List[str], output_ttl_file: Optional[str], output_owl_file: Optional[str] = None,
               subclass_closure: bool = False, subproperty_closure: bool = False,
-              signal_id_csv: Optional[str] = None):
-    parse_dict = parse_xml_dir(xmldir=xml_dir, namespaces=namespaces)
+              signal_id_csv: Optional[str] = None, streaming: bool = False, sharded: bool = False,
+              max_workers: Optional[int] = None, parallel_parsing: bool = False, cache_dir: Optional[str] = None,
+              previous_triples: Optional[str] = None, update_endpoint: Optional[SPARQLWrapper] = None,
+              loader: Optional[BulkLoader] = None, closure_predicates: Optional[List[str]] = None):
+    """
+    Translates the OPC UA information model in the xml files of xml_dir to a knowledge base. The transitive closures
+    of the references with the closure_predicates, given as full URIs, are materialized, see add_reference_closures.
+    With streaming, the triples are written directly to output_ttl_file instead of through an rdflib Graph, as
+    N-Triples when the file name ends with .nt or .nt.gz and otherwise as Turtle. Files ending with .gz are
+    gzip-compressed.
+    With sharded, output_ttl_file is a directory, and the triples are written to gzip-compressed N-Triples shards
+    in it by max_workers processes, along with a manifest.json listing the shards.
+    With parallel_parsing, the xml files are parsed by max_workers processes.
+    With a cache_dir, parsed xml files and the resulting triples DataFrames are cached there as Parquet files, and
+    only changed files are parsed again, see TranslationCache.
+    With previous_triples, the path of a Parquet file holding the triples of the previous run, the translation is
+    incremental: only the triples added and removed since then are written to output_ttl_file, as an RDF Patch, and
+    sent to update_endpoint as batches of DELETE DATA and INSERT DATA requests if it is given. The triples of this
+    run then replace those in previous_triples.
+    With a loader, the triples are loaded directly into a SPARQL store by it, and output_ttl_file must be None.
+    Only one of streaming, sharded, previous_triples and loader may be given, otherwise a ValueError is raised.
+    """
+    check_output_options(output_ttl_file=output_ttl_file, streaming=streaming, sharded=sharded,
+                         previous_triples=previous_triples, update_endpoint=update_endpoint, loader=loader)
     params_dict = {'subclass_closure': subclass_closure,
-                   'subproperty_closure': subproperty_closure}
-    if signal_id_csv is not None:
-        signal_id_df = pd.read_csv(signal_id_csv)
-        signal_id_df['NodeId'] = signal_id_df['NodeId'].map(parse_nodeid)
-        signal_id_df['ns'] = signal_id_df['NodeId'].map(lambda x: x.namespace)
-        signal_id_df['signal_id'] = signal_id_df['signal_id'].astype(pd.Int32Dtype())
-    else:
-        signal_id_df = None
+                   'subproperty_closure': subproperty_closure,
+                   'closure_predicates': closure_predicates if closure_predicates is not None else []}
+    cache = TranslationCache(cache_dir) if cache_dir is not None else None
+    triples_dfs = None
+    if cache is not None:
+        xml_files = list_xml_files(xml_dir, namespaces)
+        namespaces = merge_namespaces(namespaces, [read_namespace_uris(f) for f in xml_files])
+        triples_dfs_key = cache.triples_dfs_key(xml_files, namespaces, params_dict, signal_id_csv)
+        triples_dfs = cache.read_triples_dfs(triples_dfs_key)
+
+    if triples_dfs is None:
+        if parallel_parsing or cache is not None:
+            parse_dict = parse_xml_dir_parallel(xml_dir=xml_dir, namespaces=namespaces,
+                                                max_workers=max_workers if parallel_parsing else 1, cache=cache)
+            # Namespaces of the files missing from namespaces are added, as parse_xml_dir does
+            namespaces = parse_dict['namespaces']
+        else:
+            parse_dict = parse_xml_dir(xmldir=xml_dir, namespaces=namespaces)
+        signal_id_df = read_signal_id_csv(signal_id_csv) if signal_id_csv is not None else None
 
-    triples_dfs = build_swt(nodes=parse_dict['nodes'], references=parse_dict['references'],
-                            lookup_df=parse_dict['lookup_df'], signal_id_df=signal_id_df, params_dict=params_dict)
+        triples_dfs = build_swt(nodes=parse_dict['nodes'], references=parse_dict['references'],
+                                lookup_df=parse_dict['lookup_df'], signal_id_df=signal_id_df,
+                                params_dict=params_dict)
+        if cache is not None:
+            cache.write_triples_dfs(triples_dfs_key, triples_dfs)
 
-    g = build_instance_graph(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict)
-    g.serialize(destination=output_ttl_file, format='ttl', encoding='utf-8')
+    if loader is not None:
+        with loader:
+            write_instance_triples(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict,
+                                   sink=loader)
+    elif previous_triples is not None:
+        with TriplesFrameSink() as sink:
+            write_instance_triples(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict, sink=sink)
+        triples = sink.triples()
+        delta = compute_delta(previous=read_triples(previous_triples), current=triples)
+        write_delta(delta, output_ttl_file)
+        if update_endpoint is not None:
+            send_update_requests(update_endpoint, update_requests(delta))
+        write_triples(triples, previous_triples)
+    elif sharded:
+        write_instance_shards(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict,
+                              output_dir=output_ttl_file, max_workers=max_workers)
+    elif streaming:
+        with StreamingTriplesWriter(output_ttl_file, format=triples_format(output_ttl_file)) as writer:
+            write_instance_triples(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict,
+                                   sink=writer)
+    else:
+        g = build_instance_graph(triples_dfs=triples_dfs, namespaces=namespaces, params_dict=params_dict)
+        g.serialize(destination=output_ttl_file, format='ttl', encoding='utf-8')
 
     if output_owl_file is not None:
         g2 = build_type_graph(triples_dfs=triples_dfs, namespaces=namespaces)
         g2.serialize(destination=output_owl_file, format='pretty-xml', encoding='utf-8')
+
+
+def check_output_options(output_ttl_file: Optional[str], streaming: bool, sharded: bool,
+                         previous_triples: Optional[str], update_endpoint: Optional[SPARQLWrapper],
+                         loader: Optional[BulkLoader]):
+    """Raises a ValueError when the options select more than one way of writing the triples."""
+    selected = [name for name, is_selected in [('streaming', streaming), ('sharded', sharded),
+                                               ('previous_triples', previous_triples is not None),
+                                               ('loader', loader is not None)] if is_selected]
+    if len(selected) > 1:
+        raise ValueError('Options can not be combined: ' + ', '.join(selected))
+    if update_endpoint is not None and previous_triples is None:
+        raise ValueError('update_endpoint requires previous_triples')
+    if loader is not None and output_ttl_file is not None:
+        raise ValueError('output_ttl_file is not written with a loader and must be None')
+    if loader is None and output_ttl_file is None:
+        raise ValueError('output_ttl_file is required without a loader')
+
+
+def read_signal_id_csv(signal_id_csv: str) -> pd.DataFrame:
+    signal_id_df = pd.read_csv(signal_id_csv)
+    signal_id_df['NodeId'] = signal_id_df['NodeId'].map(parse_nodeid)
+    signal_id_df['ns'] = signal_id_df['NodeId'].map(lambda x: x.namespace)
+    signal_id_df['signal_id'] = signal_id_df['signal_id'].astype(pd.Int32Dtype())
+    return signal_id_df
@@ -13,13 +13,13 @@
 # limitations under the License.
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 
 import pandas as pd
-from opcua_tools import subtypes_of_nodes, has_type_definition_references, \
-    has_property_references, signal_variables
+from opcua_tools import has_type_definition_references, has_property_references, signal_variables
 
 from .classes import TriplesDfs
+from .closure import subtype_closure, expand_closure
 
 logger = logging.getLogger(__name__)
 cl = logging.StreamHandler()
@@ -43,8 +43,10 @@ def build_triples_dfs(inst_nodes: pd.DataFrame, inst_references: pd.DataFrame, i
     :return:
     """
 
-    type_df = create_type_df(type_nodes=type_nodes, type_references=type_references)
-    reference_type_df = create_reference_type_df(type_nodes=type_nodes, type_references=type_references)
+    # The closure of the type hierarchy is shared by the object, variable and reference types
+    subtypes = subtype_closure(type_nodes=type_nodes, type_references=type_references)
+    type_df = create_type_df(type_nodes=type_nodes, subtypes=subtypes)
+    reference_type_df = create_reference_type_df(type_nodes=type_nodes, subtypes=subtypes)
     typing_df = create_typing_df(inst_nodes=inst_nodes, inst_references=inst_references,
                                  type_nodes=type_nodes, type_df=type_df,
                                  subclass_closure=params_dict['subclass_closure'])
@@ -66,30 +68,26 @@ def build_triples_dfs(inst_nodes: pd.DataFrame, inst_references: pd.DataFrame, i
                       signal_id_df=signal_id_df)
 
 
-def create_type_df(type_nodes: pd.DataFrame, type_references: pd.DataFrame) -> pd.DataFrame:
+def create_type_df(type_nodes: pd.DataFrame, subtypes: pd.DataFrame) -> pd.DataFrame:
     logger.info('Started creating type DataFrame')
     type_nodes_v_o = \
         type_nodes[(type_nodes['NodeClass'] == 'UAVariableType') | (type_nodes['NodeClass'] == 'UAObjectType')][
             'id'].to_list()
-    subtypes = subtypes_of_nodes(type_nodes_v_o, type_nodes, type_references)
-    subtypes = subtypes.rename(columns={'type': 'supertype'})[['supertype', 'subtype']]
-    typenode_nses_sub = type_nodes[['id', 'ns']].rename(columns={'id': 'subtype', 'ns': 'subtype_ns'}).set_index(
-        'subtype')
-    typenode_nses_sup = type_nodes[['id', 'ns']].rename(columns={'id': 'supertype', 'ns': 'supertype_ns'}).set_index(
-        'supertype')
-
-    subtypes = subtypes.set_index('subtype').join(typenode_nses_sub).reset_index()
-    subtypes = subtypes.set_index('supertype').join(typenode_nses_sup).reset_index()
-    subtypes = subtypes[['supertype_ns', 'supertype', 'subtype_ns', 'subtype']].copy()
+    subtypes = subtypes_with_namespaces(type_nodes_v_o, type_nodes, subtypes)
     logger.info('Finished creating instance DataFrame')
     return subtypes
 
 
-def create_reference_type_df(type_nodes: pd.DataFrame, type_references: pd.DataFrame) -> pd.DataFrame:
+def create_reference_type_df(type_nodes: pd.DataFrame, subtypes: pd.DataFrame) -> pd.DataFrame:
     logger.info('Started creating reference type DataFrame')
     type_nodes_r = type_nodes[(type_nodes['NodeClass'] == 'UAReferenceType')]['id'].to_list()
-    subtypes = subtypes_of_nodes(type_nodes_r, type_nodes, type_references)
-    subtypes = subtypes.rename(columns={'type': 'supertype'})[['supertype', 'subtype']]
+    subtypes = subtypes_with_namespaces(type_nodes_r, type_nodes, subtypes)
+    logger.info('Finished creating reference type DataFrame')
+    return subtypes
+
+
+def subtypes_with_namespaces(supertypes: List[int], type_nodes: pd.DataFrame, subtypes: pd.DataFrame) -> pd.DataFrame:
+    subtypes = subtypes[subtypes['supertype'].isin(pd.Index(supertypes))]
     typenode_nses_sub = type_nodes[['id', 'ns']].rename(
         columns={'id': 'subtype', 'ns': 'subtype_ns'}).set_index('subtype')
     typenode_nses_sup = type_nodes[['id', 'ns']].rename(
@@ -97,10 +95,7 @@ def create_reference_type_df(type_nodes: pd.DataFrame, type_references: pd.DataF
 
     subtypes = subtypes.set_index('subtype').join(typenode_nses_sub).reset_index()
     subtypes = subtypes.set_index('supertype').join(typenode_nses_sup).reset_index()
-    subtypes = subtypes[['supertype_ns', 'supertype', 'subtype_ns', 'subtype']].copy()
-
-    logger.info('Finished creating reference type DataFrame')
-    return subtypes
+    return subtypes[['supertype_ns', 'supertype', 'subtype_ns', 'subtype']].copy()
 
 
 def create_typing_df(inst_nodes: pd.DataFrame, inst_references: pd.DataFrame,
@@ -119,8 +114,8 @@ def create_typing_df(inst_nodes: pd.DataFrame, inst_references: pd.DataFrame,
         inst_nodes = inst_nodes.astype(int)
 
     if subclass_closure:
-        inst_nodes = inst_nodes.drop(columns=['type_ns'])
-        inst_nodes = inst_nodes.set_index('type').join(type_df.set_index('subtype')).reset_index(drop=True)
+        inst_nodes = expand_closure(inst_nodes.drop(columns=['type_ns']), on='type',
+                                    closure_df=type_df[['subtype', 'supertype', 'supertype_ns']], closure_on='subtype')
         inst_nodes = inst_nodes.rename(columns={'supertype': 'type', 'supertype_ns': 'type_ns'})
         inst_nodes = inst_nodes[['id', 'ns', 'type', 'type_ns']]
 
@@ -157,10 +152,9 @@ def create_references_df(inst_references: pd.DataFrame, type_nodes: pd.DataFrame
     only_inst_refs = only_inst_refs[['src_ns', 'src', 'trg_ns', 'trg', 'reference_type_ns', 'reference_type']]
 
     if subproperty_closure:
-        only_inst_refs = only_inst_refs.drop(columns=['reference_type_ns'])
-        only_inst_refs = only_inst_refs.set_index('reference_type').join(
-            reference_type_df.set_index('subtype')).reset_index(
-            drop=True)
+        only_inst_refs = expand_closure(only_inst_refs.drop(columns=['reference_type_ns']), on='reference_type',
+                                        closure_df=reference_type_df[['subtype', 'supertype', 'supertype_ns']],
+                                        closure_on='subtype')
         only_inst_refs = only_inst_refs.rename(
             columns={'supertype': 'reference_type', 'supertype_ns': 'reference_type_ns'})
         only_inst_refs = only_inst_refs[['src_ns', 'src', 'trg_ns', 'trg', 'reference_type_ns', 'reference_type']]
@@ -0,0 +1,120 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pandas as pd
+from SPARQLWrapper import SPARQLWrapper, POST
+
+from .triples_writer import TriplesSink, open_text_file, term_strings
+
+logger = logging.getLogger(__name__)
+
+TERM_COLUMNS = ['subject', 'verb', 'object']
+DEFAULT_UPDATE_BATCH_SIZE = 10000
+
+
+class TriplesFrameSink(TriplesSink):
+    """Collects the triples as N-Triples terms in a frame, so that the triples of two runs can be compared."""
+
+    def __init__(self):
+        self.frames = []
+
+    def add_svo(self, svo: pd.DataFrame, literal_objects: bool):
+        svo = svo[svo['object'].notna()]
+        if len(svo) > 0:
+            self.frames.append(term_strings(svo, literal_objects))
+
+    def triples(self) -> pd.DataFrame:
+        if len(self.frames) == 0:
+            return empty_triples()
+        return pd.concat(self.frames, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+@dataclass
+class TriplesDelta:
+    """The triples added and removed since the previous run, as frames of N-Triples terms."""
+    added: pd.DataFrame
+    removed: pd.DataFrame
+
+
+def compute_delta(previous: pd.DataFrame, current: pd.DataFrame) -> TriplesDelta:
+    """The set differences of the triples of two runs, computed with one outer merge."""
+    merged = previous[TERM_COLUMNS].merge(current[TERM_COLUMNS], how='outer', on=TERM_COLUMNS, indicator=True)
+    added = merged.loc[merged['_merge'] == 'right_only', TERM_COLUMNS].reset_index(drop=True)
+    removed = merged.loc[merged['_merge'] == 'left_only', TERM_COLUMNS].reset_index(drop=True)
+    return TriplesDelta(added=added, removed=removed)
+
+
+def read_triples(path: str) -> pd.DataFrame:
+    """The triples persisted by a previous run, none if there was no previous run."""
+    if not os.path.exists(path):
+        return empty_triples()
+    return pd.read_parquet(path)
+
+
+def write_triples(triples: pd.DataFrame, path: str):
+    # Replaces the triples of the previous run only once the new ones are completely written
+    tmp_path = path + '.tmp'
+    triples.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def write_delta(delta: TriplesDelta, path: str):
+    """
+    Writes the delta as an RDF Patch, where each line is a triple in N-Triples syntax prefixed with D when it was
+    removed and A when it was added. The removals come first. Files ending with .gz are gzip-compressed.
+    """
+    with open_text_file(path) as f:
+        for prefix, triples in [('D ', delta.removed), ('A ', delta.added)]:
+            if len(triples) > 0:
+                f.write(''.join((prefix + triple_lines(triples)).tolist()))
+
+
+def update_requests(delta: TriplesDelta, batch_size: int = DEFAULT_UPDATE_BATCH_SIZE,
+                    graph: Optional[str] = None) -> List[str]:
+    """
+    SPARQL Update requests applying the delta, DELETE DATA requests followed by INSERT DATA requests with at most
+    batch_size triples each. With a graph, the triples are deleted from and inserted into that named graph.
+    """
+    requests = []
+    for operation, triples in [('DELETE DATA', delta.removed), ('INSERT DATA', delta.added)]:
+        lines = triple_lines(triples)
+        for start in range(0, len(lines), batch_size):
+            block = ''.join(lines.iloc[start:start + batch_size].tolist())
+            if graph is not None:
+                block = 'GRAPH <' + graph + '> {\n' + block + '}\n'
+            requests.append(operation + ' {\n' + block + '}')
+    return requests
+
+
+def send_update_requests(sparql_endpoint: SPARQLWrapper, requests: List[str]):
+    """Sends the requests in order to the update endpoint of sparql_endpoint."""
+    sparql_endpoint.setMethod(POST)
+    for i, request in enumerate(requests):
+        logger.info('Sending update request ' + str(i + 1) + ' of ' + str(len(requests)))
+        sparql_endpoint.setQuery(request)
+        sparql_endpoint.query()
+
+
+def triple_lines(triples: pd.DataFrame) -> pd.Series:
+    return triples['subject'] + ' ' + triples['verb'] + ' ' + triples['object'] + ' .\n'
+
+
+def empty_triples() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series([], dtype=object) for c in TERM_COLUMNS})
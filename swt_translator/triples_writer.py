@@ -0,0 +1,190 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+from abc import ABC, abstractmethod
+from typing import Optional, TextIO
+
+import numpy as np
+import pandas as pd
+from rdflib import Graph, URIRef, Literal
+from rdflib.namespace import XSD
+
+DEFAULT_WRITER_CHUNK_SIZE = 100000
+
+NTRIPLES_ESCAPES = [('\\', '\\\\'), ('"', '\\"'), ('\n', '\\n'), ('\r', '\\r')]
+
+
+class TriplesSink(ABC):
+    """
+    Receives the triples of the knowledge base as frames with the columns subject, verb and object.
+    Subjects and verbs are URI strings, possibly categorical, objects are URI strings or, with literal_objects,
+    Python values of literals.
+    """
+
+    @abstractmethod
+    def add_svo(self, svo: pd.DataFrame, literal_objects: bool):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class GraphTriplesSink(TriplesSink):
+    """Adds the triples to an rdflib Graph, suitable for small models."""
+
+    def __init__(self, g: Optional[Graph] = None):
+        self.g = g if g is not None else Graph()
+
+    def add_svo(self, svo: pd.DataFrame, literal_objects: bool):
+        subjects = svo['subject'].map(URIRef)
+        verbs = svo['verb'].map(URIRef)
+        objects = svo['object'].map(Literal if literal_objects else URIRef)
+        for t in zip(subjects, verbs, objects):
+            self.g.add(t)
+
+
+class StreamingTriplesWriter(TriplesSink):
+    """
+    Writes the triples to an N-Triples (format='nt') or Turtle (format='ttl') file as they are added, without
+    keeping them in memory. The lines of each frame are built with vectorized string operations, chunk_size rows at
+    a time. Turtle output groups the triples of each frame by subject. Files ending with .gz are gzip-compressed.
+    """
+
+    def __init__(self, path: str, format: str = 'nt', chunk_size: int = DEFAULT_WRITER_CHUNK_SIZE):
+        if format not in {'nt', 'ttl'}:
+            raise ValueError('Unsupported format ' + format)
+        self.path = path
+        self.format = format
+        self.chunk_size = chunk_size
+        self.triples = 0
+        self.file = open_text_file(path)
+
+    def add_svo(self, svo: pd.DataFrame, literal_objects: bool):
+        svo = svo[svo['object'].notna()]
+        if self.format == 'ttl':
+            svo = svo.sort_values('subject', kind='stable')
+        for start in range(0, len(svo), self.chunk_size):
+            chunk = svo.iloc[start:start + self.chunk_size]
+            terms = term_strings(chunk, literal_objects)
+            if self.format == 'nt':
+                lines = terms['subject'] + ' ' + terms['verb'] + ' ' + terms['object'] + ' .\n'
+            else:
+                lines = turtle_lines(terms['subject'], terms['verb'], terms['object'])
+            self.file.write(''.join(lines.tolist()))
+            self.triples += len(chunk)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def open_text_file(path: str) -> TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='\n')
+    return open(path, 'w', encoding='utf-8', newline='\n')
+
+
+def triples_format(path: str) -> str:
+    """Format of the output file from its name, N-Triples for .nt and .nt.gz, otherwise Turtle."""
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+    return 'nt' if name.endswith('.nt') else 'ttl'
+
+
+def term_strings(svo: pd.DataFrame, literal_objects: bool) -> pd.DataFrame:
+    """The subjects, verbs and objects of the triples as N-Triples terms."""
+    objects = literal_strings(svo['object']) if literal_objects else uri_strings(svo['object'])
+    return pd.DataFrame({'subject': uri_strings(svo['subject']), 'verb': uri_strings(svo['verb']), 'object': objects})
+
+
+def turtle_lines(subjects: pd.Series, verbs: pd.Series, objects: pd.Series) -> pd.Series:
+    # The subjects are sorted, consecutive triples of a subject share one statement
+    first = subjects.ne(subjects.shift())
+    last = subjects.ne(subjects.shift(-1))
+    starts = subjects.where(first, '   ') + ' '
+    ends = pd.Series(' ;\n', index=subjects.index).where(~last, ' .\n\n')
+    return starts + verbs + ' ' + objects + ends
+
+
+def uri_strings(uris: pd.Series) -> pd.Series:
+    if isinstance(uris.dtype, pd.CategoricalDtype):
+        # Formats each distinct URI once, and only the URIs used when the rows are a small part of the categories
+        categories = uris.cat.categories
+        codes = uris.cat.codes.to_numpy()
+        if len(codes) < len(categories):
+            used, codes = np.unique(codes, return_inverse=True)
+            categories = categories[used]
+        categories = ('<' + pd.Series(categories, dtype=object).astype(str) + '>').to_numpy()
+        return pd.Series(categories[codes], index=uris.index)
+    return '<' + uris.astype(str) + '>'
+
+
+def literal_strings(values: pd.Series) -> pd.Series:
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind == 'string':
+        return quoted_strings(values.astype(str))
+    elif kind == 'boolean':
+        return values.map({True: '"true"', False: '"false"'}) + typed_suffix(XSD.boolean)
+    elif kind == 'integer':
+        if values.dtype.kind in 'iu':
+            return '"' + values.astype(str) + '"' + typed_suffix(XSD.integer)
+        return '"' + values.astype(object).map(int).astype(str) + '"' + typed_suffix(XSD.integer)
+    elif kind == 'floating':
+        if values.dtype == np.float64:
+            return '"' + double_strings(values) + '"' + typed_suffix(XSD.double)
+        return '"' + values.map(double_string) + '"' + typed_suffix(XSD.double)
+    return values.map(literal_string)
+
+
+def literal_string(value) -> str:
+    if type(value) in {bool, int, float, str}:
+        return literal_strings(pd.Series([value], dtype=object)).iloc[0]
+    literal = Literal(value)
+    suffix = typed_suffix(literal.datatype) if literal.datatype is not None else ''
+    return quoted_strings(pd.Series([str(literal)])).iloc[0] + suffix
+
+
+def typed_suffix(datatype: URIRef) -> str:
+    return '^^<' + str(datatype) + '>'
+
+
+def double_string(value: float) -> str:
+    # The lexical forms rdflib uses for doubles
+    if value != value:
+        return 'NaN'
+    elif value in {float('inf'), float('-inf')}:
+        return 'INF' if value > 0 else '-INF'
+    return repr(float(value))
+
+
+def double_strings(values: pd.Series) -> pd.Series:
+    # numpy formats finite doubles with the shortest repr, like repr of Python floats
+    strings = pd.Series(values.to_numpy().astype(str), index=values.index, dtype=object)
+    not_finite = ~np.isfinite(values.to_numpy())
+    if not_finite.any():
+        strings[not_finite] = values[not_finite].map(double_string)
+    return strings
+
+
+def quoted_strings(values: pd.Series) -> pd.Series:
+    for character, escaped in NTRIPLES_ESCAPES:
+        values = values.str.replace(character, escaped, regex=False)
+    return '"' + values + '"'
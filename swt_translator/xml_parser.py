@@ -0,0 +1,107 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import lxml.etree as ET
+import pandas as pd
+
+from .translation_cache import TranslationCache
+
+logger = logging.getLogger(__name__)
+
+UA_NAMESPACE = 'http://opcfoundation.org/UA/'
+UANODESET_XSD = '{http://opcfoundation.org/UA/2011/03/UANodeSet.xsd}'
+# Elements that follow the NamespaceUris of a NodeSet2 file, where reading of the namespaces stops
+NAMESPACE_URIS_END_TAGS = ['NamespaceUris', 'Models', 'Aliases', 'UAObjectType', 'UAObject', 'UAVariableType',
+                           'UAVariable', 'UADataType', 'UAReferenceType', 'UAView', 'UAMethod']
+# Functions of opcua_tools.nodeset_parser used to parse the files one at a time, missing from older opcua-tools
+NODESET_PARSER_FUNCTIONS = ['get_list_of_xml_files', 'exclude_files_not_in_namespaces',
+                            'parse_xml_without_normalization', 'normalize_wrt_nodeid']
+
+
+def parse_xml_dir_parallel(xml_dir: str, namespaces: List[str], max_workers: Optional[int] = None,
+                           cache: Optional[TranslationCache] = None) -> Dict[str, Any]:
+    """
+    Parses the NodeSet2 files in xml_dir like parse_xml_dir, with each file parsed in a separate process.
+    The namespace indices are fixed before parsing, from namespaces followed by the namespaces of the files
+    in the order parse_xml_dir finds them, so that the frames of the files can be merged.
+    With a cache, files parsed before with the same namespaces are read from the cache.
+    """
+    files = list_xml_files(xml_dir, namespaces)
+    namespaces = merge_namespaces(namespaces, [read_namespace_uris(f) for f in files])
+
+    parse = cache.parse_xml_file if cache is not None else parse_xml_file
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(parse, f, namespaces) for f in files]
+        parsed = [f.result() for f in futures]
+
+    nodes = pd.concat([p[0] for p in parsed], ignore_index=True)
+    references = pd.concat([p[1] for p in parsed], ignore_index=True)
+    lookup_df = import_nodeset_parser().normalize_wrt_nodeid(nodes, references)
+    return {'nodes': nodes, 'references': references, 'namespaces': namespaces, 'lookup_df': lookup_df}
+
+
+def import_nodeset_parser():
+    """opcua_tools.nodeset_parser, imported when files are parsed one at a time, so that translating without
+    parallel parsing or a cache works with versions of opcua-tools lacking the functions needed for this."""
+    from opcua_tools import nodeset_parser
+    missing = [f for f in NODESET_PARSER_FUNCTIONS if not hasattr(nodeset_parser, f)]
+    if len(missing) > 0:
+        raise ImportError('Parallel parsing and the translation cache require a version of opcua-tools with '
+                          + ', '.join(missing) + ' in opcua_tools.nodeset_parser')
+    return nodeset_parser
+
+
+def list_xml_files(xml_dir: str, namespaces: List[str]) -> List[str]:
+    nodeset_parser = import_nodeset_parser()
+    xml_files = nodeset_parser.exclude_files_not_in_namespaces(nodeset_parser.get_list_of_xml_files(xml_dir),
+                                                               namespaces)
+    return sorted(f for f in xml_files if f.endswith('.xml'))
+
+
+def parse_xml_file(xml_file: str, namespaces: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    logger.info('Started parsing ' + xml_file)
+    parse_dict = import_nodeset_parser().parse_xml_without_normalization(xml_file, list(namespaces))
+    if parse_dict['namespaces'] != namespaces:
+        raise ValueError('Namespaces of ' + xml_file + ' were not known before parsing')
+    logger.info('Finished parsing ' + xml_file)
+    return parse_dict['nodes'], parse_dict['references']
+
+
+def merge_namespaces(namespaces: List[str], file_namespaces: List[List[str]]) -> List[str]:
+    merged = list(namespaces)
+    if UA_NAMESPACE not in merged:
+        merged.append(UA_NAMESPACE)
+    for uris in file_namespaces:
+        for uri in uris:
+            if uri not in merged:
+                merged.append(uri)
+    return merged
+
+
+def read_namespace_uris(xml_file: str) -> List[str]:
+    """The NamespaceUris of the file, reading only up to the end of the element."""
+    uris = []
+    end_tags = [UANODESET_XSD + t for t in NAMESPACE_URIS_END_TAGS]
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end'), tag=[UANODESET_XSD + 'Uri'] + end_tags):
+        if elem.tag == UANODESET_XSD + 'Uri':
+            if event == 'end':
+                uris.append(elem.text)
+        elif event == 'end' or elem.tag != UANODESET_XSD + 'NamespaceUris':
+            break
+    return uris
@@ -0,0 +1,79 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+from quarry.time_series_database import TimeSeriesDatabase, TimeSeriesQuery, filter_arrow_table
+
+
+class InMemoryTimeSeriesDatabase(TimeSeriesDatabase):
+    """In-process stand-in for the PostgreSQL sample implementation, backed by a DataFrame with the columns
+    signal_id, ts and one column per datatype (str_value, real_value, int_value, bool_value)."""
+    def __init__(self, data: pd.DataFrame, arrow: bool = True):
+        self.data = data
+        self.arrow = arrow
+        self.queries = []
+        super().__init__()
+
+    @staticmethod
+    def from_csv(path: str, arrow: bool = True) -> 'InMemoryTimeSeriesDatabase':
+        df = pd.read_csv(path)
+        df['ts'] = pd.to_datetime(df['ts']).dt.tz_localize('UTC')
+        df['signal_id'] = df['signal_id'].astype('int32')
+        return InMemoryTimeSeriesDatabase(data=df, arrow=arrow)
+
+    def execute_query(self, tsq: TimeSeriesQuery):
+        self.queries.append(tsq)
+        return self.select(tsq)
+
+    def estimate_signal_count(self, tsq: TimeSeriesQuery):
+        return len(self.matching_signal_ids(tsq))
+
+    def matching_signal_ids(self, tsq: TimeSeriesQuery):
+        table = filter_arrow_table(self.select(tsq, arrow=True), tsq)
+        return table[str(tsq.variable_term.rdflib_term) + '_signal_id'].to_pandas().drop_duplicates()
+
+    def signal_count(self):
+        return self.data['signal_id'].nunique()
+
+    def select(self, tsq: TimeSeriesQuery, arrow: Optional[bool] = None):
+        cols = ['signal_id']
+        if tsq.timestamp_variable is not None:
+            cols.append('ts')
+        if tsq.datatype is not None:
+            cols.append(tsq.datatype + '_value')
+
+        if tsq.signal_ids is None:
+            df = self.data[cols]
+        else:
+            df = self.data.loc[self.data['signal_id'].isin(tsq.signal_ids.dropna().to_list()), cols]
+
+        rename_dict = {}
+        rename_dict['signal_id'] = str(tsq.variable_term.rdflib_term) + '_signal_id'
+        if tsq.data_variable is not None:
+            rename_dict[tsq.datatype + '_value'] = str(tsq.data_variable.rdflib_term)
+
+        if tsq.timestamp_variable is not None:
+            rename_dict['ts'] = str(tsq.timestamp_variable.rdflib_term)
+
+        df = df.rename(columns=rename_dict, errors='raise')
+        if arrow is None:
+            arrow = self.arrow
+        if arrow:
+            return pa.Table.from_pandas(df, preserve_index=False)
+        df[rename_dict['signal_id']] = df[rename_dict['signal_id']].astype(pd.Int32Dtype())
+        return df
@@ -12,9 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Any, Iterator
+
 from quarry.time_series_database import TimeSeriesDatabase, TimeSeriesQuery
 import psycopg2
-import pandas as pd
+import pyarrow as pa
+
+FETCH_SIZE = 10000
+ARROW_TYPES = {'signal_id': pa.int32(), 'ts': pa.timestamp('us', tz='UTC'), 'str_value': pa.string(),
+               'real_value': pa.float64(), 'int_value': pa.int64(), 'bool_value': pa.bool_()}
 
 
 class SQLTimeSeriesDatabase(TimeSeriesDatabase):
@@ -22,7 +28,7 @@ class SQLTimeSeriesDatabase(TimeSeriesDatabase):
         self.conn = psycopg2.connect(**params_dict)
         super().__init__()
 
-    def execute_query(self, tsq: TimeSeriesQuery) -> pd.DataFrame:
+    def execute_query(self, tsq: TimeSeriesQuery) -> pa.RecordBatchReader:
 
         cols = ['signal_id']
         if tsq.timestamp_variable is not None:
@@ -36,9 +42,15 @@ class SQLTimeSeriesDatabase(TimeSeriesDatabase):
         elif tsq.datatype == 'bool':
             cols.append('bool_value')
 
-        query = f"""SELECT {', '.join(map(lambda x: 't.' + x, cols))} FROM TSDATA t WHERE t.signal_id in ({','.join(map(str, tsq.signal_ids.to_list()))});"""
-
-        df = pd.read_sql(query, self.conn)
+        select_cols = ', '.join(map(lambda x: 't.' + x, cols))
+        signal_ids = ','.join(map(str, tsq.signal_ids.to_list()))
+        if tsq.snapshot:
+            # One row per signal, the latest sample at or before as_of
+            as_of_condition = f" AND t.ts <= '{tsq.as_of.tz_convert('UTC').tz_localize(None).isoformat()}'" \
+                if tsq.as_of is not None else ''
+            query = f"""SELECT DISTINCT ON (t.signal_id) {select_cols} FROM TSDATA t WHERE t.signal_id in ({signal_ids}){as_of_condition} ORDER BY t.signal_id, t.ts DESC;"""
+        else:
+            query = f"""SELECT {select_cols} FROM TSDATA t WHERE t.signal_id in ({signal_ids});"""
 
         rename_dict = {}
         rename_dict['signal_id'] = str(tsq.variable_term.rdflib_term) + '_signal_id'
@@ -46,8 +58,24 @@ class SQLTimeSeriesDatabase(TimeSeriesDatabase):
             rename_dict[tsq.datatype + '_value'] = str(tsq.data_variable.rdflib_term)
 
         if tsq.timestamp_variable is not None:
-            df['ts'] = pd.DatetimeIndex(df['ts']).tz_localize('UTC')
             rename_dict['ts'] = str(tsq.timestamp_variable.rdflib_term)
 
-        df = df.rename(columns=rename_dict, errors='raise')
-        return df
+        schema = pa.schema([(rename_dict.get(c, c), ARROW_TYPES[c]) for c in cols])
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        return pa.RecordBatchReader.from_batches(schema, fetch_batches(cursor, schema))
+
+
+def fetch_batches(cursor: Any, schema: pa.Schema) -> Iterator[pa.RecordBatch]:
+    """Converts the rows of the cursor to record batches of FETCH_SIZE rows, without fetching all rows first."""
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if len(rows) == 0:
+                break
+            # Naive timestamps from the TIMESTAMP column are interpreted as UTC when building the Arrow array
+            columns = list(zip(*rows))
+            arrays = [pa.array(columns[i], type=f.type) for i, f in enumerate(schema)]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+    finally:
+        cursor.close()
@@ -0,0 +1,135 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Queries over the knowledge base in expected/query_split/kb.ttl and the signals in input_data/query_split
+
+BASIC = """
+PREFIX rdsog: 
+<http://prediktor.com/RDS-OG-Fragment#>
+PREFIX opcua: 
+<http://opcfoundation.org/UA/#>
+PREFIX uahelpers: 
+<http://prediktor.com/UA-helpers/#>
+SELECT  ?cvalveName ?ts ?rv WHERE {
+?injSystem a rdsog:InjectionSystemType.
+?injSystem rdsog:functionalAspect+ ?cvalve. 
+?cvalve a rdsog:LiquidControlValveType.
+?cvalve opcua:displayName ?cvalveName.
+?cvalve opcua:hierarchicalReferences ?cay.
+?cay opcua:browseName "CA_Y".
+?cay opcua:value ?cayValue.
+?cayValue opcua:timestamp ?ts.
+?cayValue opcua:realValue ?rv.
+}
+    """
+
+BASIC_EU = """
+PREFIX rdsog: 
+<http://prediktor.com/RDS-OG-Fragment#>
+PREFIX opcua: 
+<http://opcfoundation.org/UA/#>
+PREFIX uahelpers: 
+<http://prediktor.com/UA-helpers/#>
+SELECT  ?cvalveName ?rv ?cayEU WHERE {
+?injSystem a rdsog:InjectionSystemType.
+?injSystem rdsog:functionalAspect+ ?cvalve. 
+?cvalve a rdsog:LiquidControlValveType.
+?cvalve opcua:displayName ?cvalveName.
+?cvalve opcua:hierarchicalReferences ?cay.
+?cay opcua:browseName "CA_Y".
+?cay opcua:value ?cayValue.
+?cayValue opcua:hasEngineeringUnit ?cayEU.
+?cayValue opcua:realValue ?rv.
+FILTER (?rv >= 0.07)
+}
+    """
+
+TIMESTAMP = """
+    PREFIX rdsog: 
+    <http://prediktor.com/RDS-OG-Fragment#>
+    PREFIX opcua: 
+    <http://opcfoundation.org/UA/#>
+    PREFIX uahelpers: 
+    <http://prediktor.com/UA-helpers/#>
+    SELECT  ?cvalveName ?cayValue ?ts ?rv ?cayEU WHERE {
+        ?injSystem a rdsog:InjectionSystemType.
+        ?injSystem rdsog:functionalAspect+ ?cvalve. 
+        ?cvalve a rdsog:LiquidControlValveType.
+        ?cvalve opcua:displayName ?cvalveName.
+        ?cvalve opcua:hierarchicalReferences ?cay.
+        ?cay opcua:browseName "CA_Y".
+        ?cay opcua:value ?cayValue.
+        ?cayValue opcua:hasEngineeringUnit ?cayEU.
+        ?cayValue opcua:realValue ?rv.
+        ?cayValue opcua:timestamp ?ts.
+        FILTER (?rv < 0.06 && ?ts >= "2021-03-25T09:30:23.218499+00:00"^^xsd:dateTime)
+        }
+    """
+
+TIMESTAMP_SYNC = """
+    PREFIX rdsog: 
+    <http://prediktor.com/RDS-OG-Fragment#>
+    PREFIX opcua: 
+    <http://opcfoundation.org/UA/#>
+    PREFIX uahelpers: 
+    <http://prediktor.com/UA-helpers/#>
+    SELECT  ?cvalveName ?ts ?y ?cayEU ?yr ?cayrEU WHERE {
+        ?injSystem a rdsog:InjectionSystemType.
+        ?injSystem rdsog:functionalAspect+ ?cvalve. 
+        ?cvalve a rdsog:LiquidControlValveType.
+        ?cvalve opcua:displayName ?cvalveName.
+        ?cvalve opcua:hierarchicalReferences ?cay.
+        ?cvalve opcua:hierarchicalReferences ?cayr.
+        ?cay opcua:browseName "CA_Y".
+        ?cayr opcua:browseName "CA_YR".
+        ?cay opcua:value ?cayValue.
+        ?cayr opcua:value ?cayrValue.
+        ?cayValue opcua:hasEngineeringUnit ?cayEU.
+        ?cayrValue opcua:hasEngineeringUnit ?cayrEU.
+        ?cayValue opcua:realValue ?y.
+        ?cayrValue opcua:realValue ?yr.
+        ?cayValue opcua:timestamp ?ts.
+        ?cayrValue opcua:timestamp ?ts.
+        FILTER (?ts >= "2021-03-25T09:30:23.218499+00:00"^^xsd:dateTime)
+        }
+    """
+
+SNAPSHOT = """
+    PREFIX rdsog: 
+    <http://prediktor.com/RDS-OG-Fragment#>
+    PREFIX opcua: 
+    <http://opcfoundation.org/UA/#>
+    PREFIX uahelpers: 
+    <http://prediktor.com/UA-helpers/#>
+    SELECT  ?cvalveName ?rv ?cayEU WHERE {
+        ?injSystem a rdsog:InjectionSystemType.
+        ?injSystem rdsog:functionalAspect+ ?cvalve. 
+        ?cvalve a rdsog:LiquidControlValveType.
+        ?cvalve opcua:displayName ?cvalveName.
+        ?cvalve opcua:hierarchicalReferences ?cay.
+        ?cay opcua:browseName "CA_Y".
+        ?cay opcua:value ?cayValue.
+        ?cayValue opcua:hasEngineeringUnit ?cayEU.
+        ?cayValue opcua:realValue ?rv.
+        ?cayValue opcua:timestamp %s.
+        %s
+        }
+    """
+
+LATEST = SNAPSHOT % ('uahelpers:latest', '')
+
+AS_OF = SNAPSHOT % ('"2021-03-25T09:31:30+00:00"^^xsd:dateTime', '')
+
+LATEST_FILTER = SNAPSHOT % ('uahelpers:latest', 'FILTER (?rv > 0.08)')
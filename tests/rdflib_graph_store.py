@@ -0,0 +1,90 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from rdflib import ConjunctiveGraph, URIRef
+
+
+class RDFLibGraphStore:
+    """
+    In-process stand-in for a SPARQL store, accepting N-Triples posted with the Graph Store Protocol to /data and
+    SPARQL Update requests posted to /update, and keeping the triples in an rdflib ConjunctiveGraph.
+    The first failures requests are answered with 503 Service Unavailable.
+    """
+
+    def __init__(self, failures: int = 0):
+        self.graph = ConjunctiveGraph()
+        self.failures = failures
+        self.requests = []
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), GraphStoreRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.graph_store = self
+        self.thread: Optional[threading.Thread] = None
+
+    def url(self, path: str) -> str:
+        host, port = self.httpd.server_address[:2]
+        return 'http://' + host + ':' + str(port) + path
+
+    def start(self) -> 'RDFLibGraphStore':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def named_graph(self, name: str):
+        return self.graph.get_context(URIRef(name))
+
+
+class GraphStoreRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        store = self.server.graph_store
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        with store.lock:
+            store.requests.append((url.path, self.headers['Content-Type']))
+            if store.failures > 0:
+                store.failures -= 1
+                self.respond(503)
+                return
+            if url.path == '/data' and self.headers['Content-Type'] == 'application/n-triples':
+                graph = parse_qs(url.query).get('graph')
+                target = store.named_graph(graph[0]) if graph is not None else store.graph.default_context
+                target.parse(data=body.decode('utf-8'), format='nt')
+            elif url.path == '/update' and self.headers['Content-Type'] == 'application/sparql-update':
+                store.graph.update(body.decode('utf-8'))
+            else:
+                self.respond(400)
+                return
+        self.respond(204)
+
+    def respond(self, status: int):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,57 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+from io import StringIO
+
+from rdflib import Graph
+from rdflib.plugins.sparql.results.jsonresults import JSONResultSerializer
+
+from quarry.algebra_utils import parse_sparql
+
+
+class RDFLibQueryResult:
+    def __init__(self, result):
+        self.result = result
+
+    def convert(self):
+        buffer = StringIO()
+        JSONResultSerializer(self.result).serialize(buffer)
+        return json.loads(buffer.getvalue())
+
+
+class RDFLibSPARQLEndpoint:
+    """In-process stand-in for a SPARQLWrapper pointing to a SPARQL endpoint, answering queries with rdflib."""
+    def __init__(self, graph: Graph):
+        self.graph = graph
+        self.queries = []
+        self.query_string = None
+
+    @staticmethod
+    def from_ttl(path: str) -> 'RDFLibSPARQLEndpoint':
+        g = Graph()
+        g.parse(source=path, format='turtle')
+        return RDFLibSPARQLEndpoint(graph=g)
+
+    def setQuery(self, query: str):
+        self.query_string = query
+
+    def setReturnFormat(self, return_format: str):
+        pass
+
+    def query(self) -> RDFLibQueryResult:
+        self.queries.append(self.query_string)
+        # Shares the parser with the engine in this process, so parsing must go through the same lock
+        return RDFLibQueryResult(self.graph.query(parse_sparql(self.query_string)))
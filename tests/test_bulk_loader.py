@@ -0,0 +1,69 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+import requests
+from rdflib import Graph
+
+from swt_translator.bulk_loader import BulkLoader
+from swt_translator.graph_builder import build_instance_graph, write_instance_triples
+from .rdflib_graph_store import RDFLibGraphStore
+from .test_sharded_writer import create_triples_dfs, NAMESPACES
+
+
+@pytest.fixture
+def graph_store():
+    store = RDFLibGraphStore().start()
+    yield store
+    store.shutdown()
+
+
+def load(loader: BulkLoader):
+    with loader:
+        write_instance_triples(triples_dfs=create_triples_dfs(), namespaces=NAMESPACES, params_dict={}, sink=loader)
+
+
+def expected_graph() -> Graph:
+    return build_instance_graph(triples_dfs=create_triples_dfs(), namespaces=NAMESPACES, params_dict={})
+
+
+def test_graph_store_protocol_batches(graph_store):
+    loader = BulkLoader(graph_store.url('/data'), batch_size=4, max_workers=3)
+    load(loader)
+    assert loader.triples == 18
+    assert len(graph_store.requests) == loader.batches > 4
+    assert set(graph_store.graph.default_context) == set(expected_graph())
+
+
+def test_update_to_named_graphs_per_namespace(graph_store):
+    loader = BulkLoader(graph_store.url('/update'), protocol='update', batch_size=5, compress=False,
+                        namespaces=NAMESPACES)
+    load(loader)
+    assert {path for path, _ in graph_store.requests} == {'/update'}
+    # All subjects are instances in the namespace of the model
+    assert len(graph_store.graph.default_context) == 0
+    assert set(graph_store.named_graph(NAMESPACES[1])) == set(expected_graph())
+
+
+def test_failed_batches_are_retried(graph_store):
+    graph_store.failures = 2
+    loader = BulkLoader(graph_store.url('/data'), batch_size=100, retry_delay=0.01)
+    load(loader)
+    assert len(graph_store.requests) == 3
+    assert set(graph_store.graph.default_context) == set(expected_graph())
+
+    graph_store.failures = 3
+    with pytest.raises(requests.HTTPError):
+        load(BulkLoader(graph_store.url('/data'), batch_size=100, retries=2, retry_delay=0.01))
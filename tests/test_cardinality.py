@@ -0,0 +1,99 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+from rdflib.namespace import RDF
+from rdflib.paths import MulPath, ZeroOrMore
+from rdflib.term import Variable, URIRef
+
+from quarry import QueryEngine
+from quarry.cardinality import CardinalityStatistics, PredicateStatistics, order_triples
+from quarry.classes import Triple, Term
+from quarry.query_generator import triple_string
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+def triple(subject, verb, obj) -> Triple:
+    return Triple(subject=Term(subject), verb=Term(verb), object=Term(obj))
+
+
+def test_statistics_from_endpoint_are_cached_in_file(tmp_path):
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    path = str(tmp_path / 'statistics.json')
+    statistics = CardinalityStatistics.load(sparql_endpoint, path)
+    assert len(sparql_endpoint.queries) == 2
+    assert statistics.triples == len(sparql_endpoint.graph)
+    type_statistics = statistics.predicates[str(RDF.type)]
+    assert type_statistics.triples == len(list(sparql_endpoint.graph.triples((None, RDF.type, None))))
+    assert sum(statistics.classes.values()) == type_statistics.triples
+
+    assert CardinalityStatistics.load(sparql_endpoint, path) == statistics
+    assert len(sparql_endpoint.queries) == 2
+
+
+def test_triples_are_ordered_by_estimated_cardinality():
+    statistics = CardinalityStatistics(predicates={'http://ex/common': PredicateStatistics(1000, 100, 1000),
+                                                   'http://ex/rare': PredicateStatistics(10, 10, 10)},
+                                       classes={'http://ex/Class': 500})
+    common = triple(Variable('a'), URIRef('http://ex/common'), Variable('b'))
+    rare = triple(Variable('b'), URIRef('http://ex/rare'), Variable('c'))
+    typed = triple(Variable('a'), RDF.type, URIRef('http://ex/Class'))
+    ordered = order_triples([common, typed, rare], statistics, triple_string)
+    # Once ?b is bound by the rare pattern, the common pattern is cheaper than the class scan
+    assert ordered == [rare, common, typed]
+    assert order_triples([typed, rare, common], statistics, triple_string) == ordered
+
+
+def test_unknown_predicates_are_not_estimated_as_empty():
+    statistics = CardinalityStatistics(predicates={'http://ex/common': PredicateStatistics(1000, 100, 1000),
+                                                   'http://ex/rare': PredicateStatistics(10, 10, 10)})
+    rare = triple(Variable('a'), URIRef('http://ex/rare'), Variable('b'))
+    unknown = triple(Variable('b'), URIRef('http://ex/unknown'), Variable('c'))
+    assert statistics.estimate(unknown, set()) == 505
+    assert order_triples([unknown, rare], statistics, triple_string) == [rare, unknown]
+
+    # Zero length paths match every node
+    path = triple(Variable('c'), MulPath(URIRef('http://ex/rare'), ZeroOrMore), Variable('d'))
+    assert statistics.estimate(path, set()) > statistics.estimate(rare, set())
+    assert statistics.estimate(path, {'c'}) == 2
+
+
+def test_variable_predicate_is_scaled_by_degree():
+    statistics = CardinalityStatistics(predicates={'http://ex/common': PredicateStatistics(1000, 100, 1000),
+                                                   'http://ex/rare': PredicateStatistics(10, 10, 10)})
+    any_predicate = triple(Variable('a'), Variable('p'), Variable('b'))
+    assert statistics.estimate(any_predicate, set()) == 1010
+    assert statistics.estimate(any_predicate, {'a'}) == 10.1
+    assert statistics.estimate(any_predicate, {'b'}) == 1.01
+
+
+def test_generated_query_is_deterministic():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    statistics = CardinalityStatistics.from_endpoint(sparql_endpoint)
+    with QueryEngine(sparql_endpoint, time_series_database, statistics=statistics) as query_engine:
+        model_sparql = query_engine.execute_static_query(TIMESTAMP).model_sparql
+        assert all(query_engine.execute_static_query(TIMESTAMP).model_sparql == model_sparql for _ in range(5))
+        actual_df = query_engine.execute_query(TIMESTAMP).reset_index(drop=True)
+
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
@@ -0,0 +1,61 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pandas as pd
+
+from swt_translator.closure import subtype_closure, expand_closure
+
+HAS_SUBTYPE = 45
+
+
+def create_type_nodes() -> pd.DataFrame:
+    return pd.DataFrame({'id': [HAS_SUBTYPE, 1, 2, 3, 4, 5], 'ns': 0,
+                         'NodeClass': ['UAReferenceType'] + ['UAObjectType'] * 5,
+                         'BrowseName': ['HasSubtype', 'A', 'B', 'C', 'D', 'E']})
+
+
+def create_type_references() -> pd.DataFrame:
+    # A chain 1 > 2 > 3 > 4, with 5 also a subtype of 2, and a reference of another type from 4 to 1
+    return pd.DataFrame({'Src': [1, 2, 3, 2, 4], 'Trg': [2, 3, 4, 5, 1],
+                         'ReferenceType': [HAS_SUBTYPE] * 4 + [46]})
+
+
+def test_subtype_closure_is_reflexive_and_transitive():
+    closure = subtype_closure(create_type_nodes(), create_type_references())
+    expected = {(1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (2, 2), (2, 3), (2, 4), (2, 5), (3, 3), (3, 4), (4, 4),
+                (5, 5)}
+    assert set(zip(closure['supertype'], closure['subtype'])) == expected
+    assert len(closure) == len(expected)
+
+
+def test_deep_hierarchy_closure():
+    depth = 300
+    type_references = pd.DataFrame({'Src': range(1, depth), 'Trg': range(2, depth + 1), 'ReferenceType': HAS_SUBTYPE})
+    closure = subtype_closure(create_type_nodes(), type_references)
+    assert len(closure) == depth * (depth + 1) // 2
+    assert set(closure.loc[closure['subtype'] == depth, 'supertype']) == set(range(1, depth + 1))
+
+
+def test_expand_closure_matches_inner_join():
+    closure = subtype_closure(create_type_nodes(), create_type_references())
+    closure['supertype_ns'] = 0
+    typing_df = pd.DataFrame({'id': [10, 11, 12, 13], 'ns': 1, 'type': [4, 5, 1, 99]})
+
+    actual = expand_closure(typing_df, on='type', closure_df=closure, closure_on='subtype')
+    expected = typing_df.merge(closure, left_on='type', right_on='subtype').drop(columns=['type', 'subtype'])
+    assert list(actual.columns) == ['id', 'ns', 'supertype', 'supertype_ns']
+    assert len(actual) == 4 + 3 + 1
+    pd.testing.assert_frame_equal(actual.sort_values(['id', 'supertype'], ignore_index=True),
+                                  expected.sort_values(['id', 'supertype'], ignore_index=True))
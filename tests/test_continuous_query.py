@@ -0,0 +1,67 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+import pytest
+
+from quarry import QueryEngine
+from quarry.continuous_query import ContinuousQuery
+from quarry.time_series_database import time_bounds
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import BASIC_EU, TIMESTAMP
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+@pytest.fixture
+def query_engine():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    return QueryEngine(sparql_endpoint, time_series_database)
+
+
+def test_poll_returns_new_rows(query_engine):
+    time_series_database = query_engine.time_series_database.time_series_database
+    continuous_query = ContinuousQuery(query_engine, TIMESTAMP)
+
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(continuous_query.poll().reset_index(drop=True), expected_df)
+    assert len(continuous_query.poll()) == 0
+
+    new_samples = pd.DataFrame({'signal_id': [6, 6, 4], 'real_value': [0.012, 0.5, 0.1340],
+                                'ts': pd.to_datetime(['2021-03-25 09:33:23.218498', '2021-03-25 09:34:23.218498',
+                                                      '2021-03-25 09:33:23.218498']).tz_localize('UTC')})
+    new_samples['signal_id'] = new_samples['signal_id'].astype('int32')
+    time_series_database.data = pd.concat([time_series_database.data, new_samples], ignore_index=True)
+
+    actual_df = continuous_query.poll().reset_index(drop=True)
+    assert actual_df['rv'].tolist() == [0.012]
+    assert actual_df['ts'].tolist() == [pd.Timestamp('2021-03-25 09:33:23.218498', tz='UTC')]
+
+    # Signals are fetched from their watermark, including samples that did not pass the filter
+    last_tsq = time_series_database.queries[-1]
+    assert time_bounds(last_tsq)[0] == pd.Timestamp('2021-03-25 09:32:23.218498', tz='UTC')
+    assert continuous_query.watermarks['cayValue'][6] == pd.Timestamp('2021-03-25 09:34:23.218498', tz='UTC')
+    assert len(continuous_query.poll()) == 0
+
+
+def test_poll_requires_timestamps(query_engine):
+    continuous_query = ContinuousQuery(query_engine, BASIC_EU)
+    with pytest.raises(ValueError):
+        continuous_query.poll()
@@ -0,0 +1,87 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+import pytest
+
+import quarry
+from quarry.federated_time_series_database import FederatedTimeSeriesDatabase, LookupRoute, RangeRoute
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP_SYNC
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+BACKEND_BY_BROWSE_NAME = """
+    PREFIX opcua: <http://opcfoundation.org/UA/#>
+    PREFIX uahelpers: <http://prediktor.com/UA-helpers/#>
+    SELECT ?signal_id ?backend WHERE {
+        ?variable opcua:value ?value.
+        ?variable opcua:browseName ?backend.
+        ?value uahelpers:signalId ?signal_id.
+    }
+    """
+
+
+@pytest.fixture
+def sparql_endpoint():
+    return RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+
+
+def split_backends(signal_ids_by_backend):
+    data = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv').data
+    return {backend: InMemoryTimeSeriesDatabase(data[data['signal_id'].isin(signal_ids)].copy())
+            for backend, signal_ids in signal_ids_by_backend.items()}
+
+
+def read_expected() -> pd.DataFrame:
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp_sync.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    return expected_df
+
+
+def test_routes_by_range_and_lookup(sparql_endpoint):
+    backends = split_backends({'legacy': [1, 2, 3], 'new': [4, 5, 6]})
+    federated = FederatedTimeSeriesDatabase(backends, routes=[RangeRoute('legacy', 1, 4), LookupRoute({4: 'new'})],
+                                            default_backend='new')
+    actual_df = quarry.execute_query(TIMESTAMP_SYNC, sparql_endpoint, federated).reset_index(drop=True)
+    federated.close()
+
+    pd.testing.assert_frame_equal(actual_df, read_expected())
+    for backend, signal_ids in [('legacy', {1, 2, 3}), ('new', {4, 5, 6})]:
+        queried = set().union(*[set(tsq.signal_ids) for tsq in backends[backend].queries])
+        assert queried == signal_ids
+        assert federated.statistics[backend].queries == 2
+        assert federated.statistics[backend].rows > 0
+
+
+def test_routes_by_knowledge_base(sparql_endpoint):
+    backends = split_backends({'CA_Y': [2, 4, 6], 'CA_YR': [1, 3, 5]})
+    route = LookupRoute.from_sparql(sparql_endpoint, BACKEND_BY_BROWSE_NAME)
+    federated = FederatedTimeSeriesDatabase(backends, routes=[route])
+    actual_df = quarry.execute_query(TIMESTAMP_SYNC, sparql_endpoint, federated).reset_index(drop=True)
+    federated.close()
+
+    pd.testing.assert_frame_equal(actual_df, read_expected())
+    assert federated.statistics['CA_Y'].queries == 1
+    assert federated.statistics['CA_YR'].queries == 1
+
+
+def test_unrouted_signals_are_rejected():
+    federated = FederatedTimeSeriesDatabase(split_backends({'legacy': [1]}), routes=[RangeRoute('legacy', 1, 2)])
+    with pytest.raises(ValueError):
+        federated.assign_backends(pd.Series([1, 2]))
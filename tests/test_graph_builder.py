@@ -0,0 +1,92 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pandas as pd
+from opcua_tools.ua_data_types import UADouble, UAInt32, UAString, UAListOf, UAStructure, UAEnumeration, UAUInt64, \
+    UABoolean, UAGuid
+from rdflib import Graph, URIRef, RDF, Literal
+
+from swt_translator.graph_builder import create_namespace_dict, create_uri_in_namespace, append_to_uri, add_typing, \
+    add_values, classify_values
+from swt_translator.triples_writer import GraphTriplesSink, StreamingTriplesWriter
+
+NAMESPACES = ['http://opcfoundation.org/UA/', 'http://prediktor.com/paper_example']
+
+
+def test_uris_are_created_once_per_distinct_name():
+    namespace_dict = create_namespace_dict(NAMESPACES)
+    df = pd.DataFrame({'ns': [1, 1, 0, 1, -1], 'uri': ['i_1', 'i_2', 'i_1', 'i_1', 'signalId']})
+    uris = create_uri_in_namespace(df, 'ns', 'uri', namespace_dict)
+    assert uris.tolist() == ['http://prediktor.com/paper_example#i_1', 'http://prediktor.com/paper_example#i_2',
+                             'http://opcfoundation.org/UA/#i_1', 'http://prediktor.com/paper_example#i_1',
+                             'http://prediktor.com/UA-helpers/#signalId']
+    assert len(uris.cat.categories) == 4
+    assert append_to_uri(uris, '_Value').iloc[3] == 'http://prediktor.com/paper_example#i_1_Value'
+    assert len(create_uri_in_namespace(df.iloc[:0], 'ns', 'uri', namespace_dict)) == 0
+
+
+def test_typing_is_written_without_graph(tmp_path):
+    namespace_dict = create_namespace_dict(NAMESPACES)
+    typing_df = pd.DataFrame({'id': [1, 2, 3], 'type': [10, 10, 11], 'ns': [1, 1, 1], 'type_ns': [0, 0, 1]})
+    instance_uri_df = pd.DataFrame({'uri': ['i_1', 'i_2', 'i_3']}, index=pd.Index([1, 2, 3], name='id'))
+    type_uri_df = pd.DataFrame({'uri': ['BaseObjectType', 'PumpType']}, index=pd.Index([10, 11], name='id'))
+
+    graph_sink = GraphTriplesSink()
+    add_typing(typing_df=typing_df, instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, sink=graph_sink,
+               namespace_dict=namespace_dict)
+    assert (URIRef('http://prediktor.com/paper_example#i_3'), RDF.type,
+            URIRef('http://prediktor.com/paper_example#PumpType')) in graph_sink.g
+
+    path = str(tmp_path / 'kb.nt')
+    with StreamingTriplesWriter(path) as writer:
+        add_typing(typing_df=typing_df, instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, sink=writer,
+                   namespace_dict=namespace_dict)
+    g = Graph()
+    g.parse(source=path, format='nt')
+    assert set(g) == set(graph_sink.g)
+
+
+def test_values_are_classified_once_per_type():
+    values = pd.Series([UAInt32(1), UAEnumeration(2, 'Two', 'Two'), UADouble(0.5), UAString('a'), UAGuid('g'),
+                        UAListOf([UADouble(1.0)], 'Double'), UAStructure('<xml/>'), UABoolean(True), None])
+    assert classify_values(values).tolist() == ['hasIntegerValue', 'hasIntegerValue', 'hasFloatValue',
+                                                'hasStringValue', 'hasStringValue', None, None, None, None]
+
+
+def test_value_triples_match_graph(tmp_path):
+    namespace_dict = create_namespace_dict(NAMESPACES)
+    values = [UAInt32(-3), UAUInt64(2 ** 64 - 1), UADouble(2.5), UADouble(1e-7), UADouble(None),
+              UAString('say "hi"'), UAString(None), UAListOf([UAString('a')], 'String'), UAStructure('<xml/>')]
+    ids = list(range(1, len(values) + 1))
+    values_df = pd.DataFrame({'id': ids, 'ns': 1, 'Value': values, 'EngineeringUnitsValue': None})
+    instance_uri_df = pd.DataFrame({'uri': ['i_' + str(i) for i in ids]}, index=pd.Index(ids, name='id'))
+
+    graph_sink = GraphTriplesSink()
+    add_values(values_df=values_df, instance_uri_df=instance_uri_df, type_uri_df=None, sink=graph_sink,
+               namespace_dict=namespace_dict)
+    literals = {str(s).split('#')[1]: o for s, p, o in graph_sink.g if isinstance(o, Literal)}
+    assert literals.keys() == {'i_1_Value', 'i_2_Value', 'i_3_Value', 'i_4_Value', 'i_6_Value'}
+    assert literals['i_2_Value'].toPython() == 2 ** 64 - 1
+    assert literals['i_4_Value'] == Literal(1e-7)
+    assert len(graph_sink.g) == len(values) + 5
+
+    path = str(tmp_path / 'kb.nt')
+    with StreamingTriplesWriter(path) as writer:
+        add_values(values_df=values_df, instance_uri_df=instance_uri_df, type_uri_df=None, sink=writer,
+                   namespace_dict=namespace_dict)
+    g = Graph()
+    g.parse(source=path, format='nt')
+    assert set(g) == set(graph_sink.g)
+
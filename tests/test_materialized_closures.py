@@ -0,0 +1,88 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+from rdflib import URIRef, Graph
+
+from quarry.engine import execute_static_query
+from quarry.rewrite import load_materialized_closures, TRANSITIVE_CLOSURE_OF_PROPERTY_URI
+from swt_translator.closure import closure_pairs
+from swt_translator.graph_builder import build_instance_graph
+from swt_translator.sharded_writer import write_instance_shards, read_manifest
+from .query_split_queries import BASIC
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+from .test_sharded_writer import create_triples_dfs, NAMESPACES
+
+PATH_HERE = os.path.dirname(__file__)
+ORGANIZES = 'http://opcfoundation.org/UA/#Organizes'
+ORGANIZES_CLOSURE = 'http://prediktor.com/UA-helpers/#Organizes_closure'
+FUNCTIONAL_ASPECT = 'http://prediktor.com/RDS-OG-Fragment#functionalAspect'
+FUNCTIONAL_ASPECT_CLOSURE = 'http://prediktor.com/UA-helpers/#functionalAspect_closure'
+
+
+def organizes_pairs(g: Graph, predicate: str):
+    prefix = NAMESPACES[1] + '#'
+    return {(str(s).replace(prefix, ''), str(o).replace(prefix, '')) for s, o in g.subject_objects(URIRef(predicate))}
+
+
+def test_closures_are_materialized():
+    params_dict = {'closure_predicates': [ORGANIZES]}
+    g = build_instance_graph(triples_dfs=create_triples_dfs(), namespaces=NAMESPACES, params_dict=params_dict)
+    assert organizes_pairs(g, ORGANIZES) == {('i_1', 'i_2'), ('i_1', 'i_3'), ('i_2', 'i_4')}
+    assert organizes_pairs(g, ORGANIZES_CLOSURE) == {('i_1', 'i_2'), ('i_1', 'i_3'), ('i_2', 'i_4'), ('i_1', 'i_4')}
+    assert set(g.objects(URIRef(ORGANIZES_CLOSURE), URIRef(TRANSITIVE_CLOSURE_OF_PROPERTY_URI))) == \
+        {URIRef(ORGANIZES)}
+
+
+def test_closures_are_not_partitioned_in_shards(tmp_path):
+    manifest_path = write_instance_shards(triples_dfs=create_triples_dfs(), namespaces=NAMESPACES,
+                                          params_dict={'closure_predicates': [ORGANIZES]}, output_dir=str(tmp_path),
+                                          max_workers=2, partition_size=1, compress=False)
+    closure_shards = [p for p in read_manifest(manifest_path) if os.path.basename(p).startswith('reference_closures')]
+    assert len(closure_shards) == 1
+    g = Graph().parse(closure_shards[0], format='nt')
+    assert len(g) == 5
+
+
+def create_sparql_endpoint() -> RDFLibSPARQLEndpoint:
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    graph = sparql_endpoint.graph
+    pairs = list(graph.subject_objects(URIRef(FUNCTIONAL_ASPECT)))
+    closure = closure_pairs(pd.Series([s for s, _ in pairs]), pd.Series([o for _, o in pairs]))
+    for s, o in zip(closure['subject'], closure['object']):
+        graph.add((s, URIRef(FUNCTIONAL_ASPECT_CLOSURE), o))
+    graph.add((URIRef(FUNCTIONAL_ASPECT_CLOSURE), URIRef(TRANSITIVE_CLOSURE_OF_PROPERTY_URI),
+               URIRef(FUNCTIONAL_ASPECT)))
+    return sparql_endpoint
+
+
+def test_paths_are_rewritten_to_materialized_closures():
+    sparql_endpoint = create_sparql_endpoint()
+    closures = load_materialized_closures(sparql_endpoint)
+    assert closures == {FUNCTIONAL_ASPECT: FUNCTIONAL_ASPECT_CLOSURE}
+
+    expected = execute_static_query(BASIC, sparql_endpoint)
+    assert 'functionalAspect>+' in expected.model_sparql
+    actual = execute_static_query(BASIC, sparql_endpoint, closures=closures)
+    assert '<' + FUNCTIONAL_ASPECT_CLOSURE + '> ' in actual.model_sparql
+    assert 'functionalAspect>+' not in actual.model_sparql
+    pd.testing.assert_frame_equal(actual.static_df, expected.static_df)
+
+    zero_or_more = execute_static_query(BASIC.replace('functionalAspect+', 'functionalAspect*'), sparql_endpoint,
+                                        closures=closures)
+    assert '<' + FUNCTIONAL_ASPECT_CLOSURE + '>?' in zero_or_more.model_sparql
+    pd.testing.assert_frame_equal(zero_or_more.static_df, expected.static_df)
@@ -0,0 +1,63 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pytest
+from SPARQLWrapper import SPARQLWrapper
+
+import swt_translator as swtt
+from swt_translator.bulk_loader import BulkLoader
+
+PATH_HERE = os.path.dirname(__file__)
+XML_DIR = PATH_HERE + '/input_data/translate_paper_example'
+NAMESPACES = ['http://opcfoundation.org/UA/', 'http://prediktor.com/paper_example']
+
+
+@pytest.mark.parametrize('options', [
+    {'streaming': True, 'sharded': True},
+    {'streaming': True, 'previous_triples': 'triples.parquet'},
+    {'sharded': True, 'previous_triples': 'triples.parquet'},
+    {'update_endpoint': SPARQLWrapper('http://localhost:3030/kb/update')},
+], ids=['streaming_sharded', 'streaming_previous_triples', 'sharded_previous_triples', 'update_endpoint'])
+def test_conflicting_options_are_rejected(tmp_path, options):
+    output_file = str(tmp_path / 'kb.ttl')
+    with pytest.raises(ValueError):
+        swtt.translate(xml_dir=XML_DIR, namespaces=NAMESPACES, output_ttl_file=output_file, **options)
+    assert not os.path.exists(output_file)
+
+
+@pytest.mark.parametrize('options', [
+    {'previous_triples': 'triples.parquet'},
+    {'sharded': True},
+    {'streaming': True},
+], ids=['previous_triples', 'sharded', 'streaming'])
+def test_loader_options_are_rejected(options):
+    loader = BulkLoader('http://localhost:3030/kb/data')
+    with pytest.raises(ValueError, match='loader'):
+        swtt.translate(xml_dir=XML_DIR, namespaces=NAMESPACES, output_ttl_file=None, loader=loader, **options)
+
+
+def test_output_file_is_rejected_with_loader(tmp_path):
+    output_file = str(tmp_path / 'kb.ttl')
+    loader = BulkLoader('http://localhost:3030/kb/data')
+    with pytest.raises(ValueError, match='output_ttl_file'):
+        swtt.translate(xml_dir=XML_DIR, namespaces=NAMESPACES, output_ttl_file=output_file, loader=loader)
+    assert not os.path.exists(output_file)
+
+
+def test_output_file_is_required_without_loader():
+    with pytest.raises(ValueError, match='output_ttl_file'):
+        swtt.translate(xml_dir=XML_DIR, namespaces=NAMESPACES, output_ttl_file=None)
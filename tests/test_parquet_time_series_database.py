@@ -0,0 +1,70 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import quarry
+from quarry.parquet_time_series_database import ParquetTimeSeriesDatabase
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP, LATEST
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+@pytest.fixture(scope='module')
+def sparql_endpoint():
+    return RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+
+
+@pytest.fixture
+def time_series_database(tmp_path):
+    df = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv').data
+    df['day'] = df['ts'].dt.date
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), str(tmp_path),
+                        partition_cols=['signal_id', 'day'])
+    return ParquetTimeSeriesDatabase(str(tmp_path))
+
+
+def test_timestamp(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database).reset_index(drop=True)
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_latest(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(LATEST, sparql_endpoint, time_series_database)
+    actual_df = actual_df.sort_values('cvalveName').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, pd.read_csv(PATH_HERE + '/expected/query_split/latest.csv'))
+
+
+def test_partitions_are_pruned(sparql_endpoint, time_series_database):
+    inner = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    quarry.execute_query(TIMESTAMP, sparql_endpoint, inner)
+    tsq = inner.queries[0]
+
+    scan_filter = time_series_database.scan_filter(tsq)
+    assert len(list(time_series_database.dataset.get_fragments(filter=scan_filter))) == 3
+    assert len(list(time_series_database.dataset.get_fragments())) == 6
+
+    table = time_series_database.execute_query(tsq)
+    assert table.column_names == ['cayValue_signal_id', 'ts', 'rv']
+    assert table['rv'].to_pylist() == [0.01, 0.011]
@@ -0,0 +1,62 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from quarry import QueryEngine
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import BASIC, BASIC_EU, TIMESTAMP, TIMESTAMP_SYNC
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+CASES = [(BASIC, 'basic.csv', True), (BASIC_EU, 'basic_eu.csv', False), (TIMESTAMP, 'timestamp.csv', True),
+         (TIMESTAMP_SYNC, 'timestamp_sync.csv', True)]
+
+
+@pytest.fixture(scope='module')
+def query_engine():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    with QueryEngine(sparql_endpoint=sparql_endpoint, time_series_database=time_series_database,
+                     max_workers=4) as query_engine:
+        yield query_engine
+
+
+def read_expected(name: str, parse_ts: bool) -> pd.DataFrame:
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/' + name)
+    if parse_ts:
+        expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    return expected_df
+
+
+def test_concurrent_queries(query_engine):
+    cases = CASES * 5
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda c: query_engine.execute_query(c[0]), cases))
+
+    for (_, expected_file, parse_ts), actual_df in zip(cases, results):
+        expected_df = read_expected(expected_file, parse_ts)
+        pd.testing.assert_frame_equal(actual_df.reset_index(drop=True), expected_df)
+
+
+def test_deterministic_join_columns(query_engine):
+    first_df = query_engine.execute_query(TIMESTAMP_SYNC)
+    second_df = query_engine.execute_query(TIMESTAMP_SYNC)
+    assert first_df.index.names == second_df.index.names
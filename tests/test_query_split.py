@@ -25,6 +25,8 @@ from SPARQLWrapper import SPARQLWrapper
 import quarry
 import swt_translator as swtt
 from .postgresql_time_series_database import SQLTimeSeriesDatabase
+from quarry.sql_time_series_database import SQLTimeSeriesDatabase as QuarrySQLTimeSeriesDatabase
+from .query_split_queries import LATEST, TIMESTAMP
 
 PATH_HERE = os.path.dirname(__file__)
 
@@ -249,3 +251,17 @@ def test_timestamp_sync(sparql_endpoint, timeseriesdata, pg_time_series_database
     expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp_sync.csv')
     expected_df['ts'] = pd.to_datetime(expected_df['ts'])
     pd.testing.assert_frame_equal(actual_df, expected_df)
+
+def test_latest(sparql_endpoint, pg_time_series_database):
+    actual_df = quarry.execute_query(LATEST, sparql_endpoint, pg_time_series_database)
+    actual_df = actual_df.sort_values('cvalveName').reset_index(drop=True)
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/latest.csv')
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_timestamp_sql_adapter(sparql_endpoint, timeseriesdata, params):
+    time_series_database = QuarrySQLTimeSeriesDatabase(lambda: psycopg2.connect(**params), server_side_cursors=True)
+    actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database).reset_index(drop=True)
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
@@ -0,0 +1,91 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import quarry
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import BASIC, BASIC_EU, TIMESTAMP, TIMESTAMP_SYNC, LATEST, AS_OF, LATEST_FILTER
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+@pytest.fixture(scope='module')
+def sparql_endpoint():
+    return RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+
+
+@pytest.fixture(scope='module', params=[True, False], ids=['arrow', 'pandas'])
+def time_series_database(request):
+    return InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv', arrow=request.param)
+
+
+def read_expected(name: str, parse_ts: bool) -> pd.DataFrame:
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/' + name)
+    if parse_ts:
+        expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    return expected_df
+
+
+def test_basic(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(BASIC, sparql_endpoint, time_series_database).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected('basic.csv', parse_ts=True))
+
+
+def test_basic_eu(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(BASIC_EU, sparql_endpoint, time_series_database).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected('basic_eu.csv', parse_ts=False))
+
+
+def test_timestamp(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected('timestamp.csv', parse_ts=True))
+
+
+def test_timestamp_sync(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(TIMESTAMP_SYNC, sparql_endpoint, time_series_database).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected('timestamp_sync.csv', parse_ts=True))
+
+
+@pytest.mark.parametrize('sparql,expected', [(LATEST, 'latest.csv'), (AS_OF, 'as_of.csv')], ids=['latest', 'as_of'])
+def test_snapshot(sparql_endpoint, time_series_database, sparql, expected):
+    actual_df = quarry.execute_query(sparql, sparql_endpoint, time_series_database)
+    actual_df = actual_df.sort_values('cvalveName').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected(expected, parse_ts=False))
+
+
+def test_snapshot_is_filtered_after_selection(sparql_endpoint, time_series_database):
+    actual_df = quarry.execute_query(LATEST_FILTER, sparql_endpoint, time_series_database)
+    assert actual_df['cvalveName'].tolist() == ['ControlValveInZB']
+
+
+def test_as_arrow(sparql_endpoint, time_series_database):
+    actual = quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database, as_arrow=True)
+    assert isinstance(actual, pa.Table)
+    pd.testing.assert_frame_equal(actual.to_pandas(), read_expected('timestamp.csv', parse_ts=True))
+
+
+def test_arrow_filter_pushdown():
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database)
+    tsq = time_series_database.queries[0]
+    assert len(tsq.literal_expressions) == 2
+    assert (tsq.df['rv'] < 0.06).all()
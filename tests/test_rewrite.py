@@ -0,0 +1,98 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+from rdflib import Literal, URIRef
+
+import quarry
+from quarry.rewrite import IS_EXTERNAL_VALUE_PROPERTY_URI, SIGNAL_ID_PROPERTY
+from quarry.type_inference import REAL_VALUE_VERB
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+STATIC_VALUES = """
+PREFIX rdsog: <http://prediktor.com/RDS-OG-Fragment#>
+PREFIX opcua: <http://opcfoundation.org/UA/#>
+SELECT ?cvalveName ?rv ?rrv WHERE {
+?cvalve a rdsog:LiquidControlValveType.
+?cvalve opcua:displayName ?cvalveName.
+?cvalve opcua:hierarchicalReferences ?cay.
+?cay opcua:browseName "CA_Y".
+?cay opcua:value ?cayValue.
+?cayValue opcua:realValue ?rv.
+?cvalve opcua:hierarchicalReferences ?cayr.
+?cayr opcua:browseName "CA_YR".
+?cayr opcua:value ?cayrValue.
+?cayrValue opcua:realValue ?rrv.
+}
+"""
+
+# The rewritten query with each optional triple in its own OPTIONAL block
+STATIC_VALUES_PER_TRIPLE = """
+PREFIX rdsog: <http://prediktor.com/RDS-OG-Fragment#>
+PREFIX opcua: <http://opcfoundation.org/UA/#>
+PREFIX uahelpers: <http://prediktor.com/UA-helpers/#>
+SELECT ?cvalveName ?rv ?rrv ?cayValue_is_ext_var ?cayValue_signal_id ?cayrValue_is_ext_var ?cayrValue_signal_id
+WHERE {
+?cvalve a rdsog:LiquidControlValveType.
+?cvalve opcua:displayName ?cvalveName.
+?cvalve opcua:hierarchicalReferences ?cay.
+?cay opcua:browseName "CA_Y".
+?cay opcua:value ?cayValue.
+?cayValue uahelpers:isExternalValue ?cayValue_is_ext_var.
+?cvalve opcua:hierarchicalReferences ?cayr.
+?cayr opcua:browseName "CA_YR".
+?cayr opcua:value ?cayrValue.
+?cayrValue uahelpers:isExternalValue ?cayrValue_is_ext_var.
+OPTIONAL { ?cayValue opcua:realValue ?rv . }
+OPTIONAL { ?cayValue uahelpers:signalId ?cayValue_signal_id . }
+OPTIONAL { ?cayrValue opcua:realValue ?rrv . }
+OPTIONAL { ?cayrValue uahelpers:signalId ?cayrValue_signal_id . }
+}
+"""
+
+
+def create_sparql_endpoint() -> RDFLibSPARQLEndpoint:
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    graph = sparql_endpoint.graph
+    values = sorted(graph.subjects(URIRef(IS_EXTERNAL_VALUE_PROPERTY_URI), Literal(True)))
+    # Values with both a signal id and a data value, with only a data value and with only a signal id
+    graph.add((values[0], URIRef(REAL_VALUE_VERB), Literal(0.5)))
+    graph.add((values[1], URIRef(REAL_VALUE_VERB), Literal(0.25)))
+    graph.remove((values[1], URIRef(SIGNAL_ID_PROPERTY), None))
+    return sparql_endpoint
+
+
+def test_one_optional_group_per_value():
+    sparql_endpoint = create_sparql_endpoint()
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    with quarry.QueryEngine(sparql_endpoint, time_series_database) as query_engine:
+        context = query_engine.execute_static_query(STATIC_VALUES)
+
+    for value_variable in ['cayValue', 'cayrValue']:
+        group = 'OPTIONAL {\n?' + value_variable + ' <' + IS_EXTERNAL_VALUE_PROPERTY_URI + '>'
+        assert context.model_sparql.count(group) == 1
+    assert context.model_sparql.count('OPTIONAL') == 6
+
+    sparql_endpoint.setQuery(STATIC_VALUES_PER_TRIPLE)
+    expected_df = quarry.engine.convert_result_to_dataframe(sparql_endpoint.query().convert())
+    actual_df = context.static_df[expected_df.columns]
+    pd.testing.assert_frame_equal(actual_df.sort_values('cvalveName').reset_index(drop=True),
+                                  expected_df.sort_values('cvalveName').reset_index(drop=True))
+    assert actual_df['rv'].notna().any() or actual_df['rrv'].notna().any()
@@ -0,0 +1,57 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+
+from quarry import QueryEngine
+from quarry.semi_join import plan_semi_joins
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP, TIMESTAMP_SYNC
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+def create_time_series_database() -> InMemoryTimeSeriesDatabase:
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    # Signals not in the knowledge base, so that the filter of TIMESTAMP is selective
+    other_signals = pd.DataFrame({'signal_id': range(7, 17), 'real_value': 0.5,
+                                  'ts': pd.Timestamp('2021-03-25 09:31:23.218498', tz='UTC')})
+    other_signals['signal_id'] = other_signals['signal_id'].astype('int32')
+    time_series_database.data = pd.concat([time_series_database.data, other_signals], ignore_index=True)
+    return time_series_database
+
+
+def test_selective_filter_restricts_sparql_query():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database = create_time_series_database()
+    with QueryEngine(sparql_endpoint, time_series_database, semi_join=True) as query_engine:
+        actual_df = query_engine.execute_query(TIMESTAMP).reset_index(drop=True)
+
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+    assert 'VALUES ?cayValue_signal_id { 6 }' in sparql_endpoint.queries[0]
+    assert time_series_database.queries[0].signal_ids.tolist() == [6]
+
+
+def test_queries_without_data_filters_are_not_restricted():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    with QueryEngine(sparql_endpoint, create_time_series_database(), semi_join=True) as query_engine:
+        context = query_engine.execute_static_query(TIMESTAMP_SYNC)
+    assert 'VALUES' not in context.model_sparql
+    assert plan_semi_joins(context.op, create_time_series_database(), max_selectivity=1.0) == {}
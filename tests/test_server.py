@@ -0,0 +1,109 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+import os
+
+import pandas as pd
+import pyarrow.ipc as ipc
+import pytest
+import requests
+
+from quarry import QueryEngine
+from quarry.server import QueryServer
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import BASIC, TIMESTAMP
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+class FailingTimeSeriesDatabase(InMemoryTimeSeriesDatabase):
+    """Fails from the second time series query on, which is that of the second chunk of a result."""
+
+    def execute_query(self, tsq):
+        if len(self.queries) > 0:
+            raise RuntimeError('Time series database failed')
+        return super().execute_query(tsq)
+
+
+@pytest.fixture(scope='module')
+def query_server():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    query_engine = QueryEngine(sparql_endpoint=sparql_endpoint, time_series_database=time_series_database,
+                               max_workers=4, chunk_size=2)
+    server = QueryServer(query_engine=query_engine, port=0).start()
+    yield server
+    server.shutdown()
+    query_engine.close()
+
+
+def expected_timestamp_df() -> pd.DataFrame:
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    return expected_df
+
+
+def test_arrow_stream(query_server):
+    response = requests.post(query_server.url, data=TIMESTAMP.encode('utf-8'),
+                             headers={'Content-Type': 'application/sparql-query'})
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/vnd.apache.arrow.stream'
+    actual_df = ipc.open_stream(response.content).read_all().to_pandas()
+    pd.testing.assert_frame_equal(actual_df, expected_timestamp_df())
+
+
+def test_csv(query_server):
+    response = requests.get(query_server.url, params={'query': BASIC}, headers={'Accept': 'text/csv'})
+    assert response.status_code == 200
+    actual_df = pd.read_csv(io.BytesIO(response.content))
+    assert len(actual_df) == 9
+    assert list(actual_df.columns) == ['cvalveName', 'ts', 'rv']
+
+
+def test_json_lines(query_server):
+    response = requests.post(query_server.url, data={'query': TIMESTAMP, 'format': 'json'})
+    assert response.status_code == 200
+    actual_df = pd.read_json(io.BytesIO(response.content), lines=True)
+    assert list(actual_df['rv']) == [0.01, 0.011]
+
+
+def test_bad_query(query_server):
+    response = requests.post(query_server.url, data={'query': 'SELECT WHERE'})
+    assert response.status_code == 400
+    assert 'error' in response.json()
+
+
+def test_missing_query(query_server):
+    response = requests.get(query_server.url)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('result_format', ['arrow', 'csv', 'json'])
+def test_failure_while_streaming_aborts_response(result_format):
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    data = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv').data
+    time_series_database = FailingTimeSeriesDatabase(data)
+    query_engine = QueryEngine(sparql_endpoint=sparql_endpoint, time_series_database=time_series_database,
+                               chunk_size=2)
+    server = QueryServer(query_engine=query_engine, port=0).start()
+    try:
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            requests.get(server.url, params={'query': BASIC, 'format': result_format})
+        assert len(time_series_database.queries) == 1
+    finally:
+        server.shutdown()
+        query_engine.close()
@@ -0,0 +1,61 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import os
+
+import pandas as pd
+from opcua_tools.ua_data_types import UADouble, UAString, UAInt32
+from rdflib import Graph
+
+from swt_translator.classes import TriplesDfs
+from swt_translator.graph_builder import build_instance_graph
+from swt_translator.sharded_writer import write_instance_shards, read_manifest
+
+NAMESPACES = ['http://opcfoundation.org/UA/', 'http://prediktor.com/paper_example']
+
+
+def create_triples_dfs() -> TriplesDfs:
+    ids = [1, 2, 3, 4]
+    instance_uri_df = pd.DataFrame({'id': ids, 'uri': ['i_' + str(i) for i in ids]})
+    type_uri_df = pd.DataFrame({'id': [10, 11, 12], 'uri': ['BaseObjectType', 'BaseDataVariableType', 'Organizes']})
+    typing_df = pd.DataFrame({'id': ids, 'type': [10, 10, 11, 11], 'ns': 1, 'type_ns': 0})
+    display_name_df = pd.DataFrame({'id': ids, 'ns': 1, 'attribute': ['A', 'B', 'C', 'D']})
+    values_df = pd.DataFrame({'id': [3, 4], 'ns': 1, 'Value': [UADouble(0.5), UAString('on')],
+                              'EngineeringUnitsValue': [None, None]})
+    is_external_variable_df = pd.DataFrame({'id': [3, 4], 'ns': 1, 'is_external_variable': [True, False]})
+    references_df = pd.DataFrame({'src': [1, 1, 2], 'trg': [2, 3, 4], 'reference_type': 12, 'src_ns': 1, 'trg_ns': 1,
+                                  'reference_type_ns': 0})
+    signal_id_df = pd.DataFrame({'id': [3], 'ns': 1, 'signal_id': pd.Series([7], dtype='Int32')})
+    return TriplesDfs(type_df=None, reference_type_df=None, typing_df=typing_df,
+                      node_attributes_dfs={'DisplayName': display_name_df}, values_df=values_df,
+                      is_external_variable_df=is_external_variable_df, references_df=references_df,
+                      instance_uri_df=instance_uri_df, type_uri_df=type_uri_df, signal_id_df=signal_id_df)
+
+
+def test_shards_contain_instance_graph(tmp_path):
+    triples_dfs = create_triples_dfs()
+    manifest_path = write_instance_shards(triples_dfs=triples_dfs, namespaces=NAMESPACES, params_dict={},
+                                          output_dir=str(tmp_path), max_workers=2, partition_size=2)
+    shard_paths = read_manifest(manifest_path)
+    assert len([p for p in shard_paths if os.path.basename(p).startswith('references-')]) == 2
+
+    g = Graph()
+    for path in shard_paths:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            g.parse(data=f.read(), format='nt')
+    expected = build_instance_graph(triples_dfs=triples_dfs, namespaces=NAMESPACES, params_dict={})
+    assert len(expected) == 18
+    assert set(g) == set(expected)
@@ -0,0 +1,126 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from quarry import QueryEngine
+from quarry.single_flight import SingleFlight, normalize_sparql
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP, LATEST
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+class GatedTimeSeriesDatabase(InMemoryTimeSeriesDatabase):
+    def __init__(self, data: pd.DataFrame):
+        super().__init__(data=data)
+        self.gate = threading.Event()
+
+    def execute_query(self, tsq):
+        self.gate.wait(timeout=10)
+        return super().execute_query(tsq)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise TimeoutError()
+        time.sleep(0.01)
+
+
+def test_single_flight_shares_result_and_exception():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(timeout=10)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(single_flight.do, 'key', fn) for _ in range(5)]
+        wait_for(lambda: single_flight.shared_calls == 4)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+    def fail():
+        raise ValueError('failed')
+
+    with pytest.raises(ValueError):
+        single_flight.do('key', fail)
+    assert single_flight.in_flight == {}
+
+
+def test_identical_queries_execute_once():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    data = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv').data
+    time_series_database = GatedTimeSeriesDatabase(data=data)
+    query_engine = QueryEngine(sparql_endpoint=sparql_endpoint, time_series_database=time_series_database)
+
+    # Whitespace differences do not matter
+    queries = [TIMESTAMP, TIMESTAMP.replace('\n', '\n  ')] * 5
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(query_engine.execute_query, q) for q in queries]
+        wait_for(lambda: query_engine.query_flights.shared_calls == 9)
+        time_series_database.gate.set()
+        results = [f.result() for f in futures]
+
+    assert len(time_series_database.queries) == 1
+    assert len(sparql_endpoint.queries) == 1
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    for actual_df in results:
+        pd.testing.assert_frame_equal(actual_df.reset_index(drop=True), expected_df)
+
+
+def test_identical_snapshot_queries_share_arrow_result():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    data = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv').data
+    time_series_database = GatedTimeSeriesDatabase(data=data)
+    query_engine = QueryEngine(sparql_endpoint=sparql_endpoint, time_series_database=time_series_database,
+                               max_workers=4)
+
+    # The queries differ in as_arrow, so they are executed separately but share their time series query, and every
+    # execution converts the same Arrow table of the time series database
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(query_engine.execute_query, LATEST, as_arrow) for as_arrow in [False, True] * 4]
+        wait_for(lambda: query_engine.time_series_database.single_flight.shared_calls == 1)
+        time_series_database.gate.set()
+        results = [f.result() for f in futures]
+    query_engine.close()
+
+    assert len(time_series_database.queries) == 1
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/latest.csv')
+    for actual in results:
+        actual_df = actual if isinstance(actual, pd.DataFrame) else actual.to_pandas()
+        actual_df = actual_df.sort_values('cvalveName').reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_normalize_sparql_keeps_literals():
+    assert normalize_sparql('SELECT ?x WHERE {\n ?x <http://a#b>  "A  B" . # comment\n}') == \
+           'SELECT ?x WHERE { ?x <http://a#b> "A  B" . }'
@@ -0,0 +1,98 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from io import BytesIO
+
+import pandas as pd
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import pytest
+
+import quarry
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import BASIC, TIMESTAMP
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+@pytest.fixture(scope='module')
+def sparql_endpoint():
+    return RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+
+
+@pytest.fixture(scope='module')
+def time_series_database():
+    return InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+
+
+def test_parquet_sink(sparql_endpoint, time_series_database, tmp_path):
+    path = str(tmp_path / 'basic.parquet')
+    sink = quarry.ParquetSink(path, row_group_size=2)
+    quarry.execute_query(BASIC, sparql_endpoint, time_series_database, sink=sink, chunk_size=1)
+
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 6
+    assert sink.rows_written == 9
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/basic.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    actual_df = parquet_file.read().to_pandas().sort_values(['cvalveName', 'ts']).reset_index(drop=True)
+    expected_df = expected_df.sort_values(['cvalveName', 'ts']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_arrow_ipc_sink(sparql_endpoint, time_series_database):
+    buffer = BytesIO()
+    quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database, sink=quarry.ArrowIPCSink(buffer))
+
+    buffer.seek(0)
+    actual_df = ipc.open_stream(buffer).read_all().to_pandas()
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_empty_result_is_readable(sparql_endpoint, time_series_database, tmp_path):
+    q = BASIC.replace('"CA_Y"', '"NO_SUCH_NAME"')
+    path = str(tmp_path / 'empty.parquet')
+    quarry.execute_query(q, sparql_endpoint, time_series_database, sink=quarry.ParquetSink(path))
+    assert pq.read_table(path).num_rows == 0
+
+
+def test_column_without_values_in_first_chunk():
+    buffer = BytesIO()
+    sink = quarry.ArrowIPCSink(buffer)
+    sink.write(pd.DataFrame({'a': [1, 2], 'v': [None, None], 's': [None, None]}))
+    sink.write(pd.DataFrame({'a': [3], 'v': [1.5], 's': [None]}))
+    sink.write(pd.DataFrame({'a': [4], 'v': [None], 's': ['on']}))
+    sink.write(pd.DataFrame({'a': [5], 'v': [2.5], 's': ['off']}))
+    sink.close()
+
+    buffer.seek(0)
+    table = ipc.open_stream(buffer).read_all()
+    assert sink.rows_written == 5
+    assert str(table.schema.field('v').type) == 'double' and str(table.schema.field('s').type) == 'string'
+    assert table.column('v').to_pylist() == [None, None, 1.5, None, 2.5]
+    assert table.column('s').to_pylist() == [None, None, None, 'on', 'off']
+
+
+def test_aborted_parquet_sink_removes_file(tmp_path):
+    path = str(tmp_path / 'partial.parquet')
+    sink = quarry.ParquetSink(path)
+    sink.write(pd.DataFrame({'a': [1, 2]}))
+    assert os.path.exists(path)
+    sink.abort()
+    assert not os.path.exists(path)
@@ -0,0 +1,97 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import quarry
+from quarry.semi_join import plan_semi_joins
+from quarry.sql_time_series_database import SQLTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP, LATEST
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+@pytest.fixture(scope='module')
+def sparql_endpoint():
+    return RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    path = str(tmp_path / 'tsdata.db')
+    df = pd.read_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE TSDATA (ts TIMESTAMP, real_value REAL, signal_id INTEGER)')
+        conn.executemany('INSERT INTO TSDATA VALUES (?, ?, ?)', df[['ts', 'real_value', 'signal_id']].values.tolist())
+    return path
+
+
+def create_database(database_path, statements, **kwargs):
+    def connect():
+        conn = sqlite3.connect(database_path)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    return SQLTimeSeriesDatabase(connect, paramstyle='qmark', signal_id_binding='in', fetch_size=2, **kwargs)
+
+
+@pytest.mark.parametrize('temp_table_threshold', [None, 1], ids=['parameters', 'temp_table'])
+def test_timestamp(sparql_endpoint, database_path, temp_table_threshold):
+    statements = []
+    time_series_database = create_database(database_path, statements, temp_table_threshold=temp_table_threshold)
+    actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, time_series_database).reset_index(drop=True)
+
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+
+    select = [s for s in statements if s.startswith('SELECT t.signal_id')][0]
+    assert 't.ts >= ' in select and 't.real_value < ' in select
+    if temp_table_threshold is None:
+        assert 't.signal_id IN (' in select
+    else:
+        assert 'JOIN quarry_signal_ids' in select
+
+
+def test_latest(sparql_endpoint, database_path):
+    statements = []
+    time_series_database = create_database(database_path, statements)
+    actual_df = quarry.execute_query(LATEST, sparql_endpoint, time_series_database)
+    actual_df = actual_df.sort_values('cvalveName').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, pd.read_csv(PATH_HERE + '/expected/query_split/latest.csv'))
+    assert any('ROW_NUMBER()' in s for s in statements)
+
+
+def test_matching_signal_ids(sparql_endpoint, database_path):
+    statements = []
+    time_series_database = create_database(database_path, statements)
+    context = quarry.QueryEngine(sparql_endpoint, time_series_database).execute_static_query(TIMESTAMP)
+    for _ in range(2):
+        assert plan_semi_joins(context.op, time_series_database, max_selectivity=1.0) == {'cayValue_signal_id': [6]}
+
+    # One bounded probe per plan, reused for the matching signals, and the signals of the table counted once
+    probes = [s for s in statements if s.startswith('SELECT DISTINCT t.signal_id FROM TSDATA t WHERE t.ts >= ')]
+    assert len(probes) == 2 and all(s.endswith(' LIMIT 1001') for s in probes)
+    assert statements.count('SELECT COUNT(DISTINCT t.signal_id) FROM TSDATA t') == 1
+
+
+def test_array_binding_requires_format_paramstyle():
+    with pytest.raises(ValueError):
+        SQLTimeSeriesDatabase(sqlite3.connect, paramstyle='qmark', signal_id_binding='array')
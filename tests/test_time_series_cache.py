@@ -0,0 +1,107 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import dataclasses
+import os
+
+import pandas as pd
+
+import quarry
+from quarry.time_series_cache import CachingTimeSeriesDatabase
+from quarry.time_series_database import time_bounds
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import AS_OF, LATEST, TIMESTAMP, TIMESTAMP_SYNC
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+
+def read_expected(name: str) -> pd.DataFrame:
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/' + name)
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    return expected_df
+
+
+def create_cache(now: str, **kwargs):
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    cache = CachingTimeSeriesDatabase(time_series_database, bucket_size=pd.Timedelta(minutes=1),
+                                      clock=lambda: pd.Timestamp(now, tz='UTC'), **kwargs)
+    return time_series_database, cache
+
+
+def test_repeated_query_hits_cache():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database, cache = create_cache('2021-03-25 10:00:00')
+
+    for _ in range(2):
+        actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, cache).reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual_df, read_expected('timestamp.csv'))
+
+    # 31 buckets for each of the 3 signals, the second query only fetches the open bucket at 10:00
+    assert len(time_series_database.queries) == 2
+    assert time_bounds(time_series_database.queries[1])[0] == pd.Timestamp('2021-03-25 10:00:00', tz='UTC')
+    assert cache.statistics.misses == 93 + 3
+    assert cache.statistics.hits == 90
+    assert cache.hit_ratio == 90 / 186
+    assert cache.bytes_saved > 0
+
+    # Chunks are shared with queries using other variables and filters
+    actual_df = quarry.execute_query(TIMESTAMP_SYNC, sparql_endpoint, cache).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected('timestamp_sync.csv'))
+    assert cache.statistics.hits == 180
+
+
+def test_open_tail_is_refetched():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database, cache = create_cache('2021-03-25 09:32:30')
+
+    for _ in range(2):
+        actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, cache).reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual_df, read_expected('timestamp.csv'))
+
+    assert len(time_series_database.queries) == 2
+    start, end = time_bounds(time_series_database.queries[-1])
+    assert start == pd.Timestamp('2021-03-25 09:32:00', tz='UTC')
+    assert end == pd.Timestamp('2021-03-25 09:33:00', tz='UTC')
+
+
+def test_least_recently_used_chunks_are_evicted():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database, cache = create_cache('2021-03-25 10:00:00', max_bytes=100)
+
+    quarry.execute_query(TIMESTAMP, sparql_endpoint, cache)
+    assert 0 < cache.cached_bytes <= 100
+    assert len(cache.chunks) < cache.statistics.misses
+
+
+def test_snapshot_queries_are_passed_on():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database, cache = create_cache('2021-03-25 10:00:00')
+
+    actual_df = quarry.execute_query(TIMESTAMP, sparql_endpoint, cache).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual_df, read_expected('timestamp.csv'))
+
+    for query, name in [(LATEST, 'latest.csv'), (AS_OF, 'as_of.csv')]:
+        actual_df = quarry.execute_query(query, sparql_endpoint, cache)
+        actual_df = actual_df.sort_values(by='cvalveName').reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual_df, pd.read_csv(PATH_HERE + '/expected/query_split/' + name))
+
+    # Snapshot rows are not the samples of a time range, so they are neither served from nor stored as chunks
+    snapshot_tsq = dataclasses.replace(time_series_database.queries[0], snapshot=True,
+                                       as_of=pd.Timestamp('2021-03-25 09:31:30', tz='UTC'))
+    cache.execute_query(snapshot_tsq)
+    assert time_series_database.queries[-1] is snapshot_tsq
+    assert cache.statistics.uncached_queries == 3
+    assert len(time_series_database.queries) == 4
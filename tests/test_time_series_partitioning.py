@@ -0,0 +1,52 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+
+import quarry
+from quarry.time_series_partitioning import PartitionedTimeSeriesDatabase
+from quarry.time_series_database import time_bounds
+from .in_memory_time_series_database import InMemoryTimeSeriesDatabase
+from .query_split_queries import TIMESTAMP
+from .rdflib_sparql_endpoint import RDFLibSPARQLEndpoint
+
+PATH_HERE = os.path.dirname(__file__)
+
+TIMESTAMP_RANGE = TIMESTAMP.replace('?ts >= "2021-03-25T09:30:23.218499+00:00"^^xsd:dateTime',
+                                    '?ts >= "2021-03-25T09:30:23.218499+00:00"^^xsd:dateTime && '
+                                    '?ts <= "2021-03-25T09:32:23.218498+00:00"^^xsd:dateTime')
+
+
+def test_partitions_are_fetched_and_concatenated():
+    sparql_endpoint = RDFLibSPARQLEndpoint.from_ttl(PATH_HERE + '/expected/query_split/kb.ttl')
+    time_series_database = InMemoryTimeSeriesDatabase.from_csv(PATH_HERE + '/input_data/query_split/signals.csv')
+    partitioned_database = PartitionedTimeSeriesDatabase(time_series_database, partition_size=pd.Timedelta(seconds=30),
+                                                         signal_batch_size=2, max_workers=3)
+
+    actual_df = quarry.execute_query(TIMESTAMP_RANGE, sparql_endpoint, partitioned_database).reset_index(drop=True)
+    partitioned_database.close()
+
+    expected_df = pd.read_csv(PATH_HERE + '/expected/query_split/timestamp.csv')
+    expected_df['ts'] = pd.to_datetime(expected_df['ts'])
+    pd.testing.assert_frame_equal(actual_df, expected_df)
+
+    # Four time ranges of 30 seconds for each of the two batches of signals
+    assert len(time_series_database.queries) == 8
+    assert sorted(len(tsq.signal_ids) for tsq in time_series_database.queries) == [1] * 4 + [2] * 4
+    first_batch = [tsq for tsq in time_series_database.queries if len(tsq.signal_ids) == 2]
+    assert sorted(time_bounds(tsq)[0] for tsq in first_batch) == \
+           [pd.Timestamp('2021-03-25 09:30:23.218499', tz='UTC') + i * pd.Timedelta(seconds=30) for i in range(4)]
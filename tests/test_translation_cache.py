@@ -0,0 +1,71 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+import pytest
+from opcua_tools.ua_data_types import UADouble, UAString
+
+import swt_translator.xml_parser
+from swt_translator.translation_cache import TranslationCache, write_frame, read_frame
+from swt_translator.xml_parser import merge_namespaces, read_namespace_uris
+from .test_sharded_writer import create_triples_dfs
+
+PATH_HERE = os.path.dirname(__file__)
+XML_FILE = PATH_HERE + '/input_data/translate_paper_example/example.xml'
+NAMESPACES = merge_namespaces([], [read_namespace_uris(XML_FILE)])
+
+
+def test_frames_with_ua_values_round_trip(tmp_path):
+    df = pd.DataFrame({'id': pd.Series([1, 2], dtype='Int32'), 'name': ['a', None],
+                       'Value': [UADouble(0.5), UAString('on')]}, index=[3, 5])
+    path = str(tmp_path / 'df.parquet')
+    write_frame(df, path)
+    pd.testing.assert_frame_equal(read_frame(path), df)
+
+
+def test_parsed_files_are_read_from_cache(tmp_path, monkeypatch):
+    cache = TranslationCache(str(tmp_path))
+    nodes, references = cache.parse_xml_file(XML_FILE, NAMESPACES)
+
+    def parse_xml_file(xml_file, namespaces):
+        raise AssertionError('Parsed again')
+
+    monkeypatch.setattr(swt_translator.xml_parser, 'parse_xml_file', parse_xml_file)
+    cached_nodes, cached_references = cache.parse_xml_file(XML_FILE, NAMESPACES)
+    pd.testing.assert_frame_equal(cached_references, references)
+    pd.testing.assert_frame_equal(cached_nodes.astype(str), nodes.astype(str))
+
+    with pytest.raises(AssertionError):
+        cache.parse_xml_file(XML_FILE, NAMESPACES[:2])
+
+
+def test_triples_dfs_are_keyed_by_parameters(tmp_path):
+    cache = TranslationCache(str(tmp_path))
+    triples_dfs = create_triples_dfs()
+    key = cache.triples_dfs_key([XML_FILE], NAMESPACES, {'subclass_closure': False}, None)
+    assert cache.read_triples_dfs(key) is None
+    cache.write_triples_dfs(key, triples_dfs)
+
+    cached = cache.read_triples_dfs(key)
+    pd.testing.assert_frame_equal(cached.references_df, triples_dfs.references_df)
+    pd.testing.assert_frame_equal(cached.signal_id_df, triples_dfs.signal_id_df)
+    pd.testing.assert_frame_equal(cached.node_attributes_dfs['DisplayName'],
+                                  triples_dfs.node_attributes_dfs['DisplayName'])
+    assert [v.value for v in cached.values_df['Value']] == [0.5, 'on']
+    assert cached.type_df is None
+    assert cache.read_triples_dfs(cache.triples_dfs_key([XML_FILE], NAMESPACES, {'subclass_closure': True},
+                                                        None)) is None
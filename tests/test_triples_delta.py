@@ -0,0 +1,75 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pandas as pd
+from opcua_tools.ua_data_types import UADouble
+from rdflib import Graph
+
+from swt_translator.graph_builder import build_instance_graph, write_instance_triples
+from swt_translator.triples_delta import TriplesFrameSink, compute_delta, write_delta, update_requests, \
+    read_triples, write_triples
+from .test_sharded_writer import create_triples_dfs, NAMESPACES
+
+
+def frame_triples(triples_dfs) -> pd.DataFrame:
+    with TriplesFrameSink() as sink:
+        write_instance_triples(triples_dfs=triples_dfs, namespaces=NAMESPACES, params_dict={}, sink=sink)
+    return sink.triples()
+
+
+def create_changed_triples_dfs():
+    triples_dfs = create_triples_dfs()
+    triples_dfs.values_df['Value'] = [UADouble(0.75), triples_dfs.values_df['Value'].iloc[1]]
+    triples_dfs.references_df = triples_dfs.references_df.iloc[:2]
+    return triples_dfs
+
+
+def test_delta_contains_changed_triples(tmp_path):
+    previous_path = str(tmp_path / 'triples.parquet')
+    previous = read_triples(previous_path)
+    triples = frame_triples(create_triples_dfs())
+    assert len(triples) == 18
+    assert len(compute_delta(previous, triples).added) == 18
+    write_triples(triples, previous_path)
+
+    delta = compute_delta(read_triples(previous_path), frame_triples(create_changed_triples_dfs()))
+    assert len(delta.added) == 1
+    assert delta.added['object'].iloc[0].startswith('"0.75"')
+    assert len(delta.removed) == 2
+    assert delta.removed['object'].str.startswith('"0.5"').sum() == 1
+
+    delta_path = str(tmp_path / 'delta.rdfp')
+    write_delta(delta, delta_path)
+    with open(delta_path) as f:
+        lines = f.read().splitlines()
+    assert [line[0] for line in lines] == ['D', 'D', 'A']
+
+
+def test_update_requests_apply_delta():
+    g = build_instance_graph(triples_dfs=create_triples_dfs(), namespaces=NAMESPACES, params_dict={})
+    changed_triples_dfs = create_changed_triples_dfs()
+    delta = compute_delta(frame_triples(create_triples_dfs()), frame_triples(changed_triples_dfs))
+
+    requests = update_requests(delta, batch_size=1)
+    assert len(requests) == 3
+    assert requests[0].startswith('DELETE DATA')
+    for request in requests:
+        g.update(request)
+    expected = build_instance_graph(triples_dfs=changed_triples_dfs, namespaces=NAMESPACES, params_dict={})
+    assert set(g) == set(expected)
+
+    named_requests = update_requests(delta, graph='http://prediktor.com/kb')
+    assert len(named_requests) == 2
+    assert 'GRAPH <http://prediktor.com/kb>' in named_requests[1]
@@ -0,0 +1,73 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+
+import pandas as pd
+import pytest
+from rdflib import Graph, URIRef
+
+from swt_translator.triples_writer import GraphTriplesSink, StreamingTriplesWriter, triples_format
+
+EX = 'http://prediktor.com/paper_example#'
+
+
+def svo_frames():
+    uri_svo = pd.DataFrame({'subject': [URIRef(EX + 'a'), URIRef(EX + 'b'), URIRef(EX + 'a')],
+                            'verb': URIRef(EX + 'refersTo'),
+                            'object': [URIRef(EX + 'b'), URIRef(EX + 'c'), URIRef(EX + 'c')]})
+    string_svo = pd.DataFrame({'subject': [EX + 'a', EX + 'b', EX + 'c'], 'verb': EX + 'displayName',
+                               'object': ['A', 'Quote " and \\ backslash', 'Line\nbreak']})
+    integer_svo = pd.DataFrame({'subject': [EX + 'a', EX + 'b'], 'verb': EX + 'signalId',
+                                'object': pd.Series([1, 2], dtype='Int32')})
+    float_svo = pd.DataFrame({'subject': [EX + 'a', EX + 'c'], 'verb': EX + 'hasFloatValue',
+                              'object': [0.1, 1e20]})
+    bool_svo = pd.DataFrame({'subject': [EX + 'a', EX + 'b'], 'verb': EX + 'isExternalValue',
+                             'object': [True, False]})
+    return [(uri_svo, False), (string_svo, True), (integer_svo, True), (float_svo, True), (bool_svo, True)]
+
+
+def expected_graph() -> Graph:
+    sink = GraphTriplesSink()
+    for svo, literal_objects in svo_frames():
+        sink.add_svo(svo, literal_objects)
+    return sink.g
+
+
+@pytest.mark.parametrize('file_name', ['kb.nt', 'kb.nt.gz', 'kb.ttl', 'kb.ttl.gz'])
+def test_streaming_writer_matches_graph(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    with StreamingTriplesWriter(path, format=triples_format(path), chunk_size=2) as writer:
+        for svo, literal_objects in svo_frames():
+            writer.add_svo(svo, literal_objects)
+    assert writer.triples == 12
+
+    g = Graph()
+    if file_name.endswith('.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            g.parse(data=f.read(), format=triples_format(path))
+    else:
+        g.parse(source=path, format=triples_format(path))
+    assert set(g) == set(expected_graph())
+
+
+def test_turtle_groups_triples_by_subject(tmp_path):
+    path = str(tmp_path / 'kb.ttl')
+    with StreamingTriplesWriter(path, format='ttl') as writer:
+        writer.add_svo(svo_frames()[0][0], literal_objects=False)
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    assert lines[0] == '<' + EX + 'a> <' + EX + 'refersTo> <' + EX + 'b> ;'
+    assert lines[1] == '    <' + EX + 'refersTo> <' + EX + 'c> .'
@@ -0,0 +1,51 @@
+# Copyright 2021 Prediktor AS
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+import pandas as pd
+import pytest
+from opcua_tools import nodeset_parser
+from opcua_tools.nodeset_parser import parse_xml_files, get_list_of_xml_files
+
+from swt_translator.xml_parser import parse_xml_dir_parallel, read_namespace_uris
+
+PATH_HERE = os.path.dirname(__file__)
+XML_DIR = PATH_HERE + '/input_data/translate_paper_example'
+NAMESPACES = ['http://opcfoundation.org/UA/', 'http://prediktor.com/paper_example',
+              'http://prediktor.com/RDS-OG-Fragment', 'http://prediktor.com/iec63131_fragment']
+
+
+def test_namespace_uris_are_read_from_header():
+    assert read_namespace_uris(XML_DIR + '/example.xml')[0] == 'http://prediktor.com/paper_example'
+    assert read_namespace_uris(XML_DIR + '/Opc.Ua.NodeSet2.xml') == []
+
+
+def test_parallel_parsing_matches_serial_parsing():
+    actual = parse_xml_dir_parallel(xml_dir=XML_DIR, namespaces=list(NAMESPACES), max_workers=2)
+    expected = parse_xml_files(get_list_of_xml_files(XML_DIR), list(NAMESPACES))
+
+    # A fragment file refers to a namespace missing from NAMESPACES, which gets the next index
+    assert actual['namespaces'] == expected['namespaces']
+    assert len(actual['namespaces']) == len(NAMESPACES) + 1
+    pd.testing.assert_frame_equal(actual['lookup_df'], expected['lookup_df'])
+    pd.testing.assert_frame_equal(actual['references'], expected['references'])
+    pd.testing.assert_frame_equal(actual['nodes'].astype(str), expected['nodes'].astype(str))
+
+
+def test_missing_nodeset_parser_functions_are_reported(monkeypatch):
+    monkeypatch.delattr(nodeset_parser, 'parse_xml_without_normalization')
+    with pytest.raises(ImportError, match='parse_xml_without_normalization'):
+        parse_xml_dir_parallel(xml_dir=XML_DIR, namespaces=list(NAMESPACES), max_workers=1)